@@ -1,75 +1,44 @@
 import os
-from typing import Dict, Any, List, Tuple
+import time
+import bisect
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Dict, Any, List, Tuple, Optional
 from collections import defaultdict
 import ctypes
 import utils
 import navigation
+import scanning
 
 def is_junction_points(path: str) -> bool:
     """Определение junction point через WinAPI."""
-    try:
-        attrs = ctypes.windll.kernel32.GetFileAttributesW(str(path))
-        if attrs == -1:
-            return False
-        return bool(attrs & 0x400)
-    except Exception:
-        return False
+    return utils.is_junction_point(path)
 
 
-def count_files(path: str) -> Tuple[bool, int]:
+def count_files(path: str, control: Optional[scanning.ScanControl] = None) -> Tuple[bool, int]:
     """Рекурсивный подсчет файлов в Windows каталоге"""
     try:
-        validity, items = navigation.list_directory(path)
-        if not validity:
-            return False, 0
         count = 0
 
-        for item in items:
-            full_path = os.path.join(path, item["name"])
-
-            if os.path.islink(full_path) or is_junction_points(full_path):
-                continue
+        for _, items in scanning.walk(path, control):
+            for item in items:
+                if item["type"] == "file":
+                    count += 1
 
-            if item["type"] == "folder":
-                success, subdir_count = count_files(full_path)
-                if success:
-                    count += subdir_count
-                continue
-
-            if item["type"] == "file":
-                count += 1
         return True, count
 
     except Exception:
         return False, 0
 
 
-def count_bytes(path: str) -> Tuple[bool, int]:
+def count_bytes(path: str, control: Optional[scanning.ScanControl] = None) -> Tuple[bool, int]:
     """Рекурсивный подсчет размера файлов в Windows"""
     try:
-        validity, items = navigation.list_directory(path)
-        if not validity:
-            return False, 0
-
         count_size = 0
 
-        for item in items:
-            full_path = os.path.join(path, item["name"])
-
-            if os.path.islink(full_path) or is_junction_points(full_path):
-                continue
-
-            if item["type"] == "folder":
-                success, subdir_count = count_bytes(full_path)
-                if success:
-                    count_size += subdir_count
-                continue
-
-            if item["type"] == "file":
-                try:
-                    count_size += item.get("size", os.path.getsize(full_path))
-                except Exception:
-                    pass
+        for _, items in scanning.walk(path, control):
+            for item in items:
+                if item["type"] == "file":
+                    count_size += item.get("size", 0)
 
         return True, count_size
 
@@ -77,49 +46,101 @@ def count_bytes(path: str) -> Tuple[bool, int]:
         return False, 0
 
 
-def analyze_windows_file_types(path: str) -> Tuple[bool, Dict[str, Dict[str, Any]]]:
+def analyze_windows_file_types(path: str, control: Optional[scanning.ScanControl] = None
+                               ) -> Tuple[bool, Dict[str, Dict[str, Any]]]:
     """Анализ типов файлов с учетом Windows расширений"""
 
-    statistic = defaultdict(lambda: {"count": 0, "size": 0})
+    statistic = new_type_statistic()
 
     try:
-        validity, items = navigation.list_directory(path)
-        if not validity:
-            return False, {}
+        for _, items in scanning.walk(path, control):
+            for item in items:
+                if item["type"] == "file":
+                    add_file_type(statistic, item)
 
-        for item in items:
-            full_path = os.path.join(path, item["name"])
+        return True, statistic
 
-            if os.path.islink(full_path) or is_junction_points(full_path):
-                continue
+    except Exception:
+        return False, {}
 
-            if item["type"] == "folder":
-                success, subdir_stats = analyze_windows_file_types(full_path)
-                if success:
-                    # Слияние словарей
-                    for ext, data in subdir_stats.items():
-                        statistic[ext]["count"] += data["count"]
-                        statistic[ext]["size"] += data["size"]
-                continue
 
-            if item["type"] == "file":
-                filename, extension = os.path.splitext(item["name"])
-                extension = extension.lower()
-                size = item.get("size", 0)
+# Логарифмические корзины размеров: корзина 0 — пустые файлы,
+# корзина k — размеры от 2**(k-1) до 2**k - 1 байт, последняя — все крупнее
+SIZE_BUCKETS = 48
+SIZE_PERCENTILES = (50, 90, 99)
 
-                statistic[extension]["count"] += 1
-                statistic[extension]["size"] += size
 
-        return True, statistic
+def new_type_statistic() -> Dict[str, Dict[str, Any]]:
+    """Пустая статистика по расширениям: количество, размер и гистограмма размеров"""
+    return defaultdict(lambda: {"count": 0, "size": 0, "min": 0, "max": 0, "buckets": [0] * SIZE_BUCKETS})
+
+
+def size_bucket(size: int) -> int:
+    """Номер логарифмической корзины для размера в байтах"""
+    return min(size.bit_length(), SIZE_BUCKETS - 1)
 
-    except Exception:
-        return False, {}
+
+def histogram_percentile(buckets: List[int], q: float, low_limit: int = 0,
+                         high_limit: Optional[int] = None) -> int:
+    """Оценка q-го процентиля размера по гистограмме корзин.
+
+    Внутри найденной корзины значение интерполируется линейно по рангу,
+    поэтому ошибка не превышает ширины корзины (в 2 раза по размеру).
+    Известные минимум и максимум сужают крайние корзины.
+    """
+    total = sum(buckets)
+    if not total:
+        return 0
+    rank = q / 100 * total
+    seen = 0
+    for index, count in enumerate(buckets):
+        if count and seen + count >= rank:
+            if index == 0:
+                return 0
+            low = max(1 << (index - 1), low_limit)
+            high = (1 << index) - 1 if index < SIZE_BUCKETS - 1 else (high_limit or low)
+            if high_limit is not None:
+                high = min(high, high_limit)
+            return int(low + (high - low) * max(rank - seen, 0) / count)
+        seen += count
+    return high_limit or 0
+
+
+def type_percentile(data: Dict[str, Any], q: float) -> int:
+    """Процентиль размера для одной записи статистики по расширениям"""
+    return histogram_percentile(data["buckets"], q, data["min"], data["max"])
+
+
+def format_size_histogram(buckets: List[int]) -> str:
+    """Гистограмма размеров одной строкой от меньших размеров к большим"""
+    used = [index for index, count in enumerate(buckets) if count]
+    if not used:
+        return ''
+    blocks = ' ▁▂▃▄▅▆▇█'
+    peak = max(buckets)
+    return ''.join(blocks[-(-buckets[index] * 8 // peak)] for index in range(used[0], used[-1] + 1))
+
+
+def add_file_type(statistic: Dict[str, Dict[str, Any]], item: Dict[str, Any]) -> None:
+    """Учет одного файла в статистике по расширениям"""
+    filename, extension = os.path.splitext(item["name"])
+    extension = extension.lower()
+    size = item.get("size", 0)
+
+    data = statistic[extension]
+    if not data["count"] or size < data["min"]:
+        data["min"] = size
+    data["max"] = max(data["max"], size)
+    data["count"] += 1
+    data["size"] += size
+    data["buckets"][size_bucket(size)] += 1
 
 
 def is_system_file(path: str) -> bool:
     """Проверка является ли файл системным в Windows"""
     try:
-        attrs = ctypes.windll.kernel32.GetFileAttributesW(str(path))
+        with utils.count_phase('attributes'):
+            attrs = ctypes.windll.kernel32.GetFileAttributesW(str(path))
         if attrs == -1:
             return False
         return bool(attrs & 0x4)
@@ -127,93 +148,522 @@ def is_system_file(path: str) -> bool:
         return False
 
 
-def get_windows_file_attributes_stats(path: str) -> Dict[str, int]:
+# С какого числа файлов в одном каталоге выгоднее прочитать каталог целиком
+BATCH_DIRECTORY_THRESHOLD = 8
+
+
+def stat_files_batch(paths: List[str]) -> Dict[str, os.stat_result]:
+    """Результаты stat для списка файлов за один проход.
+
+    Пути группируются по каталогам; каталог с большим числом результатов
+    читается одним os.scandir (в Windows атрибуты и размер приходят вместе
+    с записями каталога), остальные файлы опрашиваются одним stat на файл.
+    Недоступные файлы в результат не попадают.
+    """
+    by_directory = defaultdict(set)
+    for path in paths:
+        by_directory[os.path.dirname(path)].add(os.path.basename(path))
+
+    result = {}
+    for directory, names in by_directory.items():
+        if len(names) >= BATCH_DIRECTORY_THRESHOLD:
+            try:
+                with utils.count_phase('attributes'):
+                    with os.scandir(directory or '.') as entries:
+                        for entry in entries:
+                            if entry.name in names:
+                                result[os.path.join(directory, entry.name)] = entry.stat(follow_symlinks=False)
+            except OSError:
+                pass
+
+        for name in names:
+            full_path = os.path.join(directory, name)
+            if full_path in result:
+                continue
+            try:
+                with utils.count_phase('attributes'):
+                    result[full_path] = os.stat(full_path)
+            except OSError:
+                pass
+
+    return result
+
+
+def get_windows_file_attributes_stats(path: str, control: Optional[scanning.ScanControl] = None
+                                      ) -> Dict[str, int]:
     """Статистика по атрибутам файлов Windows"""
 
     statistic = {"hidden": 0, "system": 0, "readonly": 0}
 
     try:
-        success, items = navigation.list_directory(path)
-        if not success:
-            return statistic
+        for dir_path, items in scanning.walk(path, control):
+            for item in items:
+                if item["type"] == "file":
+                    add_file_attributes(statistic, os.path.join(dir_path, item["name"]), item)
+        return statistic
 
-        for item in items:
-            full_path = os.path.join(path, item["name"])
+    except Exception:
+        return statistic
 
-            if os.path.islink(full_path) or is_junction_points(full_path):
-                continue
 
-            # hidden
-            if item["type"] == "file":
-                if utils.is_hidden_windows_file(full_path):
-                    statistic["hidden"] += 1
+def add_file_attributes(statistic: Dict[str, int], full_path: str, item: Dict[str, Any]) -> None:
+    """Учет атрибутов одного файла.
 
-                if not os.access(full_path, os.W_OK):
-                    statistic["readonly"] += 1
+    Флаги, уже записанные в элементе (например, из снимка), повторно
+    с диска не запрашиваются.
+    """
+    if item.get("hidden"):
+        statistic["hidden"] += 1
 
-                if is_system_file(full_path):
-                    statistic["system"] += 1
+    readonly = item["readonly"] if "readonly" in item else not os.access(full_path, os.W_OK)
+    if readonly:
+        statistic["readonly"] += 1
 
-            if item["type"] == "folder":
-                subdir_stats = get_windows_file_attributes_stats(full_path)
-                for key in statistic:
-                    statistic[key] += subdir_stats.get(key, 0)
-        return statistic
+    system = item["system"] if "system" in item else is_system_file(full_path)
+    if system:
+        statistic["system"] += 1
+
+
+def collect_directory_stats(path: str, control: Optional[scanning.ScanControl] = None
+                            ) -> Tuple[bool, Dict[str, Any]]:
+    """Сбор всей статистики каталога за один обход.
+
+    При отмене возвращает накопленный к этому моменту частичный результат.
+    """
+    stats = {
+        "files": 0,
+        "bytes": 0,
+        "types": new_type_statistic(),
+        "attributes": {"hidden": 0, "system": 0, "readonly": 0},
+        "top_files": [],
+    }
+
+    try:
+        for dir_path, items in scanning.walk(path, control):
+            for item in items:
+                if item["type"] != "file":
+                    continue
+                stats["files"] += 1
+                stats["bytes"] += item.get("size", 0)
+                add_file_type(stats["types"], item)
+                add_file_attributes(stats["attributes"], os.path.join(dir_path, item["name"]), item)
+
+            # Крупнейшие файлы — только из самого каталога, как и раньше
+            if dir_path == path:
+                stats["top_files"] = [(item["name"], item["size"]) for item in items if item["type"] == "file"]
+
+        return True, stats
 
     except Exception:
-        return statistic
+        return False, stats
 
 
-def show_windows_directory_stats(path: str) -> bool:
-    """Комплексный вывод статистики Windows каталога"""
+def show_windows_directory_stats(path: str, control: Optional[scanning.ScanControl] = None) -> bool:
+    """Комплексный вывод статистики Windows каталога.
+
+    Ctrl+C прерывает обход и выводит частичную статистику.
+    """
 
     print(f"\n{'='*60}")
     print(f"Статистика каталога: {path}")
     print(f"{'='*60}\n")
 
-    print("\nПодсчет общего количества файлов")
-    success_files, total_files = count_files(path)
-    if not success_files:
-        print("Ошибка при подсчёте файлов")
-        return False
-    print(f"Файлов всего: {total_files}")
+    if control is None:
+        control = scanning.ScanControl(progress=scanning.print_progress)
 
-    print("\nПодсчет общего размера")
-    success_size, total_bytes = count_bytes(path)
-    if not success_size:
-        print("Ошибка при подсчёте размеров")
-        return False
-    print(f"Общий размер: {utils.format_size(total_bytes)}")
+    with scanning.cancel_on_interrupt(control.token):
+        success, stats = collect_directory_stats(path, control)
+    if control.progress is not None:
+        scanning.clear_progress()
 
-    print("\nСтатистика по расширениям:")
-    success_types, ext_stats = analyze_windows_file_types(path)
-    if not success_types:
-        print("Ошибка при анализе расширений")
+    if not success:
+        print("Ошибка при обходе каталога")
         return False
 
+    if control.partial:
+        print(f"Статистика частичная: {scanning.describe_partial(control)}")
+        print(f"  обработано каталогов: {control.dirs_done:,}, последний: {control.current_path}")
+    scanning.print_excluded(control)
+
+    print_directory_stats(stats, control.partial)
+    return True
+
+
+def print_directory_stats(stats: Dict[str, Any], partial: bool = False) -> None:
+    """Вывод собранной статистики каталога"""
+    prefix = "≥ " if partial else ""
+    files = f"≥ {scanning.format_count(stats['files'])}" if partial else f"{stats['files']:,}"
+    print(f"\nФайлов всего: {files}")
+    print(f"Общий размер: {prefix}{utils.format_size(stats['bytes'])}")
+
     print("\nТипы файлов:")
-    for extension, data in sorted(ext_stats.items(), key=lambda x: -x[1]["count"]):
+    for extension, data in sorted(stats["types"].items(), key=lambda x: -x[1]["count"]):
         print(f"  {extension:10}  {data['count']:5} файлов, {utils.format_size(data['size'])}")
 
-    attrs = get_windows_file_attributes_stats(path)
+    attrs = stats["attributes"]
     print("\nАтрибуты:")
     print(f"Скрытые:            {attrs['hidden']:,}")
     print(f"Системные:          {attrs['system']:,}")
     print(f"Только для чтения:  {attrs['readonly']:}")
 
     print("\nКрупнейшие файлы:")
-    success, items = navigation.list_directory(path)
-    if success:
-        files = [
-            (item["name"], item["size"])
-            for item in items
-            if item["type"] == "file"
-        ]
-        top = sorted(files, key=lambda x: -x[1])[:5]
-        for name, size in top:
-            print(f"  {name:40} {utils.format_size(size)}")
-    else:
-        print("Недоступно")
+    top = sorted(stats["top_files"], key=lambda x: -x[1])[:5]
+    for name, size in top:
+        print(f"  {name:40} {utils.format_size(size)}")
 
     print("\nГотово.\n")
+
+
+def merge_directory_stats(total: Dict[str, Any], stats: Dict[str, Any], root: str = '') -> None:
+    """Добавление статистики stats к total.
+
+    Имена крупнейших файлов дополняются путем root, чтобы в общем отчете
+    было видно, с какого диска файл.
+    """
+    total["files"] += stats["files"]
+    total["bytes"] += stats["bytes"]
+    for extension, data in stats["types"].items():
+        target = total["types"][extension]
+        if data["count"]:
+            if not target["count"] or data["min"] < target["min"]:
+                target["min"] = data["min"]
+            target["max"] = max(target["max"], data["max"])
+        target["count"] += data["count"]
+        target["size"] += data["size"]
+        target["buckets"] = [a + b for a, b in zip(target["buckets"], data["buckets"])]
+    for name, count in stats["attributes"].items():
+        total["attributes"][name] = total["attributes"].get(name, 0) + count
+    total["top_files"].extend((os.path.join(root, name), size) for name, size in stats["top_files"])
+
+
+def drive_root(drive: str) -> str:
+    """Корень диска из обозначения list_available_drives ('C:' -> 'C:\\')"""
+    return drive + os.sep if drive.endswith(':') else drive
+
+
+def collect_drives_stats(drives: Optional[List[str]] = None, options: Optional[scanning.ScanOptions] = None,
+                         token: Optional[scanning.CancelToken] = None,
+                         progress: Optional[scanning.ProgressCallback] = None
+                         ) -> Tuple[Dict[str, Tuple[bool, Dict[str, Any], scanning.ScanControl]], Dict[str, Any]]:
+    """Параллельный сбор статистики по дискам.
+
+    Каждый диск обходится в своем потоке со своими счетчиками, поэтому
+    лимиты записей и времени действуют на каждый диск отдельно, а лимиты
+    частоты (*_per_second) — на все диски вместе (см. ScanControl.child).
+    Общий token отменяет все обходы сразу. Возвращает результаты
+    по дискам {диск: (успех, статистика, состояние обхода)} и сводную
+    статистику по всем успешно прочитанным дискам.
+    """
+    if drives is None:
+        drives = navigation.list_available_drives()
+    if options is None:
+        options = scanning.get_default_options()
+    if token is None:
+        token = scanning.CancelToken()
+
+    # Ограничители скорости общие для всех дисков (см. ScanControl.child)
+    parent = scanning.ScanControl(options, token)
+    controls = {drive: parent.child() for drive in drives}
+    results = {}
+    with ThreadPoolExecutor(max_workers=max(len(drives), 1)) as executor:
+        futures = {executor.submit(collect_directory_stats, drive_root(drive), controls[drive]): drive
+                   for drive in drives}
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, timeout=0.5)
+            for future in done:
+                success, stats = future.result()
+                results[futures[future]] = (success, stats, controls[futures[future]])
+            if progress is not None:
+                current = ', '.join(drive for drive in drives if drive not in results)
+                progress(sum(control.dirs_done for control in controls.values()),
+                         sum(control.files_done for control in controls.values()), current)
+
+    combined = {
+        "files": 0,
+        "bytes": 0,
+        "types": new_type_statistic(),
+        "attributes": {"hidden": 0, "system": 0, "readonly": 0},
+        "top_files": [],
+    }
+    for drive in drives:
+        success, stats, control = results[drive]
+        if success:
+            merge_directory_stats(combined, stats, drive_root(drive))
+    return results, combined
+
+
+def show_all_drives_stats() -> bool:
+    """Статистика по всем дискам: отдельно по каждому и сводная.
+
+    Ctrl+C прерывает все обходы и выводит частичную статистику.
+    """
+    drives = navigation.list_available_drives()
+    print(f"\n{'='*60}")
+    print(f"Статистика всех дисков: {', '.join(drives)}")
+    print(f"{'='*60}\n")
+
+    token = scanning.CancelToken()
+    with scanning.cancel_on_interrupt(token):
+        results, combined = collect_drives_stats(drives, token=token, progress=scanning.print_progress)
+    scanning.clear_progress()
+
+    partial = False
+    print(f"{'Диск':10} {'Файлов':>12} {'Размер':>12}  Примечание")
+    for drive in drives:
+        success, stats, control = results[drive]
+        if not success:
+            print(f"{drive:10} {'-':>12} {'-':>12}  ошибка при обходе")
+            continue
+        note = ''
+        if control.partial:
+            partial = True
+            note = f"частично: {scanning.describe_partial(control)}"
+        if control.skipped_excluded:
+            note = ', '.join(filter(None, (note, scanning.describe_excluded(control))))
+        print(f"{drive:10} {scanning.format_partial_count(stats['files'], control):>12} "
+              f"{utils.format_size(stats['bytes']):>12}  {note}")
+
+    if not any(success for success, stats, control in results.values()):
+        print("Не удалось прочитать ни один диск")
+        return False
+
+    print("\nВсе диски вместе:")
+    print_directory_stats(combined, partial)
+    return True
+
+
+def build_usage_tree(path: str, control: Optional[scanning.ScanControl] = None
+                     ) -> Tuple[bool, Dict[str, Any]]:
+    """Дерево занятого места: для каждого каталога суммарный размер и число файлов.
+
+    Обход выдает родителей раньше детей, поэтому суммы накапливаются одним
+    проходом по каталогам в обратном порядке (каждый ребенок раньше родителя).
+    """
+    # Родитель ищется по os.path.dirname, поэтому корень без завершающего разделителя
+    path = os.path.normpath(path)
+    nodes: List[Dict[str, Any]] = []
+    by_path: Dict[str, Dict[str, Any]] = {}
+
+    try:
+        for dir_path, items in scanning.walk(path, control):
+            own_size = 0
+            own_files = 0
+            for item in items:
+                if item["type"] == "file":
+                    own_size += item.get("size", 0)
+                    own_files += 1
+
+            node = {
+                "name": os.path.basename(dir_path.rstrip('\\/')) or dir_path,
+                "path": dir_path,
+                "own_size": own_size,
+                "own_files": own_files,
+                "size": own_size,
+                "files": own_files,
+                "children": [],
+            }
+            parent = by_path.get(os.path.dirname(dir_path))
+            if parent is not None and dir_path != path:
+                parent["children"].append(node)
+            nodes.append(node)
+            by_path[dir_path] = node
+
+    except Exception:
+        return False, {}
+
+    if not nodes:
+        # Бюджет или отмена остановили обход до чтения корня
+        return False, {}
+
+    for node in reversed(nodes[1:]):
+        parent = by_path.get(os.path.dirname(node["path"]))
+        if parent is not None:
+            parent["size"] += node["size"]
+            parent["files"] += node["files"]
+
+    tree = nodes[0]
+    tree["partial"] = control.partial if control is not None else False
+    return True, tree
+
+
+def find_usage_node(tree: Dict[str, Any], path: str) -> Optional[Dict[str, Any]]:
+    """Поиск узла каталога path в уже построенном дереве"""
+    root = os.path.normcase(os.path.normpath(tree["path"]))
+    target = os.path.normcase(os.path.normpath(path))
+    if target == root:
+        return tree
+    if not target.startswith(root.rstrip('\\/') + os.sep):
+        return None
+
+    node = tree
+    for part in os.path.relpath(target, root).split(os.sep):
+        node = next((child for child in node["children"]
+                     if os.path.normcase(child["name"]) == part), None)
+        if node is None:
+            return None
+    return node
+
+
+# Последнее построенное полное дерево; переиспользуется при переходах вглубь,
+# пока не старше USAGE_TREE_MAX_AGE секунд
+USAGE_TREE_MAX_AGE = 300
+_usage_tree_cache: Optional[Dict[str, Any]] = None
+_usage_tree_built = 0.0
+
+
+def get_usage_node(path: str, control: Optional[scanning.ScanControl] = None
+                   ) -> Tuple[bool, Dict[str, Any]]:
+    """Узел дерева занятого места для path, из кэша или новым обходом"""
+    global _usage_tree_cache, _usage_tree_built
+
+    if _usage_tree_cache is not None and time.monotonic() - _usage_tree_built < USAGE_TREE_MAX_AGE:
+        node = find_usage_node(_usage_tree_cache, path)
+        if node is not None:
+            return True, node
+
+    success, tree = build_usage_tree(path, control)
+    if success and not tree["partial"]:
+        _usage_tree_cache = tree
+        _usage_tree_built = time.monotonic()
+    return success, tree
+
+
+def clear_usage_tree_cache() -> None:
+    """Сброс кэша дерева занятого места"""
+    global _usage_tree_cache
+    _usage_tree_cache = None
+
+
+def show_largest_children(path: str, top: int = 15) -> bool:
+    """Вывод крупнейших подкаталогов path по суммарному размеру"""
+    control = scanning.ScanControl(progress=scanning.print_progress)
+    with scanning.cancel_on_interrupt(control.token):
+        success, node = get_usage_node(path, control)
+    scanning.clear_progress()
+
+    if not success:
+        if control.partial:
+            print(f"Обход остановлен до чтения каталога: {scanning.describe_partial(control)}")
+        else:
+            print("Ошибка при обходе каталога")
+        return False
+
+    if node.get("partial"):
+        print(f"Размеры частичные: {scanning.describe_partial(control)}")
+    scanning.print_excluded(control)
+
+    total = node["size"] or 1
+    print(f"\n{node['path']}: {utils.format_size(node['size'])}, файлов {node['files']:,}")
+    print("-" * 70)
+    for child in sorted(node["children"], key=lambda x: -x["size"])[:top]:
+        share = child["size"] / total
+        bar = '#' * round(share * 20)
+        print(f"  {child['name'][:30]:30} {utils.format_size(child['size']):>10} "
+              f"{share:6.1%} {bar:20} {child['files']:,} файлов")
+    if node["own_files"]:
+        print(f"  {'(файлы в самом каталоге)':30} {utils.format_size(node['own_size']):>10} "
+              f"{node['own_size'] / total:6.1%}")
+    print("-" * 70)
+    return True
+
+
+# Границы возраста файлов в днях для группировки по времени изменения
+AGE_BUCKETS = (1, 7, 30, 90, 365, 3 * 365)
+AGE_LABELS = ('< 1 дня', '1-7 дней', '7-30 дней', '1-3 мес.', '3-12 мес.', '1-3 года', '> 3 лет')
+
+
+def age_bucket(age_days: float) -> int:
+    """Номер интервала AGE_BUCKETS для возраста в днях"""
+    return bisect.bisect_right(AGE_BUCKETS, age_days)
+
+
+def analyze_file_age(path: str, stale_days: float = 365,
+                     control: Optional[scanning.ScanControl] = None,
+                     now: Optional[float] = None) -> Tuple[bool, Dict[str, Any]]:
+    """Возраст файлов за один обход.
+
+    Возвращает гистограмму байт и файлов по интервалам AGE_BUCKETS и список
+    устаревших каталогов: самых верхних каталогов, в поддереве которых нет
+    ни одного файла новее stale_days дней.
+    """
+    if now is None:
+        now = time.time()
+    stale_before = now - stale_days * 86400
+    # Как в build_usage_tree: родитель ищется по os.path.dirname
+    path = os.path.normpath(path)
+
+    histogram = [{"label": label, "count": 0, "size": 0} for label in AGE_LABELS]
+    # Для каждого каталога: [путь, самый новый mtime в поддереве, размер поддерева]
+    directories: List[List[Any]] = []
+    by_path: Dict[str, List[Any]] = {}
+
+    try:
+        for dir_path, items in scanning.walk(path, control):
+            newest = 0.0
+            size = 0
+            for item in items:
+                if item["type"] != "file":
+                    continue
+                mtime = item.get("mtime", 0.0)
+                bucket = histogram[age_bucket((now - mtime) / 86400)]
+                bucket["count"] += 1
+                bucket["size"] += item.get("size", 0)
+                newest = max(newest, mtime)
+                size += item.get("size", 0)
+            record = [dir_path, newest, size]
+            directories.append(record)
+            by_path[dir_path] = record
+
+    except Exception:
+        return False, {}
+
+    # Дети идут после родителей: обратный проход поднимает значения вверх
+    for record in reversed(directories[1:]):
+        parent = by_path.get(os.path.dirname(record[0]))
+        if parent is not None:
+            parent[1] = max(parent[1], record[1])
+            parent[2] += record[2]
+
+    stale = []
+    for record in directories:
+        dir_path, newest, size = record
+        if not newest or newest >= stale_before:
+            continue
+        parent = by_path.get(os.path.dirname(dir_path)) if dir_path != path else None
+        if parent is not None and parent[1] and parent[1] < stale_before:
+            # Уже покрыт устаревшим родителем
+            continue
+        stale.append({"path": dir_path, "newest": newest, "size": size})
+
+    stale.sort(key=lambda x: -x["size"])
+    return True, {"histogram": histogram, "stale": stale}
+
+
+def show_file_age_report(path: str, stale_days: float = 365, top: int = 20) -> bool:
+    """Вывод гистограммы возраста файлов и устаревших каталогов"""
+    control = scanning.ScanControl(progress=scanning.print_progress)
+    with scanning.cancel_on_interrupt(control.token):
+        success, report = analyze_file_age(path, stale_days, control)
+    scanning.clear_progress()
+
+    if not success:
+        print("Ошибка при обходе каталога")
+        return False
+    if control.partial:
+        print(f"Статистика частичная: {scanning.describe_partial(control)}")
+    scanning.print_excluded(control)
+
+    total = sum(bucket["size"] for bucket in report["histogram"]) or 1
+    print("\nБайты по давности изменения:")
+    for bucket in report["histogram"]:
+        share = bucket["size"] / total
+        print(f"  {bucket['label']:10} {bucket['count']:8,} файлов {utils.format_size(bucket['size']):>10} "
+              f"{share:6.1%} {'#' * round(share * 30)}")
+
+    print(f"\nКаталоги без изменений дольше {stale_days:g} дней:")
+    if not report["stale"]:
+        print("  нет")
+    for entry in report["stale"][:top]:
+        print(f"  {utils.format_size(entry['size']):>10}  {navigation.format_mtime(entry['newest'])}  {entry['path']}")
     return True
@@ -0,0 +1,477 @@
+import argparse
+import fnmatch
+import json
+import os
+import sys
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import analysis
+import columnar
+import output
+import planner
+import scanning
+import search
+import snapshot
+
+OPERATIONS_HELP = """операции:
+  stats                 количество файлов, общий размер и атрибуты
+  ext-breakdown         количество и размер по расширениям
+  large-files:МБ        файлы не меньше заданного размера в МБ
+  find:ШАБЛОН           файлы по шаблону имени (*.txt, report*)
+  find-ext:EXT[,EXT]    файлы по списку расширений (txt,pdf)
+  analytics             группировки по расширению, глубине, каталогу
+                        верхнего уровня и возрасту, процентили (numpy)
+"""
+
+
+class StatsCollector:
+    """Операция stats: файлы, байты и атрибуты"""
+
+    def __init__(self) -> None:
+        self.files = 0
+        self.bytes = 0
+        self.attributes = {"hidden": 0, "system": 0, "readonly": 0}
+
+    def add(self, dir_path: str, items: List[Dict[str, Any]]) -> None:
+        for item in items:
+            if item["type"] != "file":
+                continue
+            self.files += 1
+            self.bytes += item.get("size", 0)
+            analysis.add_file_attributes(self.attributes, os.path.join(dir_path, item["name"]), item)
+
+    def result(self) -> Dict[str, Any]:
+        return {"files": self.files, "bytes": self.bytes, "attributes": self.attributes}
+
+
+class ExtensionCollector:
+    """Операция ext-breakdown: статистика по расширениям"""
+
+    def __init__(self) -> None:
+        self.statistic = analysis.new_type_statistic()
+
+    def add(self, dir_path: str, items: List[Dict[str, Any]]) -> None:
+        for item in items:
+            if item["type"] == "file":
+                analysis.add_file_type(self.statistic, item)
+
+    def result(self) -> Dict[str, Dict[str, Any]]:
+        result = {}
+        for extension, data in sorted(self.statistic.items(), key=lambda x: -x[1]["size"]):
+            result[extension] = dict(data)
+            for q in analysis.SIZE_PERCENTILES:
+                result[extension][f"p{q}"] = analysis.type_percentile(data, q)
+        return result
+
+
+class LargeFilesCollector:
+    """Операция large-files:МБ"""
+
+    def __init__(self, argument: str) -> None:
+        self.min_size_bytes = float(argument) * 1024 * 1024
+        self.files = []
+
+    def add(self, dir_path: str, items: List[Dict[str, Any]]) -> None:
+        for item in items:
+            if item["type"] == "file" and item.get("size", 0) >= self.min_size_bytes:
+                self.files.append({
+                    "path": os.path.join(dir_path, item["name"]),
+                    "size": item["size"],
+                    "type": os.path.splitext(item["name"])[1],
+                })
+
+    def result(self) -> List[Dict[str, Any]]:
+        return sorted(self.files, key=lambda x: -x["size"])
+
+
+class PatternCollector:
+    """Операция find:ШАБЛОН (без учета регистра)"""
+
+    def __init__(self, argument: str) -> None:
+        if not argument:
+            raise ValueError("не указан шаблон")
+        self.pattern = argument.lower()
+        self.files = []
+
+    def add(self, dir_path: str, items: List[Dict[str, Any]]) -> None:
+        for item in items:
+            if item["type"] == "file" and fnmatch.fnmatchcase(item["name"].lower(), self.pattern):
+                self.files.append(os.path.join(dir_path, item["name"]))
+
+    def result(self) -> List[str]:
+        return self.files
+
+
+class ExtensionFilterCollector:
+    """Операция find-ext:EXT[,EXT]"""
+
+    def __init__(self, argument: str) -> None:
+        self.extensions = set(search.normalize_extensions([ext for ext in argument.split(',') if ext.strip()]))
+        if not self.extensions:
+            raise ValueError("не указаны расширения")
+        self.files = []
+
+    def add(self, dir_path: str, items: List[Dict[str, Any]]) -> None:
+        for item in items:
+            if item["type"] == "file" and os.path.splitext(item["name"])[1].lower() in self.extensions:
+                self.files.append(os.path.join(dir_path, item["name"]))
+
+    def result(self) -> List[str]:
+        return self.files
+
+
+def make_analytics_collector() -> columnar.ColumnCollector:
+    """Операция analytics: векторные группировки (нужен numpy)"""
+    if not columnar.available():
+        raise ValueError("операция analytics требует пакет numpy")
+    return columnar.ColumnCollector()
+
+
+# Операции без аргумента и с аргументом после двоеточия
+SIMPLE_OPERATIONS = {
+    "stats": StatsCollector,
+    "ext-breakdown": ExtensionCollector,
+    "analytics": make_analytics_collector,
+}
+ARGUMENT_OPERATIONS = {
+    "large-files": LargeFilesCollector,
+    "find": PatternCollector,
+    "find-ext": ExtensionFilterCollector,
+}
+
+
+def make_collector(operation: str):
+    """Создание сборщика результата по описанию операции"""
+    name, _, argument = operation.partition(':')
+    if name in SIMPLE_OPERATIONS and not argument:
+        return SIMPLE_OPERATIONS[name]()
+    if name in ARGUMENT_OPERATIONS and argument:
+        return ARGUMENT_OPERATIONS[name](argument)
+    raise ValueError(f"неизвестная операция: {operation}")
+
+
+def collect_operations(directories: Iterable[Tuple[str, List[Dict[str, Any]]]],
+                       operations: List[str]) -> Dict[str, Any]:
+    """Передача каждого каталога всем сборщикам операций"""
+    collectors = [(operation, make_collector(operation)) for operation in operations]
+
+    for dir_path, items in directories:
+        for _, collector in collectors:
+            collector.add(dir_path, items)
+
+    return {operation: collector.result() for operation, collector in collectors}
+
+
+def run_operations(root: str, operations: List[str],
+                   control: Optional[scanning.ScanControl] = None) -> Dict[str, Any]:
+    """Выполнение всех операций за один общий обход корня"""
+    if control is None:
+        control = scanning.ScanControl()
+
+    results = collect_operations(scanning.walk(root, control), operations)
+
+    return {
+        "root": root,
+        "partial": control.partial,
+        "stop_reason": control.stop_reason or (scanning.STOP_DEPTH if control.depth_limited else None),
+        "coverage": round(control.coverage, 4),
+        "skipped_excluded": control.skipped_excluded,
+        "directories": control.dirs_done,
+        "results": results,
+    }
+
+
+def report_snapshot(path: str, operations: List[str]) -> Dict[str, Any]:
+    """Выполнение операций над сохраненным снимком без обращения к диску"""
+    with snapshot.Snapshot(path) as snap:
+        results = collect_operations(snap.walk(), operations)
+        return {
+            "root": snap.root,
+            "snapshot": path,
+            "created": datetime.fromtimestamp(snap.created).isoformat(timespec='seconds'),
+            # Частичный снимок дает частичный отчет
+            "partial": snap.partial,
+            "stop_reason": snap.stop_reason or (scanning.STOP_DEPTH if snap.depth_limited else None),
+            "coverage": round(snap.coverage, 4),
+            "skipped_excluded": snap.skipped_excluded,
+            "directories": snap.dir_count,
+            "results": results,
+        }
+
+
+def write_json(report: Dict[str, Any], output: Optional[str]) -> None:
+    """Запись отчета в файл или в стандартный вывод"""
+    if output and output != '-':
+        with open(output, 'w', encoding='utf-8') as stream:
+            json.dump(report, stream, ensure_ascii=False, indent=2)
+            stream.write('\n')
+    else:
+        json.dump(report, sys.stdout, ensure_ascii=False, indent=2)
+        sys.stdout.write('\n')
+
+
+def add_scan_arguments(parser: argparse.ArgumentParser) -> None:
+    """Общие ограничения обхода"""
+    parser.add_argument('--max-depth', type=int, help="максимальная глубина спуска")
+    parser.add_argument('--max-entries', type=int, help="максимум просмотренных записей")
+    parser.add_argument('--deadline', type=float, help="лимит времени в секундах")
+    parser.add_argument('--one-filesystem', action='store_true', help="не переходить на другие тома")
+    parser.add_argument('--exclude-mount', action='append', default=[], metavar='PATH',
+                        help="точка монтирования, в которую не спускаться (можно повторять)")
+    parser.add_argument('--exclude', action='append', default=[], metavar='GLOB',
+                        help="правило исключения каталогов (можно повторять)")
+    parser.add_argument('--ignore-file', metavar='FILE', help="файл правил исключения в стиле .gitignore")
+    parser.add_argument('--no-default-excludes', action='store_true',
+                        help="не исключать node_modules, .git и подобные каталоги")
+    parser.add_argument('--dirs-per-second', type=float, metavar='N', help="максимум каталогов в секунду")
+    parser.add_argument('--stats-per-second', type=float, metavar='N',
+                        help="максимум запросов метаданных в секунду")
+    parser.add_argument('--bytes-per-second', type=float, metavar='N', help="максимум байт чтения файлов в секунду")
+    parser.add_argument('--low-priority', action='store_true', help="сканировать с пониженным приоритетом")
+    parser.add_argument('--progress', action='store_true', help="показывать прогресс в stderr")
+
+
+def make_control(args: argparse.Namespace) -> scanning.ScanControl:
+    """Состояние обхода по аргументам командной строки"""
+    exclude = [] if args.no_default_excludes else list(scanning.DEFAULT_EXCLUDES)
+    exclude.extend(args.exclude)
+    if args.ignore_file:
+        exclude.extend(scanning.load_ignore_file(args.ignore_file))
+    options = scanning.ScanOptions(max_depth=args.max_depth, max_entries=args.max_entries,
+                                   deadline=args.deadline, same_filesystem=args.one_filesystem,
+                                   excluded_mounts=args.exclude_mount, exclude=exclude,
+                                   dirs_per_second=args.dirs_per_second,
+                                   stats_per_second=args.stats_per_second,
+                                   bytes_per_second=args.bytes_per_second,
+                                   low_priority=args.low_priority)
+    progress = None
+    if args.progress:
+        def progress(dirs_done: int, files_done: int, current_path: str) -> None:
+            sys.stderr.write(f"\rКаталогов: {dirs_done:,}  файлов: {files_done:,}")
+            sys.stderr.flush()
+    return scanning.ScanControl(options, progress=progress)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Разбор аргументов пакетного режима"""
+    parser = argparse.ArgumentParser(
+        prog='batch.py',
+        description="Пакетный режим файлового менеджера: несколько запросов за один обход",
+    )
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run = commands.add_parser('run', help="выполнить операции над деревом каталогов",
+                              epilog=OPERATIONS_HELP,
+                              formatter_class=argparse.RawDescriptionHelpFormatter)
+    run.add_argument('root', help="корневой каталог")
+    run.add_argument('operations', nargs='+', metavar='OPERATION', help="операции (см. ниже)")
+    run.add_argument('-o', '--output', help="файл для JSON отчета (по умолчанию stdout)")
+    add_scan_arguments(run)
+
+    stream = commands.add_parser('stream', help="потоковый поиск с выводом в NDJSON")
+    stream.add_argument('root', help="корневой каталог")
+    query = stream.add_mutually_exclusive_group(required=True)
+    query.add_argument('--find', metavar='ШАБЛОН', help="шаблон имени файла")
+    query.add_argument('--find-ext', metavar='EXT[,EXT]', help="список расширений")
+    query.add_argument('--large-files', metavar='МБ', type=float, help="минимальный размер в МБ")
+    query.add_argument('--query', metavar='ЗАПРОС',
+                       help="составной запрос, например \"ext:log size:>10M age:<7d\"")
+    stream.add_argument('--case-sensitive', action='store_true', help="учитывать регистр в шаблоне")
+    stream.add_argument('--index', metavar='SNAPSHOT',
+                        help="снимок, по которому отвечать, если он не устарел")
+    stream.add_argument('-o', '--output', help="файл для NDJSON (по умолчанию stdout)")
+    add_scan_arguments(stream)
+
+    save = commands.add_parser('snapshot', help="сохранить снимок дерева каталогов")
+    save.add_argument('root', help="корневой каталог")
+    save.add_argument('-o', '--output', required=True, help="файл снимка")
+    add_scan_arguments(save)
+
+    report = commands.add_parser('report', help="выполнить операции над сохраненным снимком",
+                                 epilog=OPERATIONS_HELP,
+                                 formatter_class=argparse.RawDescriptionHelpFormatter)
+    report.add_argument('snapshot', help="файл снимка")
+    report.add_argument('operations', nargs='+', metavar='OPERATION', help="операции (см. ниже)")
+    report.add_argument('-o', '--output', help="файл для JSON отчета (по умолчанию stdout)")
+
+    compare = commands.add_parser('diff', help="сравнить два снимка: что появилось и что выросло")
+    compare.add_argument('old', help="старый снимок")
+    compare.add_argument('new', help="новый снимок")
+    compare.add_argument('--top', type=int, default=50,
+                         help="сколько записей каждого вида выводить (0 — все)")
+    compare.add_argument('--allow-partial', action='store_true',
+                         help="сравнивать и частичные снимки (недостающие каталоги будут в изменениях)")
+    compare.add_argument('-o', '--output', help="файл для JSON отчета (по умолчанию stdout)")
+
+    return parser
+
+
+def diff_report(old_path: str, new_path: str, top: int, allow_partial: bool = False) -> Dict[str, Any]:
+    """Отчет о различиях двух снимков"""
+    with snapshot.Snapshot(old_path) as old, snapshot.Snapshot(new_path) as new:
+        changes = snapshot.diff_snapshots(old, new, allow_partial)
+        partial = {"old": old.partial, "new": new.partial}
+        old_total = old.dir_total_size[0] if old.dir_count else 0
+        new_total = new.dir_total_size[0] if new.dir_count else 0
+
+    def head(entries: List[Any]) -> List[Any]:
+        return entries[:top] if top else entries
+
+    added = sorted(changes['added'], key=lambda entry: -entry[1])
+    removed = sorted(changes['removed'], key=lambda entry: -entry[1])
+    modified = sorted(changes['modified'], key=lambda entry: entry[1] - entry[2])
+    return {
+        "old": old_path,
+        "new": new_path,
+        "partial": partial,
+        "size_delta": new_total - old_total,
+        "counts": {kind: len(changes[kind]) for kind in ('added', 'removed', 'modified')},
+        "directories": [
+            {"path": path, "old_size": old_size, "new_size": new_size, "delta": new_size - old_size}
+            for path, old_size, new_size in head(changes['directories'])
+        ],
+        "added": [{"path": path, "size": size} for path, size in head(added)],
+        "removed": [{"path": path, "size": size} for path, size in head(removed)],
+        "modified": [
+            {"path": path, "old_size": old_size, "new_size": new_size, "delta": new_size - old_size}
+            for path, old_size, new_size in head(modified)
+        ],
+    }
+
+
+def validate_operations(parser: argparse.ArgumentParser, operations: List[str]) -> None:
+    """Проверка списка операций до начала обхода"""
+    try:
+        for operation in operations:
+            make_collector(operation)
+    except ValueError as e:
+        parser.error(str(e))
+
+
+def stream_query(args: argparse.Namespace) -> search.SearchQuery:
+    """Условие потокового поиска в виде составного запроса"""
+    if args.find:
+        return search.SearchQuery(name=args.find, case_sensitive=args.case_sensitive)
+    if args.find_ext:
+        return search.SearchQuery(extensions=args.find_ext.split(','))
+    if args.query:
+        return search.parse_query(args.query, args.case_sensitive)
+    return search.SearchQuery(min_size=int(args.large_files * 1024 * 1024))
+
+
+def stream_matches(args: argparse.Namespace, control: scanning.ScanControl) -> int:
+    """Выполнение потокового поиска; возвращает число записей"""
+    plan = None
+    if args.index:
+        query = stream_query(args)
+        plan = planner.plan_query(query, args.root, args.index, control.options)
+        matches = planner.execute_plan(plan, query, control)
+    elif args.find:
+        matches = search.iter_pattern_matches(args.find, args.root, args.case_sensitive, control)
+    elif args.find_ext:
+        matches = search.iter_extension_matches(args.find_ext.split(','), args.root, control)
+    elif args.query:
+        matches = search.iter_query_matches(search.parse_query(args.query, args.case_sensitive),
+                                            args.root, control)
+    else:
+        matches = search.iter_large_files(args.large_files, args.root, control)
+
+    if args.output and args.output != '-':
+        with open(args.output, 'w', encoding='utf-8') as stream:
+            with output.NDJSONWriter(stream) as writer:
+                written = search.stream_results(matches, writer, control)
+    else:
+        with output.NDJSONWriter(sys.stdout) as writer:
+            written = search.stream_results(matches, writer, control)
+    if plan is not None:
+        # Досрочно остановленный поток завершается, чтобы план получил фактическую стоимость
+        matches.close()
+        print(plan.describe(), file=sys.stderr)
+    scanning.print_excluded(control, sys.stderr)
+    return written
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Точка входа пакетного режима"""
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if getattr(args, 'ignore_file', None) and not os.path.isfile(args.ignore_file):
+        parser.error(f"файл правил исключения не найден: {args.ignore_file}")
+    if getattr(args, 'query', None):
+        try:
+            search.parse_query(args.query)
+        except ValueError as e:
+            parser.error(f"некорректный запрос: {e}")
+
+    if args.command == 'run':
+        validate_operations(parser, args.operations)
+
+        if not os.path.isdir(args.root):
+            print(f"Ошибка: каталог не найден: {args.root}", file=sys.stderr)
+            return 1
+
+        control = make_control(args)
+        with scanning.cancel_on_interrupt(control.token):
+            try:
+                report = run_operations(args.root, args.operations, control)
+            except OSError as e:
+                print(f"Ошибка: {e}", file=sys.stderr)
+                return 1
+        if args.progress:
+            sys.stderr.write('\n')
+        write_json(report, args.output)
+
+    elif args.command == 'stream':
+        if not os.path.isdir(args.root):
+            print(f"Ошибка: каталог не найден: {args.root}", file=sys.stderr)
+            return 1
+
+        control = make_control(args)
+        with scanning.cancel_on_interrupt(control.token):
+            stream_matches(args, control)
+        if args.progress:
+            sys.stderr.write('\n')
+
+    elif args.command == 'snapshot':
+        if not os.path.isdir(args.root):
+            print(f"Ошибка: каталог не найден: {args.root}", file=sys.stderr)
+            return 1
+
+        control = make_control(args)
+        with scanning.cancel_on_interrupt(control.token):
+            dir_count, file_count = snapshot.write_snapshot(args.root, args.output, control)
+        if args.progress:
+            sys.stderr.write('\n')
+        if control.partial:
+            print(f"Снимок частичный: {scanning.describe_partial(control)}", file=sys.stderr)
+        scanning.print_excluded(control, sys.stderr)
+        print(f"Снимок {args.output}: каталогов {dir_count:,}, файлов {file_count:,}", file=sys.stderr)
+
+    elif args.command == 'report':
+        validate_operations(parser, args.operations)
+        try:
+            result = report_snapshot(args.snapshot, args.operations)
+        except (OSError, snapshot.SnapshotError) as e:
+            print(f"Ошибка: {e}", file=sys.stderr)
+            return 1
+        if result["partial"]:
+            # stop_reason отчета уже учитывает лимит глубины
+            print(f"Снимок частичный: {scanning.format_partial(result['stop_reason'] or '', False, result['coverage'])}",
+                  file=sys.stderr)
+        write_json(result, args.output)
+
+    elif args.command == 'diff':
+        try:
+            result = diff_report(args.old, args.new, args.top, args.allow_partial)
+        except (OSError, snapshot.SnapshotError) as e:
+            print(f"Ошибка: {e}", file=sys.stderr)
+            return 1
+        if any(result["partial"].values()):
+            print("Внимание: частичный снимок, часть изменений — непросканированные каталоги", file=sys.stderr)
+        write_json(result, args.output)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,170 @@
+import os
+import time
+from array import array
+from typing import Any, Dict, List, Optional, Tuple
+import analysis
+import scanning
+import utils
+
+# NumPy — необязательная зависимость: без нее доступен обычный анализ
+# из analysis, а эта аналитика сообщает о недоступности
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+PERCENTILES = (50, 90, 99)
+
+
+def available() -> bool:
+    """Установлен ли NumPy"""
+    return np is not None
+
+
+class ColumnCollector:
+    """Сбор столбцов по файлам во время обхода.
+
+    Значения копятся в компактных array.array, а строки (расширения и
+    каталоги верхнего уровня) заменяются целочисленными кодами, поэтому
+    память растет на десятки байт на файл, а не на словарь.
+    """
+
+    def __init__(self) -> None:
+        self.root: Optional[str] = None
+        self.sizes = array('Q')
+        self.mtimes = array('d')
+        self.extensions = array('I')
+        self.depths = array('H')
+        self.top_dirs = array('I')
+        self.hidden = array('B')
+        self.extension_names: List[str] = []
+        self.top_dir_names: List[str] = ['']
+        self._extension_codes: Dict[str, int] = {}
+        self._top_dir_codes: Dict[str, int] = {'': 0}
+
+    def _code(self, codes: Dict[str, int], names: List[str], value: str) -> int:
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(names)
+            names.append(value)
+        return code
+
+    def add(self, dir_path: str, items: List[Dict[str, Any]]) -> None:
+        """Учет файлов одного каталога"""
+        if self.root is None:
+            # Первый каталог обхода — корень
+            self.root = dir_path
+        relative = os.path.relpath(dir_path, self.root)
+        parts = [] if relative == os.curdir else relative.split(os.sep)
+        depth = len(parts)
+        top_dir = self._code(self._top_dir_codes, self.top_dir_names, parts[0] if parts else '')
+
+        for item in items:
+            if item["type"] != "file":
+                continue
+            extension = os.path.splitext(item["name"])[1].lower()
+            self.sizes.append(item.get("size", 0))
+            self.mtimes.append(item.get("mtime", 0.0))
+            self.extensions.append(self._code(self._extension_codes, self.extension_names, extension))
+            self.depths.append(min(depth, 0xFFFF))
+            self.top_dirs.append(top_dir)
+            self.hidden.append(1 if item.get("hidden") else 0)
+
+    def result(self) -> Dict[str, Any]:
+        """Группировки для пакетного режима"""
+        return analyze_columns(self)
+
+
+def _group(codes, sizes, names: List[str]) -> Dict[str, Dict[str, int]]:
+    counts = np.bincount(codes, minlength=len(names))
+    totals = np.bincount(codes, weights=sizes, minlength=len(names))
+    order = np.argsort(-totals, kind='stable')
+    return {names[i]: {"count": int(counts[i]), "size": int(totals[i])} for i in order if counts[i]}
+
+
+def analyze_columns(columns: ColumnCollector, now: Optional[float] = None) -> Dict[str, Any]:
+    """Векторные группировки по собранным столбцам.
+
+    Возвращает группировки по расширению, глубине, каталогу верхнего уровня
+    и возрасту файла, а также процентили размеров. Без NumPy поднимает
+    ImportError.
+    """
+    if np is None:
+        raise ImportError("для векторной аналитики нужен пакет numpy")
+    if now is None:
+        now = time.time()
+
+    # Столбцы читаются из буферов array без копирования
+    sizes = np.frombuffer(columns.sizes, dtype=np.uint64) if columns.sizes else np.zeros(0, np.uint64)
+    mtimes = np.frombuffer(columns.mtimes, dtype=np.float64) if columns.mtimes else np.zeros(0)
+    extensions = np.frombuffer(columns.extensions, dtype=np.uint32) if columns.extensions else np.zeros(0, np.uint32)
+    depths = np.frombuffer(columns.depths, dtype=np.uint16) if columns.depths else np.zeros(0, np.uint16)
+    top_dirs = np.frombuffer(columns.top_dirs, dtype=np.uint32) if columns.top_dirs else np.zeros(0, np.uint32)
+    weights = sizes.astype(np.float64)
+
+    depth_names = [str(depth) for depth in range(int(depths.max()) + 1)] if depths.size else []
+    ages = (now - mtimes) / 86400.0
+    age_codes = np.digitize(ages, analysis.AGE_BUCKETS)
+
+    percentiles = {}
+    if sizes.size:
+        values = np.percentile(sizes, PERCENTILES)
+        percentiles = {f"p{q}": int(value) for q, value in zip(PERCENTILES, values)}
+
+    return {
+        "files": int(sizes.size),
+        "bytes": int(sizes.sum()) if sizes.size else 0,
+        "hidden": int(np.count_nonzero(np.frombuffer(columns.hidden, dtype=np.uint8))) if columns.hidden else 0,
+        "size_percentiles": percentiles,
+        "by_extension": _group(extensions, weights, columns.extension_names),
+        "by_depth": _group(depths, weights, depth_names),
+        "by_top_dir": _group(top_dirs, weights, columns.top_dir_names),
+        "by_age": _group(age_codes, weights, list(analysis.AGE_LABELS)),
+    }
+
+
+def collect_columns(path: str, control: Optional[scanning.ScanControl] = None
+                    ) -> Tuple[bool, ColumnCollector]:
+    """Обход path со сбором столбцов"""
+    columns = ColumnCollector()
+    try:
+        for dir_path, items in scanning.walk(path, control):
+            columns.add(dir_path, items)
+        return True, columns
+    except Exception:
+        return False, columns
+
+
+def show_columnar_report(path: str) -> bool:
+    """Вывод векторной аналитики каталога"""
+    if not available():
+        print("Векторная аналитика недоступна: установите пакет numpy")
+        return False
+
+    control = scanning.ScanControl(progress=scanning.print_progress)
+    with scanning.cancel_on_interrupt(control.token):
+        success, columns = collect_columns(path, control)
+    scanning.clear_progress()
+    if not success:
+        print("Ошибка при обходе каталога")
+        return False
+
+    report = analyze_columns(columns)
+    if control.partial:
+        print(f"Статистика частичная: {scanning.describe_partial(control)}")
+    scanning.print_excluded(control)
+    print(f"\nФайлов: {scanning.format_partial_count(report['files'], control)}, "
+          f"размер: {utils.format_size(report['bytes'])}")
+    if report["size_percentiles"]:
+        print("Процентили размера: " + ", ".join(
+            f"{name} = {utils.format_size(value)}" for name, value in report["size_percentiles"].items()))
+
+    for title, key, limit in (("По расширениям", "by_extension", 15),
+                              ("По каталогам верхнего уровня", "by_top_dir", 15),
+                              ("По глубине", "by_depth", None),
+                              ("По возрасту", "by_age", None)):
+        print(f"\n{title}:")
+        for name, data in list(report[key].items())[:limit]:
+            label = name or '(нет)'
+            print(f"  {label[:30]:30} {data['count']:8,} файлов {utils.format_size(data['size']):>10}")
+    return True
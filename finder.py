@@ -0,0 +1,286 @@
+import heapq
+import math
+import os
+import re
+import sys
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+import scanning
+
+# Windows: посимвольный ввод без Enter; в других системах — ввод строкой
+try:
+    import msvcrt
+except ImportError:
+    msvcrt = None
+
+# Веса оценки совпадения: символы подряд, символ в начале слова,
+# символ в имени (последней части пути); штрафы за разрывы и длину пути
+SCORE_CONSECUTIVE = 5.0
+SCORE_BOUNDARY = 8.0
+SCORE_BASENAME = 3.0
+PENALTY_GAP = 0.3
+PENALTY_LENGTH = 0.05
+# Недавно посещенный каталог получает до SCORE_RECENCY очков, бонус
+# убывает вдвое каждые RECENCY_HALF_LIFE секунд
+SCORE_RECENCY = 20.0
+RECENCY_HALF_LIFE = 3600.0
+
+SEPARATORS = frozenset('\\/_-. ')
+# Больше совпадений, чем SCORE_LIMIT, не оценивается (см. FinderSession.search)
+SCORE_LIMIT = 5000
+FINDER_INDEX_MAX_AGE = 300
+RESULT_LIMIT = 10
+
+
+class NameIndex:
+    """Индекс имен каталогов и файлов под root.
+
+    Хранит относительные пути и их копии в нижнем регистре; для поиска
+    по сотням тысяч записей больше ничего не нужно, поэтому обход идет
+    без запроса метаданных (scanning.walk_entries).
+    """
+
+    def __init__(self, root: str) -> None:
+        self.root = root
+        self.paths: List[str] = []
+        self.lowered: List[str] = []
+        self.is_dir = bytearray()
+        self.built = time.monotonic()
+
+    def build(self, control: Optional[scanning.ScanControl] = None) -> 'NameIndex':
+        """Заполнение индекса обходом root"""
+        for dir_path, items in scanning.walk_entries(self.root, control):
+            relative = os.path.relpath(dir_path, self.root)
+            prefix = '' if relative == os.curdir else relative + os.sep
+            for item in items:
+                path = prefix + item["name"]
+                self.paths.append(path)
+                self.lowered.append(path.lower())
+                self.is_dir.append(item["type"] == "folder")
+        self.built = time.monotonic()
+        return self
+
+    def __len__(self) -> int:
+        return len(self.paths)
+
+
+# Время последнего перехода в каталог: путь -> time.time()
+_visits: Dict[str, float] = {}
+
+
+def record_visit(path: str) -> None:
+    """Отметка о переходе в каталог для ранжирования по недавности"""
+    _visits[os.path.normcase(os.path.abspath(path))] = time.time()
+
+
+def recency_bonuses(root: str, now: Optional[float] = None) -> Dict[str, float]:
+    """Бонусы недавности для посещенных каталогов под root: относительный путь в нижнем регистре -> очки"""
+    if now is None:
+        now = time.time()
+    root_key = os.path.normcase(os.path.abspath(root))
+    bonuses = {}
+    for path, visited in _visits.items():
+        if path == root_key or not path.startswith(root_key.rstrip(os.sep) + os.sep):
+            continue
+        relative = os.path.relpath(path, root_key)
+        bonuses[relative.lower()] = SCORE_RECENCY * math.pow(0.5, max(now - visited, 0.0) / RECENCY_HALF_LIFE)
+    return bonuses
+
+
+def compile_query(query: str):
+    """Регулярное выражение подпоследовательности: каждый символ — своя группа"""
+    parts = [f'({re.escape(char)})' for char in query.lower() if not char.isspace()]
+    return re.compile('.*?'.join(parts), re.DOTALL) if parts else None
+
+
+def score_match(match, text: str, bonus: float = 0.0) -> float:
+    """Оценка совпадения по позициям символов запроса в тексте"""
+    basename_start = max(text.rfind('\\'), text.rfind('/')) + 1
+    score = bonus
+    previous = -2
+    for group in range(1, (match.lastindex or 0) + 1):
+        position = match.start(group)
+        if position == previous + 1:
+            score += SCORE_CONSECUTIVE
+        if position == 0 or text[position - 1] in SEPARATORS:
+            score += SCORE_BOUNDARY
+        if position >= basename_start:
+            score += SCORE_BASENAME
+        previous = position
+    span = match.end() - match.start()
+    score -= (span - (match.lastindex or 0)) * PENALTY_GAP
+    score -= len(text) * PENALTY_LENGTH
+    return score
+
+
+class FinderSession:
+    """Поиск по индексу с сужением по мере ввода.
+
+    Для каждого введенного префикса запоминаются подошедшие записи. Если
+    новый запрос продолжает один из них, проверяются только эти записи,
+    поэтому каждый следующий символ обходится дешевле первого, а после
+    удаления символа прежний набор берется из истории.
+    """
+
+    def __init__(self, index: NameIndex) -> None:
+        self.index = index
+        self.bonuses = recency_bonuses(index.root)
+        self._history: List[Tuple[str, List[int]]] = []
+
+    def _pool(self, query: str) -> Sequence[int]:
+        while self._history and not query.startswith(self._history[-1][0]):
+            self._history.pop()
+        if self._history:
+            return self._history[-1][1]
+        return range(len(self.index.lowered))
+
+    def search(self, query: str, limit: int = RESULT_LIMIT) -> List[Tuple[float, int]]:
+        """Лучшие совпадения: [(оценка, номер записи)] по убыванию оценки"""
+        query = ''.join(query.lower().split())
+        pattern = compile_query(query)
+        if pattern is None:
+            self._history.clear()
+            return []
+
+        search = pattern.search
+        lowered = self.index.lowered
+        bonuses = self.bonuses
+        if len(query) == 1:
+            # Один символ: проверка вхождения быстрее регулярного выражения
+            matched = [position for position in self._pool(query) if query in lowered[position]]
+        else:
+            matched = [position for position in self._pool(query) if search(lowered[position])]
+
+        candidates = matched
+        if len(matched) > SCORE_LIMIT:
+            # Короткий запрос подходит почти ко всему: оцениваются недавние
+            # каталоги и записи, имя которых начинается с запроса
+            component = os.sep + query
+            candidates = [position for position in matched
+                          if component in lowered[position] or lowered[position].startswith(query)
+                          or lowered[position] in bonuses][:SCORE_LIMIT]
+            if not candidates:
+                candidates = matched[:SCORE_LIMIT]
+        scored = [(score_match(search(lowered[position]), lowered[position],
+                               bonuses.get(lowered[position], 0.0)), position)
+                  for position in candidates]
+
+        self._history.append((query, matched))
+        return heapq.nlargest(limit, scored)
+
+
+_index_cache: Optional[NameIndex] = None
+
+
+def get_index(root: str) -> NameIndex:
+    """Индекс для root из кэша (не старше FINDER_INDEX_MAX_AGE) или новым обходом"""
+    global _index_cache
+    if (_index_cache is not None and _index_cache.root == root
+            and time.monotonic() - _index_cache.built < FINDER_INDEX_MAX_AGE):
+        return _index_cache
+
+    control = scanning.ScanControl(progress=scanning.print_progress)
+    with scanning.cancel_on_interrupt(control.token):
+        try:
+            index = NameIndex(root).build(control)
+        except OSError:
+            index = NameIndex(root)
+    scanning.clear_progress()
+    if control.partial:
+        print(f"Индекс неполный: {scanning.describe_partial(control)}")
+    else:
+        _index_cache = index
+    scanning.print_excluded(control)
+    return index
+
+
+def clear_index_cache() -> None:
+    """Сброс кэша индекса имен"""
+    global _index_cache
+    _index_cache = None
+
+
+def format_results(index: NameIndex, results: List[Tuple[float, int]]) -> str:
+    """Список совпадений с номерами для выбора"""
+    lines = []
+    for number, (_, position) in enumerate(results, 1):
+        marker = '[D]' if index.is_dir[position] else '[F]'
+        lines.append(f"  {number:2}. {marker} {index.paths[position]}")
+    return '\n'.join(lines) if lines else "  (нет совпадений)"
+
+
+def _target_directory(index: NameIndex, position: int) -> str:
+    path = os.path.join(index.root, index.paths[position])
+    # Для файла переходим в каталог, где он лежит
+    return path if index.is_dir[position] else os.path.dirname(path)
+
+
+def _read_keys(index: NameIndex, session: FinderSession) -> Optional[int]:
+    """Посимвольный ввод (msvcrt): результаты обновляются после каждой клавиши"""
+    query = ''
+    results: List[Tuple[float, int]] = []
+    while True:
+        sys.stdout.write(f"\rЗапрос: {query}  (Enter — выбрать, Esc — отмена)\n")
+        sys.stdout.write(format_results(index, results) + '\n')
+        sys.stdout.flush()
+        key = msvcrt.getwch()
+        if key == '\x1b':
+            return None
+        if key in ('\r', '\n'):
+            break
+        if key in ('\x00', '\xe0'):
+            # Функциональные клавиши приходят двумя кодами
+            msvcrt.getwch()
+            continue
+        if key == '\x08':
+            query = query[:-1]
+        elif key.isprintable():
+            query += key
+        started = time.perf_counter()
+        results = session.search(query)
+        sys.stdout.write(f"  найдено за {(time.perf_counter() - started) * 1000:.1f} мс\n")
+
+    if not results:
+        return None
+    choice = input("Номер (Enter — первый): ").strip()
+    return _choice(results, choice)
+
+
+def _read_lines(index: NameIndex, session: FinderSession) -> Optional[int]:
+    """Ввод строкой: запрос можно уточнять, не начиная поиск заново"""
+    results: List[Tuple[float, int]] = []
+    while True:
+        text = input("Запрос (номер — перейти, пусто — отмена): ").strip()
+        if not text:
+            return None
+        if text.isdigit() and results:
+            return _choice(results, text)
+        started = time.perf_counter()
+        results = session.search(text)
+        print(f"  найдено за {(time.perf_counter() - started) * 1000:.1f} мс")
+        print(format_results(index, results))
+
+
+def _choice(results: List[Tuple[float, int]], text: str) -> Optional[int]:
+    if not text:
+        return results[0][1]
+    if text.isdigit() and 1 <= int(text) <= len(results):
+        return results[int(text) - 1][1]
+    print("Некорректный номер")
+    return None
+
+
+def jump_to(current_path: str) -> str:
+    """Нечеткий поиск каталога или файла под current_path и переход к нему"""
+    index = get_index(current_path)
+    print(f"В индексе {len(index):,} записей")
+    session = FinderSession(index)
+    position = _read_keys(index, session) if msvcrt is not None else _read_lines(index, session)
+    if position is None:
+        return current_path
+    target = _target_directory(index, position)
+    if not os.path.isdir(target):
+        print(f"Каталог больше не существует: {target}")
+        return current_path
+    print(f"Переход в: {target}")
+    return target
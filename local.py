@@ -17,6 +17,11 @@ SEPARATOR2 = '''Некорректное использование раздел
 SEPARATOR3 = '''Некорректное использование разделителей пути(двойные разделители в UNC)'''
 SYMBOLS = '''Yе рекомендуется использовать символы:'''
 VALID = '''Путь валиден'''
+INSTRUMENT_TITLE = '''Инструментирование команды:'''
+INSTRUMENT_CALLS = '''вызовов'''
+INSTRUMENT_BYTES = '''Просмотрено байт: '''
+INSTRUMENT_RATE = '''Каталогов в секунду: '''
+INSTRUMENT_TOTAL = '''Общее время: '''
 
 #MAIN#
 SYSTEM1 = '''ОШИБКА: Эта программа предназначена только для Windows!'''
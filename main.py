@@ -64,6 +64,13 @@ def display_main_menu(current_path: str) -> None:
     print("  6. Переход в подкаталог")
     print("  7. Сменить диск")
     print("  8. Переход в специальную папку Windows")
+    print("  9. Вкл/выкл инструментирование сканирования")
+    print(" 10. Ограничения сканирования (глубина, записи, время)")
+    print(" 11. Крупнейшие подкаталоги текущей директории")
+    print(" 12. Векторная аналитика (numpy)")
+    print(" 13. Возраст файлов и устаревшие каталоги")
+    print(" 14. Статистика всех дисков (параллельно)")
+    print(" 15. Быстрый переход (нечеткий поиск по именам)")
     print("  0. Выход из программы")
     print("-" * 70)
 
@@ -80,7 +87,8 @@ def handle_windows_navigation(command: str, current_path: str) -> str:
     elif command == "6":  # Переход в подкаталог
         dir_name = input("Введите имя подкаталога: ").strip()
         if dir_name:
-            success, new_path = navigation.move_down(current_path, dir_name)
+            listing = navigation.get_prefetcher().listing(current_path)
+            success, new_path = navigation.move_down(current_path, dir_name, listing)
             if success:
                 print(f"Переход в: {new_path}")
                 return new_path
@@ -140,26 +148,103 @@ def handle_windows_navigation(command: str, current_path: str) -> str:
 def handle_windows_analysis(command: str, current_path: str) -> None:
     """Обработка команд анализа Windows файловой системы"""
     import analysis
+    import scanning
 
     if command == "2":  # Статистика текущей директории
         print(f"\nАнализ директории: {current_path}")
         analysis.show_windows_directory_stats(current_path)
 
     elif command == "4":  # Анализ типов файлов
+        answer = input("Определять тип также по содержимому файлов? (да/нет): ").strip().lower()
+        by_content = answer in ['да', 'д', 'yes', 'y']
         print(f"\nАнализ типов файлов в: {current_path}")
-        success, stats = analysis.analyze_windows_file_types(current_path)
+        control = scanning.ScanControl(progress=scanning.print_progress)
+        with scanning.cancel_on_interrupt(control.token):
+            if by_content:
+                import signatures
+                stats = analysis.new_type_statistic()
+                success, contents = signatures.analyze_content_types(current_path, control, stats)
+            else:
+                success, stats = analysis.analyze_windows_file_types(current_path, control)
+        scanning.clear_progress()
         if success:
+            if control.partial:
+                print(f"Статистика частичная: {scanning.describe_partial(control)}")
+            scanning.print_excluded(control)
+            import utils
             print("\nСтатистика по расширениям файлов:")
-            print("-" * 50)
+            print("-" * 90)
+            print(f"{'':10}   {'':12} {'':10} {'p50':>9} {'p90':>9} {'p99':>9}  гистограмма размеров")
             for ext, data in sorted(stats.items(), key=lambda x: -x[1]["size"]):
                 if ext:  # Пропускаем файлы без расширения
-                    import utils
-                    print(f"{ext:10} : {data['count']:4} файлов, {utils.format_size(data['size'])}")
-            print("-" * 50)
+                    p50, p90, p99 = (utils.format_size(analysis.type_percentile(data, q))
+                                     for q in analysis.SIZE_PERCENTILES)
+                    print(f"{ext:10} : {data['count']:4} файлов, {utils.format_size(data['size']):>10} "
+                          f"{p50:>9} {p90:>9} {p99:>9}  {analysis.format_size_histogram(data['buckets'])}")
+            print("-" * 90)
+            if by_content:
+                print("\nСтатистика по содержимому файлов:")
+                print("-" * 90)
+                for line in signatures.format_content_table(contents):
+                    print(line)
+                print("-" * 90)
         else:
             print("Ошибка при анализе типов файлов")
 
 
+def read_optional_number(prompt: str, cast=int):
+    """Ввод необязательного числа: пустая строка — без ограничения"""
+    while True:
+        value = input(prompt).strip()
+        if not value:
+            return None
+        try:
+            number = cast(value)
+        except ValueError:
+            print("Введите число или оставьте строку пустой")
+            continue
+        if number < 0:
+            print("Число не может быть отрицательным")
+            continue
+        return number
+
+
+def handle_scan_options() -> None:
+    """Настройка ограничений сканирования для текущей сессии"""
+    import scanning
+
+    options = scanning.get_default_options()
+    print("Текущие ограничения (пусто — без ограничения):")
+    print(f"  глубина: {options.max_depth}, записи: {options.max_entries}, время (с): {options.deadline}")
+
+    options.max_depth = read_optional_number("Максимальная глубина: ")
+    options.max_entries = read_optional_number("Максимум записей: ")
+    options.deadline = read_optional_number("Лимит времени в секундах: ", float)
+
+    print(f"  только текущий том: {'да' if options.same_filesystem else 'нет'}, "
+          f"исключенные точки монтирования: {', '.join(options.excluded_mounts) or 'нет'}")
+    answer = input("Не переходить на другие тома? (да/нет): ").strip().lower()
+    options.same_filesystem = answer in ['да', 'д', 'yes', 'y']
+    mounts = input("Исключенные точки монтирования через ';' (пусто — нет): ").strip()
+    options.excluded_mounts = [mount.strip() for mount in mounts.split(';') if mount.strip()]
+
+    print(f"  исключенные каталоги: {', '.join(options.exclude) or 'нет'}")
+    rules = input("Правила исключения через ';' (пусто — без изменений, '-' — стандартные): ").strip()
+    if rules == '-':
+        options.exclude = list(scanning.DEFAULT_EXCLUDES)
+    elif rules:
+        options.exclude = [rule.strip() for rule in rules.split(';') if rule.strip()]
+
+    print(f"  каталогов/с: {options.dirs_per_second}, метаданных/с: {options.stats_per_second}, "
+          f"байт/с: {options.bytes_per_second}, низкий приоритет: {'да' if options.low_priority else 'нет'}")
+    options.dirs_per_second = read_optional_number("Максимум каталогов в секунду: ", float)
+    options.stats_per_second = read_optional_number("Максимум запросов метаданных в секунду: ", float)
+    options.bytes_per_second = read_optional_number("Максимум байт чтения в секунду: ", float)
+    answer = input("Сканировать с низким приоритетом? (да/нет): ").strip().lower()
+    options.low_priority = answer in ['да', 'д', 'yes', 'y']
+    print("Ограничения сохранены")
+
+
 def handle_windows_search(command: str, current_path: str) -> None:
     """Обработка команд поиска в Windows"""
     import search
@@ -169,6 +254,34 @@ def handle_windows_search(command: str, current_path: str) -> None:
 
 
 def run_windows_command(command: str, current_path: str) -> str:
+    """Главный обработчик команд с отчетом инструментирования"""
+    import utils
+
+    if command == "9":  # Переключение инструментирования
+        utils.set_instrumentation(not utils.instrumentation_enabled())
+        state = "включено" if utils.instrumentation_enabled() else "выключено"
+        print(f"Инструментирование сканирования {state}")
+        return current_path
+
+    if not utils.instrumentation_enabled():
+        new_path = dispatch_windows_command(command, current_path)
+    else:
+        with utils.instrumented() as counters:
+            new_path = dispatch_windows_command(command, current_path)
+        print()
+        print(utils.format_instrumentation_report(counters))
+
+    if new_path != current_path:
+        # Подгрузка переключается на новый каталог, прежние данные отбрасываются
+        import navigation
+        navigation.get_prefetcher().focus(new_path)
+        # Посещенные каталоги поднимаются выше в быстром переходе
+        import finder
+        finder.record_visit(new_path)
+    return new_path
+
+
+def dispatch_windows_command(command: str, current_path: str) -> str:
     """Главный обработчик команд с использованием match case"""
     new_path = current_path
 
@@ -176,9 +289,10 @@ def run_windows_command(command: str, current_path: str) -> str:
         case "1":  # Просмотр содержимого текущей директории
             import navigation
             print(f"\nСодержимое директории: {current_path}")
-            success, items = navigation.list_directory(current_path)
-            if success:
-                navigation.format_directory_output(items)
+            if os.path.isdir(current_path):
+                # Содержимое, подгруженное в фоне, выводится без повторного чтения
+                listing = navigation.get_prefetcher().listing(current_path)
+                navigation.browse_directory(current_path, listing=listing)
             else:
                 print("Ошибка при получении содержимого директории")
 
@@ -191,6 +305,30 @@ def run_windows_command(command: str, current_path: str) -> str:
         case "5" | "6" | "7" | "8":  # Навигация
             new_path = handle_windows_navigation(command, current_path)
 
+        case "10":  # Ограничения сканирования
+            handle_scan_options()
+
+        case "11":  # Крупнейшие подкаталоги (дерево переиспользуется при переходах)
+            import analysis
+            analysis.show_largest_children(current_path)
+
+        case "12":  # Векторная аналитика
+            import columnar
+            columnar.show_columnar_report(current_path)
+
+        case "13":  # Возраст файлов
+            import analysis
+            days = read_optional_number("Считать каталог устаревшим через дней (по умолчанию 365): ", float)
+            analysis.show_file_age_report(current_path, 365 if days is None else days)
+
+        case "14":  # Все диски
+            import analysis
+            analysis.show_all_drives_stats()
+
+        case "15":  # Быстрый переход
+            import finder
+            new_path = finder.jump_to(current_path)
+
         case "0":  # Выход
             print("Выход из программы...")
             sys.exit(0)
@@ -230,6 +368,7 @@ def main() -> NoReturn:
 
     # 3. Основной цикл с использованием ВСЕХ модулей
     current_path = os.getcwd()
+    navigation.get_prefetcher().focus(current_path)
 
     while True:
         try:
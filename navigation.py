@@ -1,7 +1,12 @@
 import os
+import sys
+import heapq
 import ctypes
+import queue
+import threading
 from datetime import datetime
-from typing import List, Dict, Tuple, Any
+from itertools import islice
+from typing import List, Dict, Tuple, Any, Iterator, Iterable, Optional
 import utils
 
 
@@ -78,14 +83,17 @@ def list_directory(path: str) -> Tuple[bool, List[Dict[str, Any]]]:
         for item in items:
             full_path = os.path.join(path, item)
             is_hidden = utils.is_hidden_windows_file(full_path)
-            is_dir = os.path.isdir(full_path)
-            size = os.path.getsize(full_path) if not is_dir else 0
-            modified_time = datetime.fromtimestamp(os.path.getmtime(full_path)).strftime('%Y-%m-%d')
+            with utils.count_phase('stat'):
+                is_dir = os.path.isdir(full_path)
+                size = os.path.getsize(full_path) if not is_dir else 0
+                # Время изменения хранится как есть и форматируется только при выводе
+                modified_time = os.path.getmtime(full_path)
+            utils.count_bytes_seen(size)
             entries.append({
                 'name': item,
                 'type': 'folder' if is_dir else 'file',
                 'size': size,
-                'modified': modified_time,
+                'mtime': modified_time,
                 'hidden': is_hidden
             })
         return True, entries
@@ -93,6 +101,269 @@ def list_directory(path: str) -> Tuple[bool, List[Dict[str, Any]]]:
         return False, []
 
 
+def iter_directory(path: str) -> Iterator[Dict[str, Any]]:
+    """Потоковое чтение каталога через os.scandir.
+
+    Записи имеют тот же вид, что и в list_directory, и выдаются по мере
+    чтения; недоступные записи пропускаются.
+    """
+    try:
+        with utils.count_phase('listdir'):
+            scanner = os.scandir(path)
+    except OSError:
+        return
+
+    with scanner:
+        for entry in scanner:
+            try:
+                with utils.count_phase('stat'):
+                    is_dir = entry.is_dir()
+                    stat_result = entry.stat()
+                size = stat_result.st_size if not is_dir else 0
+                hidden = utils.file_attributes_from_stat(entry.path, stat_result)["hidden"]
+            except OSError:
+                continue
+            utils.count_bytes_seen(size)
+            yield {
+                'name': entry.name,
+                'type': 'folder' if is_dir else 'file',
+                'size': size,
+                'mtime': stat_result.st_mtime,
+                'hidden': hidden
+            }
+
+
+# Ключи сортировки постраничного просмотра: (функция ключа, по убыванию)
+SORT_KEYS = {
+    'name': (lambda item: item['name'].lower(), False),
+    'size': (lambda item: item['size'], True),
+    'mtime': (lambda item: item['mtime'], True),
+}
+
+
+def top_entries(entries: Iterable[Dict[str, Any]], count: int, sort_by: str) -> List[Dict[str, Any]]:
+    """Первые count записей в порядке сортировки без сортировки всего каталога"""
+    key, descending = SORT_KEYS[sort_by]
+    if descending:
+        return heapq.nlargest(count, entries, key=key)
+    return heapq.nsmallest(count, entries, key=key)
+
+
+class DirectoryPager:
+    """Постраничный просмотр каталога.
+
+    Без сортировки страницы берутся прямо из потока записей, и первая
+    страница появляется сразу. С сортировкой за один проход частично
+    сортируются только первые pages_ahead страниц; переход дальше
+    запускает новый проход с большим окном.
+    """
+
+    def __init__(self, path: str, page_size: int = 50, sort_by: Optional[str] = None,
+                 pages_ahead: int = 5, listing: Optional[List[Dict[str, Any]]] = None) -> None:
+        self.path = path
+        self.page_size = page_size
+        self.sort_by = sort_by
+        self.pages_ahead = pages_ahead
+        # Уже прочитанное содержимое (например, из DirectoryPrefetcher)
+        self.listing = listing
+        self._loaded: List[Dict[str, Any]] = []
+        self._stream: Optional[Iterator[Dict[str, Any]]] = None
+        self._exhausted = False
+
+    def page(self, number: int) -> List[Dict[str, Any]]:
+        """Записи страницы number (с нуля)"""
+        start = number * self.page_size
+        end = start + self.page_size
+
+        if self.sort_by is None:
+            if self._stream is None:
+                self._stream = self._entries()
+            if len(self._loaded) < end and not self._exhausted:
+                chunk = list(islice(self._stream, end - len(self._loaded)))
+                if len(self._loaded) + len(chunk) < end:
+                    self._exhausted = True
+                self._loaded.extend(chunk)
+        elif len(self._loaded) < end and not self._exhausted:
+            window = max(end, self.page_size * self.pages_ahead, len(self._loaded) * 2)
+            self._loaded = top_entries(self._entries(), window, self.sort_by)
+            self._exhausted = len(self._loaded) < window
+
+        return self._loaded[start:end]
+
+    def has_page(self, number: int) -> bool:
+        """Есть ли записи на странице number"""
+        return bool(self.page(number))
+
+    def _entries(self) -> Iterator[Dict[str, Any]]:
+        if self.listing is not None:
+            return iter(self.listing)
+        return iter_directory(self.path)
+
+
+# Очередь заданий фоновой подгрузки и число хранимых каталогов
+PREFETCH_QUEUE_SIZE = 64
+PREFETCH_MAX_DIRS = 64
+
+
+def _directory_mtime(path: str) -> Optional[float]:
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return None
+
+
+class DirectoryPrefetcher:
+    """Фоновая подгрузка содержимого текущего каталога и его подкаталогов.
+
+    После focus(path) фоновый поток читает path, а затем его подкаталоги,
+    чтобы следующий просмотр или переход вниз не ждал чтения каталога
+    (на сетевых дисках это заметно). Очередь заданий ограничена, лишние
+    задания отбрасываются. Переход в другой каталог сбрасывает очередь и
+    все сохраненное, кроме нового каталога и его подкаталогов. Сохраненное
+    содержимое выдается, только если время изменения каталога не менялось.
+    """
+
+    def __init__(self, queue_size: int = PREFETCH_QUEUE_SIZE, max_dirs: int = PREFETCH_MAX_DIRS) -> None:
+        self.max_dirs = max_dirs
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        # путь -> (время изменения до чтения, записи)
+        self._listings: Dict[str, Tuple[Optional[float], List[Dict[str, Any]]]] = {}
+        self._focus: Optional[str] = None
+        self._generation = 0
+        self._thread: Optional[threading.Thread] = None
+
+    def focus(self, path: str) -> None:
+        """Новый текущий каталог: прежние задания и данные отбрасываются"""
+        with self._lock:
+            self._generation += 1
+            generation = self._generation
+            self._focus = path
+            self._listings = {key: value for key, value in self._listings.items()
+                              if key == path or os.path.dirname(key) == path}
+        # Задания для прежнего каталога из очереди больше не нужны
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                break
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='directory-prefetch', daemon=True)
+            self._thread.start()
+        self._submit(generation, path, True)
+
+    def listing(self, path: str) -> Optional[List[Dict[str, Any]]]:
+        """Подгруженное содержимое path или None, если его нет или оно устарело"""
+        with self._lock:
+            cached = self._listings.get(path)
+        if cached is None:
+            return None
+        mtime, items = cached
+        if mtime is None or _directory_mtime(path) != mtime:
+            with self._lock:
+                self._listings.pop(path, None)
+            return None
+        return list(items)
+
+    def _submit(self, generation: int, path: str, expand: bool) -> None:
+        try:
+            self._queue.put_nowait((generation, path, expand))
+        except queue.Full:
+            pass
+
+    def _current(self, generation: int) -> bool:
+        with self._lock:
+            return generation == self._generation
+
+    def _run(self) -> None:
+        # Фоновое чтение не относится к измеряемой команде (см. utils.instrumented)
+        with utils.uncounted():
+            self._serve()
+
+    def _serve(self) -> None:
+        while True:
+            generation, path, expand = self._queue.get()
+            if not self._current(generation):
+                continue
+            items = self.listing(path)
+            if items is None:
+                # Время берется до чтения, чтобы изменение во время чтения не потерялось
+                mtime = _directory_mtime(path)
+                items = list(iter_directory(path))
+                with self._lock:
+                    if generation != self._generation or len(self._listings) >= self.max_dirs:
+                        continue
+                    self._listings[path] = (mtime, items)
+            if expand:
+                folders = [item['name'] for item in items if item['type'] == 'folder']
+                for name in folders[:self.max_dirs - 1]:
+                    self._submit(generation, os.path.join(path, name), False)
+
+
+_prefetcher: Optional[DirectoryPrefetcher] = None
+
+
+def get_prefetcher() -> DirectoryPrefetcher:
+    """Общий для сессии подгрузчик каталогов"""
+    global _prefetcher
+    if _prefetcher is None:
+        _prefetcher = DirectoryPrefetcher()
+    return _prefetcher
+
+
+def format_directory_page(items: List[Dict[str, Any]], start: int = 0) -> str:
+    """Текст блока записей каталога для вывода одним вызовом"""
+    lines = []
+    for index, item in enumerate(items, start + 1):
+        type_icon = '[D]' if item['type'] == 'folder' else '[F]'
+        size_str = format_size(item['size']) if item['type'] == 'file' else ''
+        hidden_marker = '(скрыто)' if item['hidden'] else ''
+        lines.append(f"{index:6}. {type_icon} {item['name']:40} {size_str:>10} {format_mtime(item['mtime'])} {hidden_marker}")
+    return '\n'.join(lines)
+
+
+def browse_directory(path: str, page_size: int = 50,
+                     listing: Optional[List[Dict[str, Any]]] = None) -> None:
+    """Интерактивный постраничный просмотр каталога"""
+    sort_by = None
+    pager = DirectoryPager(path, page_size, listing=listing)
+    number = 0
+
+    while True:
+        items = pager.page(number)
+        if not items and number == 0:
+            print("Пустая директория.")
+            return
+        sys.stdout.write(format_directory_page(items, number * page_size) + '\n')
+        sys.stdout.flush()
+
+        order = {'name': 'по имени', 'size': 'по размеру', 'mtime': 'по дате'}.get(sort_by, 'без сортировки')
+        command = input(f"[стр. {number + 1}, {order}] Enter — далее, p — назад, "
+                        f"n/s/m — сортировка по имени/размеру/дате, q — выход: ").strip().lower()
+        if command == 'q':
+            return
+        if command == 'p':
+            number = max(number - 1, 0)
+        elif command in ('n', 's', 'm'):
+            sort_by = {'n': 'name', 's': 'size', 'm': 'mtime'}[command]
+            pager = DirectoryPager(path, page_size, sort_by, listing=listing)
+            number = 0
+        elif pager.has_page(number + 1):
+            number += 1
+        else:
+            print("Это последняя страница.")
+
+
+def format_mtime(mtime: float) -> str:
+    """Дата изменения для вывода (пустая строка, если время неизвестно)"""
+    if not mtime:
+        return ''
+    try:
+        return datetime.fromtimestamp(mtime).strftime('%Y-%m-%d')
+    except (OverflowError, OSError, ValueError):
+        return ''
+
+
 def format_size(size_bytes: int) -> str:
     # Форматирование размера файла
     for unit in ['B', 'KB', 'MB', 'GB', 'TB']:
@@ -107,12 +378,16 @@ def format_directory_output(items: List[Dict[str, Any]]) -> None:
     if not items:
         print("Пустая директория.")
         return
+    lines = []
     for item in items:
         name = item['name']
         type_icon = '[D]' if item['type'] == 'folder' else '[F]'
         size_str = format_size(item['size']) if item['type'] == 'file' else ''
         hidden_marker = '(скрыто)' if item['hidden'] else ''
-        print(f"{type_icon} {name} {size_str} {hidden_marker}")
+        lines.append(f"{type_icon} {name} {size_str} {hidden_marker}")
+    # Один вызов write вместо print на каждую запись
+    sys.stdout.write('\n'.join(lines) + '\n')
+    sys.stdout.flush()
 
 
 def move_up(current_path: str) -> str:
@@ -126,15 +401,30 @@ def move_up(current_path: str) -> str:
         return current_path
 
 
-def move_down(current_path: str, target_dir: str) -> Tuple[bool, str]:
-    """Переход в указанный подкаталог в Windows"""
+def move_down(current_path: str, target_dir: str,
+              listing: Optional[List[Dict[str, Any]]] = None) -> Tuple[bool, str]:
+    """Переход в указанный подкаталог в Windows.
+
+    Если известно содержимое текущего каталога (listing) и цель — одно
+    имя, наличие подкаталога проверяется по нему без обращения к диску,
+    иначе (нет listing, путь из нескольких частей) — на диске.
+    """
     new_path = os.path.join(current_path, target_dir)
     valid, msg = utils.validate_windows_path(new_path)
-    if valid:
-        return True, new_path
-    else:
+    single_name = (os.path.basename(target_dir) == target_dir and not os.path.splitdrive(target_dir)[0]
+                   and target_dir not in (os.curdir, os.pardir))
+    if not valid:
         print(f"Ошибка при переходе: {msg}")
         return False, current_path
+    if listing is not None and single_name:
+        wanted = os.path.normcase(target_dir)
+        found = any(item['type'] == 'folder' and os.path.normcase(item['name']) == wanted for item in listing)
+    else:
+        found = os.path.isdir(new_path)
+    if not found:
+        print(f"Ошибка при переходе: подкаталог '{target_dir}' не найден")
+        return False, current_path
+    return True, new_path
 
 
 def get_windows_special_folders() -> Dict[str, str]:
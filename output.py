@@ -0,0 +1,126 @@
+import json
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence, TextIO
+
+
+class NDJSONWriter:
+    """Потоковая запись результатов: один JSON объект на строку.
+
+    Записи копятся в небольшом буфере и сбрасываются каждые flush_every
+    записей или flush_interval секунд. Срок проверяется и при записи, и
+    фоновым таймером, поэтому при редких совпадениях в медленном обходе
+    найденное не задерживается в буфере. Запись синхронная, поэтому
+    медленный читатель канала (jq, загрузчик) притормаживает сам обход,
+    а память не растет. Если читатель закрыл канал, broken становится True.
+    """
+
+    def __init__(self, stream: TextIO, flush_every: int = 256, flush_interval: float = 1.0) -> None:
+        self.stream = stream
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self.written = 0
+        self.broken = False
+        self._buffer: List[str] = []
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        self._timer: Optional[threading.Thread] = None
+
+    def write(self, record: Dict[str, Any]) -> bool:
+        """Добавление записи; False, если читатель больше не принимает данные"""
+        line = json.dumps(record, ensure_ascii=False)
+        with self._lock:
+            if self.broken:
+                return False
+            self._buffer.append(line)
+            self.written += 1
+            if (len(self._buffer) >= self.flush_every
+                    or time.monotonic() - self._last_flush >= self.flush_interval):
+                self._flush()
+            broken = self.broken
+        if self._timer is None and not broken:
+            self._start_timer()
+        return not broken
+
+    def _start_timer(self) -> None:
+        # Таймер запускается с первой записью: пустой поток не держит поток
+        self._timer = threading.Thread(target=self._flush_periodically, daemon=True)
+        self._timer.start()
+
+    def _flush_periodically(self) -> None:
+        while not self._closed.wait(self.flush_interval):
+            with self._lock:
+                if self.broken:
+                    return
+                if self._buffer and time.monotonic() - self._last_flush >= self.flush_interval:
+                    self._flush()
+
+    def flush(self) -> None:
+        """Сброс буфера в поток"""
+        with self._lock:
+            self._flush()
+
+    def _flush(self) -> None:
+        if self.broken:
+            self._buffer.clear()
+            return
+        try:
+            if self._buffer:
+                self.stream.write('\n'.join(self._buffer) + '\n')
+                self._buffer.clear()
+            self.stream.flush()
+        except BrokenPipeError:
+            self.broken = True
+            self._buffer.clear()
+        self._last_flush = time.monotonic()
+
+    def close(self) -> None:
+        """Остановка таймера и сброс остатка буфера"""
+        self._closed.set()
+        if self._timer is not None:
+            self._timer.join()
+        self.flush()
+
+    def __enter__(self) -> 'NDJSONWriter':
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+
+class BufferedTableWriter:
+    """Вывод таблицы блоками строк одним вызовом write вместо print на строку"""
+
+    def __init__(self, stream: TextIO, widths: Sequence[int], buffer_rows: int = 512) -> None:
+        self.stream = stream
+        self.widths = widths
+        self.buffer_rows = buffer_rows
+        self.rows = 0
+        self._buffer: List[str] = []
+
+    def line(self, text: str) -> None:
+        """Произвольная строка (заголовок, разделитель)"""
+        self._buffer.append(text)
+        if len(self._buffer) >= self.buffer_rows:
+            self.flush()
+
+    def row(self, *cells: Any) -> None:
+        """Строка таблицы; последняя ячейка не выравнивается"""
+        parts = [f"{str(cell):{width}}" for cell, width in zip(cells, self.widths)]
+        parts.extend(str(cell) for cell in cells[len(self.widths):])
+        self.rows += 1
+        self.line(' '.join(parts))
+
+    def flush(self) -> None:
+        """Сброс накопленных строк"""
+        if self._buffer:
+            self.stream.write('\n'.join(self._buffer) + '\n')
+            self._buffer.clear()
+        self.stream.flush()
+
+    def __enter__(self) -> 'BufferedTableWriter':
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.flush()
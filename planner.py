@@ -0,0 +1,306 @@
+import os
+import time
+from collections import namedtuple
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+import scanning
+import resultset
+import search
+import snapshot
+
+# Способы выполнения запроса
+STRATEGY_INDEX = 'index'
+STRATEGY_PARTIAL = 'partial'
+STRATEGY_LIVE = 'live'
+
+STRATEGY_NAMES = {
+    STRATEGY_INDEX: 'ответ из индекса',
+    STRATEGY_PARTIAL: 'индекс и обход устаревших каталогов',
+    STRATEGY_LIVE: 'полный обход',
+}
+
+# Чтение каталога стоит одно обращение плюс одно на каждые
+# ENTRIES_PER_READ записей (столько примерно приходит за один вызов)
+ENTRIES_PER_READ = 64
+# Если среди первых STALE_SAMPLE проверенных каталогов устарело больше
+# STALE_LIMIT, проверка прекращается и выбирается полный обход
+STALE_SAMPLE = 256
+STALE_LIMIT = 0.5
+
+IndexedStat = namedtuple('IndexedStat', 'st_size st_mtime')
+
+
+class QueryPlan:
+    """Выбранный способ выполнения запроса и его стоимость.
+
+    Стоимость считается в обращениях к файловой системе: stat файла или
+    каталога и чтение каталога (см. ENTRIES_PER_READ). estimated_cost —
+    оценка до выполнения (None, если оценить не по чему), live_cost —
+    оценка полного обхода, actual_cost — фактическое число обращений.
+    """
+
+    def __init__(self, root: str, strategy: str, reason: str) -> None:
+        self.root = root
+        self.strategy = strategy
+        self.reason = reason
+        self.index: Optional[snapshot.Snapshot] = None
+        self.start = -1
+        self.stale: Set[int] = set()
+        self.missing: Set[int] = set()
+        self.checked = 0
+        self.estimated_cost: Optional[int] = None
+        self.live_cost: Optional[int] = None
+        self.actual_cost: Optional[int] = None
+        self.elapsed = 0.0
+
+    def describe(self) -> str:
+        """Описание плана и стоимости для вывода"""
+        lines = [f"План: {STRATEGY_NAMES[self.strategy]} ({self.reason})"]
+        if self.strategy != STRATEGY_LIVE:
+            lines.append(f"  проверено каталогов индекса: {self.checked:,}, "
+                         f"устарело: {len(self.stale):,}, удалено: {len(self.missing):,}")
+        estimate = 'неизвестна' if self.estimated_cost is None else f"{self.estimated_cost:,}"
+        line = f"  стоимость, обращений к ФС: оценка {estimate}"
+        if self.actual_cost is not None:
+            line += f", фактически {self.actual_cost:,} за {self.elapsed:.2f} с"
+        if self.live_cost is not None and self.strategy != STRATEGY_LIVE:
+            line += f" (полный обход — около {self.live_cost:,})"
+        lines.append(line)
+        return '\n'.join(lines)
+
+    def close(self) -> None:
+        if self.index is not None:
+            self.index.close()
+            self.index = None
+
+
+def _locate(index: snapshot.Snapshot, children: List[List[int]], path: str) -> int:
+    """Номер каталога снимка для path или -1, если его нет в снимке"""
+    root_key = os.path.normcase(os.path.abspath(index.root))
+    key = os.path.normcase(os.path.abspath(path))
+    if key == root_key:
+        return 0 if index.dir_count else -1
+    if not key.startswith(root_key.rstrip(os.sep) + os.sep):
+        return -1
+
+    current = 0
+    for component in os.path.relpath(key, root_key).split(os.sep):
+        for child in children[current]:
+            if os.path.normcase(index.string(index.dir_name[child])) == component:
+                current = child
+                break
+        else:
+            return -1
+    return current
+
+
+def _subtree(children: List[List[int]], start: int) -> List[int]:
+    """Каталоги поддерева start, родители раньше детей"""
+    order = [start]
+    position = 0
+    while position < len(order):
+        order.extend(children[order[position]])
+        position += 1
+    return order
+
+
+def plan_query(query: search.SearchQuery, root: str, index_path: Optional[str] = None,
+               options: Optional[scanning.ScanOptions] = None) -> QueryPlan:
+    """Выбор способа выполнения запроса.
+
+    Если есть снимок-индекс, содержащий каталог поиска, для каждого
+    каталога поддерева сравнивается текущее время изменения с записанным.
+    Время каталога меняется при добавлении, удалении и переименовании
+    записей, но не при перезаписи файла, поэтому индекс считается свежим
+    с этой оговоркой. Без устаревших каталогов запрос выполняется по
+    индексу, иначе — по индексу с чтением только устаревших каталогов.
+    Полный обход выбирается, если индекса нет, он частичный (обход при
+    записи был остановлен или ограничен), записан с другими параметрами
+    обхода, чем options (по умолчанию — текущие), сильно устарел (см.
+    STALE_LIMIT) или если его оценка не дешевле полного обхода.
+    """
+    if options is None:
+        options = scanning.get_default_options()
+    start_path = query.start_directory(root)
+    if not index_path:
+        return QueryPlan(root, STRATEGY_LIVE, "индекс не задан")
+    try:
+        index = snapshot.Snapshot(index_path)
+    except (OSError, snapshot.SnapshotError) as e:
+        return QueryPlan(root, STRATEGY_LIVE, f"индекс недоступен: {e}")
+
+    if index.partial:
+        # В непросканированных каталогах время изменения не менялось, и
+        # проверка свежести сочла бы их свежими, потеряв их файлы
+        index.close()
+        return QueryPlan(root, STRATEGY_LIVE, "индекс частичный")
+    if not index.built_with(options):
+        # Другие исключения или границы томов: в индексе не те каталоги
+        index.close()
+        return QueryPlan(root, STRATEGY_LIVE, "индекс построен с другими параметрами обхода")
+
+    children = index.children()
+    start = _locate(index, children, start_path)
+    if start < 0:
+        index.close()
+        return QueryPlan(root, STRATEGY_LIVE, "каталог поиска не входит в индекс")
+
+    plan = QueryPlan(root, STRATEGY_INDEX, "индекс свежий")
+    plan.index = index
+    plan.start = start
+
+    # Оценка полного обхода по содержимому индекса
+    per_file = 1 if query.needs_stat else 0
+    subtree = _subtree(children, start)
+    entries = sum(index.dir_file_count[directory] + len(children[directory]) for directory in subtree)
+    plan.live_cost = len(subtree) + entries // ENTRIES_PER_READ + index.dir_total_files[start] * per_file
+
+    # Проверка свежести: один stat на каталог, удаленные поддеревья не проверяются
+    missing_parents: Set[int] = set()
+    stale_entries = 0
+    stale_files = 0
+    for directory in subtree:
+        parent = index.dir_parent[directory]
+        if parent in missing_parents:
+            missing_parents.add(directory)
+            continue
+        plan.checked += 1
+        try:
+            current = os.stat(index.dir_path(directory)).st_mtime
+        except OSError:
+            plan.missing.add(directory)
+            missing_parents.add(directory)
+            continue
+        if current != index.dir_mtime[directory]:
+            plan.stale.add(directory)
+            stale_files += index.dir_file_count[directory]
+            stale_entries += index.dir_file_count[directory] + len(children[directory])
+
+        if (plan.checked == STALE_SAMPLE
+                and len(plan.stale) + len(plan.missing) > plan.checked * STALE_LIMIT):
+            plan.strategy = STRATEGY_LIVE
+            plan.reason = "индекс сильно устарел"
+            plan.estimated_cost = plan.live_cost
+            plan.close()
+            return plan
+
+    plan.estimated_cost = (plan.checked + len(plan.stale) + stale_entries // ENTRIES_PER_READ
+                           + stale_files * per_file)
+    if plan.estimated_cost >= plan.live_cost:
+        plan.strategy = STRATEGY_LIVE
+        plan.reason = f"по индексу не дешевле: оценка {plan.estimated_cost:,}"
+        plan.estimated_cost = plan.live_cost
+        plan.close()
+    elif plan.stale or plan.missing:
+        plan.strategy = STRATEGY_PARTIAL
+        plan.reason = "устарела часть каталогов"
+    return plan
+
+
+class IndexedFile:
+    """Файл из индекса с тем же набором методов, что у search.QueryCandidate"""
+
+    __slots__ = ('path', 'name', '_item')
+
+    def __init__(self, dir_path: str, item: Dict[str, Any]) -> None:
+        self.name = item["name"]
+        self.path = os.path.join(dir_path, self.name)
+        self._item = item
+
+    def stat(self) -> IndexedStat:
+        # Только поля, которые читают проверки запроса
+        return IndexedStat(self._item["size"], self._item["mtime"])
+
+    def attributes(self) -> Dict[str, bool]:
+        return {name: self._item[name] for name in search.QUERY_ATTRIBUTES}
+
+
+def _index_matches(plan: QueryPlan, checks: List[Any], control: scanning.ScanControl
+                   ) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    index = plan.index
+    children = index.children()
+    rules = scanning.ExcludeRules(control.options.exclude)
+
+    pending = [plan.start]
+    while pending:
+        if control.should_stop():
+            return
+        directory = pending.pop()
+        if directory in plan.missing:
+            continue
+        dir_path = index.dir_path(directory)
+        indexed = {index.string(index.dir_name[child]): child for child in children[directory]}
+        for name, child in sorted(indexed.items(), reverse=True):
+            relative = os.path.relpath(os.path.join(dir_path, name), plan.root).replace(os.sep, '/')
+            if rules and rules.excluded(name, relative):
+                control.skipped_excluded += 1
+            else:
+                pending.append(child)
+
+        if directory not in plan.stale:
+            if control.directory_mtimes is not None:
+                control.directory_mtimes[dir_path] = index.dir_mtime[directory]
+            first = index.dir_first_file[directory]
+            for position in range(first, first + index.dir_file_count[directory]):
+                item = index.file_item(position)
+                if all(check(IndexedFile(dir_path, item)) for check in checks):
+                    yield dir_path, item
+            continue
+
+        # Устаревший каталог читается заново; новые подкаталоги обходятся целиком
+        control.throttle(scanning.THROTTLE_DIRS)
+        if control.directory_mtimes is not None:
+            control.directory_mtimes[dir_path] = scanning.directory_mtime(dir_path)
+        items = scanning.list_entries(dir_path, control)
+        control.dirs_done += 1
+        if items is None:
+            continue
+        control.entries_seen += len(items)
+        yield from search.query_matches_in(dir_path, items, checks, control)
+        for item in items:
+            if item["type"] != "folder" or item["name"] in indexed:
+                continue
+            new_path = os.path.join(dir_path, item["name"])
+            relative = os.path.relpath(new_path, plan.root).replace(os.sep, '/')
+            if rules and rules.excluded(item["name"], relative):
+                control.skipped_excluded += 1
+                continue
+            try:
+                for sub_path, sub_items in scanning.walk_entries(new_path, control):
+                    yield from search.query_matches_in(sub_path, sub_items, checks, control)
+            except OSError:
+                continue
+
+
+def execute_plan(plan: QueryPlan, query: search.SearchQuery,
+                 control: Optional[scanning.ScanControl] = None) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """Выполнение плана: поток пар (каталог, элемент), как у search.iter_query_matches.
+
+    По завершении заполняет plan.actual_cost и закрывает индекс.
+    """
+    if control is None:
+        control = scanning.ScanControl()
+    started = time.monotonic()
+    dirs_before = control.dirs_done
+    entries_before = control.entries_seen
+    stats_before = control.stat_calls
+    try:
+        if plan.strategy == STRATEGY_LIVE:
+            yield from search.iter_query_matches(query, plan.root, control)
+        else:
+            checks = [check for _, check in query.predicates(plan.root)]
+            yield from _index_matches(plan, checks, control)
+    finally:
+        plan.elapsed = time.monotonic() - started
+        plan.actual_cost = (plan.checked + control.dirs_done - dirs_before
+                            + (control.entries_seen - entries_before) // ENTRIES_PER_READ
+                            + control.stat_calls - stats_before)
+        plan.close()
+
+
+def find_planned(query: search.SearchQuery, root: str, index_path: Optional[str] = None,
+                 control: Optional[scanning.ScanControl] = None) -> Tuple[resultset.ResultSet, QueryPlan]:
+    """Поиск по запросу с выбором между индексом и обходом"""
+    plan = plan_query(query, root, index_path, control.options if control is not None else None)
+    results = resultset.ResultSet(search.make_result_record(dir_path, item)
+                                  for dir_path, item in execute_plan(plan, query, control))
+    return results, plan
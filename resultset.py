@@ -0,0 +1,133 @@
+import heapq
+import json
+import tempfile
+from itertools import islice
+from typing import Any, Callable, Iterable, Iterator, List, Optional
+
+# Сколько записей держится в памяти до сброса во временный файл
+RESULT_MEMORY_LIMIT = 50000
+# Объем одного чтения временного файла при обходе
+READ_BLOCK = 1 << 16
+
+
+def _encode(item: Any) -> bytes:
+    return json.dumps(item, ensure_ascii=False).encode('utf-8') + b'\n'
+
+
+class ResultSet:
+    """Набор результатов поиска, ограниченный по памяти.
+
+    Первые memory_limit записей хранятся в списке, при переполнении список
+    сбрасывается во временный файл (одна запись JSON на строку) и
+    начинается заново. Набор поддерживает len(), повторный обход в порядке
+    добавления и сортировку внешним слиянием (см. sorted). Записи — строки
+    путей или словари из JSON-совместимых значений. Временные файлы
+    удаляются при close() или сборке мусора.
+    """
+
+    def __init__(self, items: Iterable[Any] = (), memory_limit: Optional[int] = None) -> None:
+        if memory_limit is None:
+            memory_limit = RESULT_MEMORY_LIMIT
+        self.memory_limit = max(memory_limit, 1)
+        self._memory: List[Any] = []
+        self._file = None
+        self._spilled = 0
+        self.extend(items)
+
+    @property
+    def spilled(self) -> bool:
+        """Часть записей лежит во временном файле"""
+        return self._spilled > 0
+
+    def append(self, item: Any) -> None:
+        self._memory.append(item)
+        if len(self._memory) >= self.memory_limit:
+            self._spill()
+
+    def extend(self, items: Iterable[Any]) -> None:
+        for item in items:
+            self.append(item)
+
+    def _spill(self) -> None:
+        if self._file is None:
+            self._file = tempfile.TemporaryFile()
+        self._file.seek(0, 2)
+        self._file.writelines(_encode(item) for item in self._memory)
+        self._spilled += len(self._memory)
+        self._memory = []
+
+    def __len__(self) -> int:
+        return self._spilled + len(self._memory)
+
+    def __iter__(self) -> Iterator[Any]:
+        # Границы запоминаются заранее: добавленное во время обхода не читается.
+        # Позиция чтения своя у каждого обхода, поэтому обходы не мешают друг другу
+        remaining = self._spilled
+        memory = list(self._memory)
+        position = 0
+        while remaining > 0 and self._file is not None:
+            self._file.seek(position)
+            lines = self._file.readlines(READ_BLOCK)[:remaining]
+            if not lines:
+                break
+            position = self._file.tell()
+            remaining -= len(lines)
+            for line in lines:
+                yield json.loads(line)
+        yield from memory
+
+    def sorted(self, key: Optional[Callable[[Any], Any]] = None, reverse: bool = False) -> 'ResultSet':
+        """Новый отсортированный набор.
+
+        Если все записи в памяти, это обычная сортировка. Иначе записи
+        читаются порциями по memory_limit, каждая порция сортируется и
+        пишется во временный файл, а порции сливаются heapq.merge; в памяти
+        одновременно находится одна порция либо по строке каждой порции.
+        """
+        if not self.spilled:
+            return ResultSet(sorted(self._memory, key=key, reverse=reverse), self.memory_limit)
+
+        runs = []
+        try:
+            for chunk in chunks(self, self.memory_limit):
+                chunk.sort(key=key, reverse=reverse)
+                run = tempfile.TemporaryFile()
+                runs.append(run)
+                run.writelines(_encode(item) for item in chunk)
+                run.seek(0)
+            streams = [map(json.loads, run) for run in runs]
+            return ResultSet(heapq.merge(*streams, key=key, reverse=reverse), self.memory_limit)
+        finally:
+            for run in runs:
+                run.close()
+
+    def close(self) -> None:
+        """Удаление временного файла и очистка набора"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self._spilled = 0
+        self._memory = []
+
+    def __enter__(self) -> 'ResultSet':
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+    def __del__(self) -> None:
+        if self._file is not None:
+            self._file.close()
+
+    def __repr__(self) -> str:
+        return f"ResultSet({len(self)} записей, на диске {self._spilled})"
+
+
+def chunks(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    """Последовательные порции по size элементов"""
+    iterator = iter(items)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
@@ -0,0 +1,670 @@
+import copy
+import fnmatch
+import os
+import platform
+import re
+import signal
+import sys
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, TextIO, Tuple
+import navigation
+import utils
+
+# Обратный вызов прогресса: (каталогов обработано, файлов обработано, текущий путь)
+ProgressCallback = Callable[[int, int, str], None]
+
+
+class CancelToken:
+    """Флаг кооперативной отмены обхода"""
+
+    def __init__(self) -> None:
+        self._event = threading.Event()
+
+    def cancel(self) -> None:
+        """Запрос отмены; обход остановится на ближайшем каталоге"""
+        self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def wait(self, timeout: float) -> bool:
+        """Пауза до timeout секунд; прерывается отменой"""
+        return self._event.wait(timeout)
+
+
+class RateLimiter:
+    """Ограничитель частоты по схеме "ведро с токенами".
+
+    Ведро пополняется со скоростью rate в секунду до burst токенов.
+    Запрос больше остатка уводит ведро в долг, и вызывающий поток спит,
+    пока долг не погасится, поэтому средняя скорость не превышает rate.
+    """
+
+    def __init__(self, rate: float, burst: Optional[float] = None) -> None:
+        self.rate = float(rate)
+        self.burst = float(burst if burst is not None else max(rate, 1.0))
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, amount: float = 1.0, token: Optional[CancelToken] = None) -> None:
+        """Списание amount токенов с ожиданием при нехватке"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= amount
+            delay = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if delay > 0:
+            if token is not None:
+                token.wait(delay)
+            else:
+                time.sleep(delay)
+
+
+# Виды ограничиваемых операций
+THROTTLE_DIRS = 'dirs'
+THROTTLE_STATS = 'stats'
+THROTTLE_BYTES = 'bytes'
+
+# Режим фонового приоритета потока в Windows (SetThreadPriority)
+THREAD_MODE_BACKGROUND_BEGIN = 0x00010000
+THREAD_MODE_BACKGROUND_END = 0x00020000
+# Приращение nice для остальных систем
+LOW_PRIORITY_NICE = 10
+
+_process_niced = False
+
+
+@contextmanager
+def background_priority() -> Iterator[None]:
+    """Пониженный приоритет процессора и ввода-вывода на время блока.
+
+    В Windows поток переводится в фоновый режим, и планировщик дисков
+    обслуживает его после остальных. В других системах процессу один раз
+    повышается nice; вернуть его обратно без прав администратора нельзя.
+    """
+    global _process_niced
+    background = False
+    if platform.system() == "Windows":
+        try:
+            import ctypes
+            kernel32 = ctypes.windll.kernel32
+            background = bool(kernel32.SetThreadPriority(kernel32.GetCurrentThread(),
+                                                         THREAD_MODE_BACKGROUND_BEGIN))
+        except Exception:
+            pass
+    elif hasattr(os, 'nice') and not _process_niced:
+        try:
+            os.nice(LOW_PRIORITY_NICE)
+            _process_niced = True
+        except OSError:
+            pass
+    try:
+        yield
+    finally:
+        if background:
+            import ctypes
+            kernel32 = ctypes.windll.kernel32
+            kernel32.SetThreadPriority(kernel32.GetCurrentThread(), THREAD_MODE_BACKGROUND_END)
+
+
+# Причины досрочной остановки обхода
+STOP_CANCELLED = 'cancelled'
+STOP_DEADLINE = 'deadline'
+STOP_ENTRIES = 'entries'
+STOP_DEPTH = 'depth'
+
+STOP_REASONS = {
+    STOP_CANCELLED: 'прервано пользователем',
+    STOP_DEADLINE: 'истек лимит времени',
+    STOP_ENTRIES: 'исчерпан лимит записей',
+    STOP_DEPTH: 'достигнут лимит глубины',
+}
+
+
+# Каталоги, в которые обходчики не спускаются по умолчанию
+DEFAULT_EXCLUDES = (
+    'node_modules',
+    '.git',
+    '.svn',
+    '.hg',
+    '__pycache__',
+    '$Recycle.Bin',
+    'System Volume Information',
+)
+
+
+def load_ignore_file(path: str) -> List[str]:
+    """Чтение правил исключения в стиле .gitignore.
+
+    Пустые строки и строки с '#' пропускаются. Правила относятся только
+    к каталогам, поэтому завершающий '/' допускается и ни на что не влияет.
+    """
+    patterns = []
+    with open(path, encoding='utf-8') as file:
+        for line in file:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            patterns.append(line)
+    return patterns
+
+
+class ExcludeRules:
+    """Правила исключения каталогов.
+
+    Правило без '/' сравнивается с именем каталога на любой глубине,
+    правило с '/' — с путем относительно корня обхода ('/' в начале
+    привязывает его к корню). Правило с '!' возвращает каталог обратно;
+    как в .gitignore, побеждает последнее совпавшее правило.
+    Сравнение без учета регистра, как в файловой системе Windows.
+    """
+
+    def __init__(self, patterns: Iterable[str]) -> None:
+        self.patterns = list(patterns)
+        self._rules: List[Tuple[bool, bool, Any]] = []
+        translated = []
+        for pattern in self.patterns:
+            negated = pattern.startswith('!')
+            if negated:
+                pattern = pattern[1:]
+            pattern = pattern.replace('\\', '/').rstrip('/')
+            if not pattern:
+                continue
+            anchored = '/' in pattern
+            translated.append(fnmatch.translate(pattern.lstrip('/')))
+            self._rules.append((negated, anchored, re.compile(translated[-1], re.IGNORECASE).match))
+        # Только простые правила по имени — одно регулярное выражение на все
+        self._simple = None
+        if self._rules and not any(negated or anchored for negated, anchored, _ in self._rules):
+            self._simple = re.compile('|'.join(translated), re.IGNORECASE).match
+
+    def __bool__(self) -> bool:
+        return bool(self._rules)
+
+    def excluded(self, name: str, relative: str) -> bool:
+        """Исключен ли каталог name с путем relative (через '/') от корня"""
+        if self._simple is not None:
+            return self._simple(name) is not None
+        result = False
+        for negated, anchored, match in self._rules:
+            if match(relative if anchored else name):
+                result = not negated
+        return result
+
+
+class ScanOptions:
+    """Параметры обхода, общие для всех обходчиков.
+
+    max_depth — глубина спуска (0 — только сам корень),
+    max_entries — максимум просмотренных записей,
+    deadline — лимит времени обхода в секундах.
+    None означает отсутствие ограничения.
+    same_filesystem — не спускаться в каталоги на другом томе,
+    excluded_mounts — точки монтирования, в которые не спускаться,
+    exclude — правила исключения каталогов (см. ExcludeRules),
+    dirs_per_second, stats_per_second, bytes_per_second — ограничения
+    частоты чтения каталогов, запросов метаданных и объема чтения файлов,
+    low_priority — обход с пониженным приоритетом.
+    """
+
+    def __init__(self, max_depth: Optional[int] = None, max_entries: Optional[int] = None,
+                 deadline: Optional[float] = None, same_filesystem: bool = False,
+                 excluded_mounts: Iterable[str] = (),
+                 exclude: Iterable[str] = DEFAULT_EXCLUDES,
+                 dirs_per_second: Optional[float] = None, stats_per_second: Optional[float] = None,
+                 bytes_per_second: Optional[float] = None, low_priority: bool = False) -> None:
+        self.max_depth = max_depth
+        self.max_entries = max_entries
+        self.deadline = deadline
+        self.same_filesystem = same_filesystem
+        self.excluded_mounts = list(excluded_mounts)
+        self.exclude = list(exclude)
+        self.dirs_per_second = dirs_per_second
+        self.stats_per_second = stats_per_second
+        self.bytes_per_second = bytes_per_second
+        self.low_priority = low_priority
+
+    @property
+    def throttled(self) -> bool:
+        return any(rate for rate in (self.dirs_per_second, self.stats_per_second, self.bytes_per_second))
+
+    def fingerprint(self) -> Tuple[Any, ...]:
+        """Параметры, от которых зависит набор пройденных каталогов.
+
+        Ограничения частоты и приоритет на результат не влияют и не входят.
+        """
+        return (self.max_depth, self.max_entries, self.deadline, self.same_filesystem,
+                tuple(sorted(normalize_mount(path) for path in self.excluded_mounts)),
+                tuple(self.exclude))
+
+
+def normalize_mount(path: str) -> str:
+    """Ключ пути для сравнения с исключенными точками монтирования"""
+    return os.path.normcase(os.path.abspath(path)).rstrip('\\/') or os.sep
+
+
+def device_of(path: str) -> Optional[int]:
+    """Идентификатор тома, на котором находится path"""
+    try:
+        with utils.count_phase('stat'):
+            return os.stat(path).st_dev
+    except OSError:
+        return None
+
+
+def directory_mtime(path: str) -> Optional[float]:
+    """Время изменения каталога или None, если он недоступен"""
+    try:
+        with utils.count_phase('stat'):
+            return os.stat(path).st_mtime
+    except OSError:
+        return None
+
+
+# Параметры по умолчанию для обходов текущей сессии
+_default_options = ScanOptions()
+
+
+def get_default_options() -> ScanOptions:
+    """Параметры обхода, используемые когда они не заданы явно"""
+    return _default_options
+
+
+def set_default_options(options: ScanOptions) -> None:
+    """Замена параметров обхода по умолчанию"""
+    global _default_options
+    _default_options = options
+
+
+class ScanControl:
+    """Состояние одного обхода: параметры, отмена, прогресс и счетчики"""
+
+    def __init__(self, options: Optional[ScanOptions] = None, token: Optional[CancelToken] = None,
+                 progress: Optional[ProgressCallback] = None,
+                 progress_interval: float = 0.5) -> None:
+        self.options = options if options is not None else get_default_options()
+        self.token = token if token is not None else CancelToken()
+        self.progress = progress
+        self.progress_interval = progress_interval
+        self.dirs_done = 0
+        self.files_done = 0
+        self.entries_seen = 0
+        self.current_path = ''
+        self.started: Optional[float] = None
+        self.stop_reason = ''
+        self.depth_limited = False
+        # Каталоги, пропущенные на границе тома или точки монтирования
+        self.skipped_mounts = 0
+        # Каталоги, отброшенные правилами исключения
+        self.skipped_excluded = 0
+        # Отдельные запросы метаданных файлов (поиск по запросу)
+        self.stat_calls = 0
+        # Если задан словарь, обход записывает в него время изменения
+        # каждого прочитанного каталога (для проверки кэшей)
+        self.directory_mtimes: Optional[Dict[str, float]] = None
+        # Доля пройденных каталогов верхнего уровня; top_limited — номера
+        # тех из них, в которых обход обрезан лимитом глубины
+        self.top_total = 0
+        self.top_done = 0
+        self.top_limited: Set[int] = set()
+        self._last_report = 0.0
+        self._limiters = {
+            kind: RateLimiter(rate)
+            for kind, rate in ((THROTTLE_DIRS, self.options.dirs_per_second),
+                               (THROTTLE_STATS, self.options.stats_per_second),
+                               (THROTTLE_BYTES, self.options.bytes_per_second))
+            if rate
+        }
+
+    @property
+    def cancelled(self) -> bool:
+        return self.token.cancelled
+
+    @property
+    def partial(self) -> bool:
+        """Результат неполный: обход был остановлен или ограничен"""
+        return bool(self.stop_reason) or self.depth_limited or self.cancelled
+
+    @property
+    def coverage(self) -> float:
+        """Доля полностью просмотренных каталогов верхнего уровня"""
+        if self.top_total == 0:
+            return 0.0 if self.stop_reason else 1.0
+        return self.top_complete / self.top_total
+
+    @property
+    def top_complete(self) -> int:
+        """Число пройденных каталогов верхнего уровня без обрезанных по глубине"""
+        return self.top_done - sum(1 for top in self.top_limited if top < self.top_done)
+
+    def child(self) -> 'ScanControl':
+        """Состояние для одного из параллельных обходов.
+
+        Счетчики у каждого обхода свои, а отмена и ограничители скорости
+        общие с этим состоянием, поэтому лимиты *_per_second действуют на
+        все параллельные обходы вместе, а не на каждый по отдельности.
+        """
+        child = ScanControl(copy.copy(self.options), self.token)
+        child._limiters = self._limiters
+        return child
+
+    def should_stop(self) -> bool:
+        """Проверка отмены и бюджета; запоминает причину остановки"""
+        if self.stop_reason:
+            return True
+        options = self.options
+        if self.cancelled:
+            self.stop_reason = STOP_CANCELLED
+        elif options.max_entries is not None and self.entries_seen >= options.max_entries:
+            self.stop_reason = STOP_ENTRIES
+        elif (options.deadline is not None and self.started is not None
+              and time.monotonic() - self.started >= options.deadline):
+            self.stop_reason = STOP_DEADLINE
+        return bool(self.stop_reason)
+
+    def throttle(self, kind: str, amount: float = 1.0) -> None:
+        """Ожидание по ограничению частоты kind (THROTTLE_*), если оно задано"""
+        limiter = self._limiters.get(kind)
+        if limiter is not None:
+            limiter.acquire(amount, self.token)
+
+    def report(self, force: bool = False) -> None:
+        """Вызов обратного вызова прогресса не чаще progress_interval"""
+        if self.progress is None:
+            return
+        now = time.monotonic()
+        if force or now - self._last_report >= self.progress_interval:
+            self._last_report = now
+            self.progress(self.dirs_done, self.files_done, self.current_path)
+
+
+class BatchPool:
+    """Обработка пачек элементов в пуле потоков параллельно с обходом.
+
+    submit(batch) передает пачку в work(batch, control), а результат —
+    в on_result (вызовы on_result идут под общей блокировкой). В очереди
+    не больше 2 * workers пачек: submit ждет, и обход не убегает далеко
+    вперед обработки. Первая ошибка в пачке отменяет обход (control.token)
+    и поднимается при выходе из блока with после завершения потоков, а не
+    теряется в обратном вызове.
+    """
+
+    def __init__(self, work: Callable[[List[Any], Optional[ScanControl]], Any], workers: int,
+                 on_result: Callable[[Any], None], control: Optional[ScanControl] = None) -> None:
+        self.work = work
+        self.on_result = on_result
+        self.control = control
+        self.errors: List[BaseException] = []
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(workers * 2)
+        self._executor = ThreadPoolExecutor(max_workers=workers)
+
+    def submit(self, batch: List[Any]) -> None:
+        self._slots.acquire()
+        self._executor.submit(self.work, batch, self.control).add_done_callback(self._collect)
+
+    def _collect(self, future: Future) -> None:
+        self._slots.release()
+        try:
+            result = future.result()
+        except Exception as e:
+            with self._lock:
+                self.errors.append(e)
+            if self.control is not None:
+                self.control.token.cancel()
+            return
+        with self._lock:
+            self.on_result(result)
+
+    def __enter__(self) -> 'BatchPool':
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self._executor.shutdown(wait=True)
+        if exc_type is None and self.errors:
+            raise self.errors[0]
+
+
+def walk(path: str, control: Optional[ScanControl] = None) -> Iterator[Tuple[str, List[Dict[str, Any]]]]:
+    """Обход дерева каталогов с учетом отмены, бюджета и прогресса.
+
+    Выдает пары (каталог, элементы) без символических ссылок и junction points.
+    Если не удалось прочитать сам корень, поднимает OSError.
+    """
+    return _walk_with(path, control, _list_items)
+
+
+def walk_entries(path: str, control: Optional[ScanControl] = None) -> Iterator[Tuple[str, List[Dict[str, Any]]]]:
+    """Обход с теми же отсечениями, что и walk, но без запроса метаданных.
+
+    Элементы содержат только name, type и entry (os.DirEntry); размер,
+    время и атрибуты вызывающий запрашивает сам через entry.stat() и
+    только для тех файлов, которым они нужны.
+    """
+    return _walk_with(path, control, list_entries)
+
+
+def _walk_with(path: str, control: Optional[ScanControl], lister) -> Iterator[Tuple[str, List[Dict[str, Any]]]]:
+    if control is None:
+        control = ScanControl()
+    if control.options.low_priority:
+        with background_priority():
+            yield from _walk(path, control, lister)
+    else:
+        yield from _walk(path, control, lister)
+
+
+def _list_items(dir_path: str, control: ScanControl) -> Optional[List[Dict[str, Any]]]:
+    """Элементы каталога с метаданными, без ссылок и junction points"""
+    validity, items = navigation.list_directory(dir_path)
+    # list_directory запрашивает метаданные каждого элемента
+    control.throttle(THROTTLE_STATS, len(items))
+    if not validity:
+        return None
+    kept = []
+    for item in items:
+        full_path = os.path.join(dir_path, item["name"])
+        if os.path.islink(full_path) or utils.is_junction_point(full_path):
+            continue
+        kept.append(item)
+    return kept
+
+
+def list_entries(dir_path: str, control: ScanControl) -> Optional[List[Dict[str, Any]]]:
+    """Записи каталога из os.scandir без ссылок и junction points.
+
+    Тип записи и признак ссылки приходят вместе с содержимым каталога,
+    поэтому отдельных запросов метаданных здесь нет.
+    """
+    try:
+        with utils.count_phase('listdir'):
+            scanner = os.scandir(dir_path)
+            entries = list(scanner)
+            scanner.close()
+    except OSError:
+        return None
+
+    kept = []
+    for entry in entries:
+        try:
+            if entry.is_symlink():
+                continue
+            if utils.is_junction_entry(entry):
+                continue
+            is_dir = entry.is_dir(follow_symlinks=False)
+        except OSError:
+            continue
+        kept.append({'name': entry.name, 'type': 'folder' if is_dir else 'file', 'entry': entry})
+    return kept
+
+
+def _walk(path: str, control: ScanControl, lister) -> Iterator[Tuple[str, List[Dict[str, Any]]]]:
+    if control.started is None:
+        control.started = time.monotonic()
+    options = control.options
+    root_device = device_of(path) if options.same_filesystem else None
+    excluded = {normalize_mount(mount) for mount in options.excluded_mounts}
+    rules = ExcludeRules(options.exclude)
+
+    def outside_boundary(dir_path: str) -> bool:
+        if excluded and normalize_mount(dir_path) in excluded:
+            return True
+        return root_device is not None and device_of(dir_path) != root_device
+
+    # (каталог, путь от корня через '/', глубина, номер каталога верхнего уровня)
+    pending = [(path, '', 0, -1)]
+    while pending:
+        if control.should_stop():
+            return
+        dir_path, relative, depth, top = pending.pop()
+        if top > control.top_done:
+            # Все каталоги верхнего уровня до top пройдены полностью
+            control.top_done = top
+
+        control.throttle(THROTTLE_DIRS)
+        if control.directory_mtimes is not None:
+            # Время берется до чтения: изменение во время чтения не потеряется
+            control.directory_mtimes[dir_path] = directory_mtime(dir_path)
+        items = lister(dir_path, control)
+        if items is None:
+            if dir_path == path:
+                raise OSError(f"Не удалось прочитать каталог: {path}")
+            continue
+
+        kept = []
+        subdirs = []
+        for item in items:
+            full_path = os.path.join(dir_path, item["name"])
+            if item["type"] == "folder":
+                # Исключенное поддерево отбрасывается до чтения его содержимого
+                if rules and rules.excluded(item["name"], relative + item["name"]):
+                    control.skipped_excluded += 1
+                    continue
+                if outside_boundary(full_path):
+                    control.skipped_mounts += 1
+                    continue
+                subdirs.append((full_path, relative + item["name"] + '/'))
+            kept.append(item)
+
+        if options.max_entries is not None:
+            remaining = options.max_entries - control.entries_seen
+            if len(kept) > remaining:
+                kept = kept[:max(remaining, 0)]
+                names = {item["name"] for item in kept if item["type"] == "folder"}
+                subdirs = [subdir for subdir in subdirs if os.path.basename(subdir[0]) in names]
+                control.stop_reason = STOP_ENTRIES
+
+        if depth == 0:
+            control.top_total = len(subdirs)
+
+        if subdirs and options.max_depth is not None and depth >= options.max_depth:
+            control.depth_limited = True
+            # Каталог верхнего уровня с обрезанным поддеревом не считается пройденным
+            control.top_limited.update(range(len(subdirs)) if depth == 0 else (top,))
+            subdirs = []
+
+        control.entries_seen += len(kept)
+        control.dirs_done += 1
+        control.files_done += sum(1 for item in kept if item["type"] == "file")
+        control.current_path = dir_path
+        control.report()
+
+        yield dir_path, kept
+
+        if options.low_priority:
+            # Уступаем процессор другим потокам между каталогами
+            time.sleep(0)
+
+        # Обратный порядок сохраняет порядок обхода подкаталогов
+        for index in range(len(subdirs) - 1, -1, -1):
+            subdir, sub_relative = subdirs[index]
+            pending.append((subdir, sub_relative, depth + 1, index if depth == 0 else top))
+
+    if not control.stop_reason:
+        control.top_done = control.top_total
+
+
+def format_count(count: int) -> str:
+    """Краткая запись большого числа: 1234567 -> 1.2M"""
+    if count < 1000:
+        return str(count)
+    if count < 1000000:
+        return f"{count / 1000:.1f}K"
+    return f"{count / 1000000:.1f}M"
+
+
+def describe_partial(control: ScanControl) -> str:
+    """Пояснение к частичному результату обхода"""
+    return format_partial(control.stop_reason, control.depth_limited, control.coverage)
+
+
+def format_partial(stop_reason: str, depth_limited: bool, coverage: float) -> str:
+    """Пояснение к частичному результату по сохраненным признакам (снимок, отчет)"""
+    reason = STOP_REASONS.get(stop_reason, '')
+    if not reason and depth_limited:
+        reason = STOP_REASONS[STOP_DEPTH]
+    return f"{reason}, просканировано {coverage:.0%} каталогов верхнего уровня"
+
+
+def describe_excluded(control: ScanControl) -> str:
+    """Сколько каталогов отброшено правилами исключения (пусто, если ни одного).
+
+    Исключения по умолчанию включены, поэтому итоги меньше полного объема
+    дерева; эта строка выводится рядом с любыми итогами обхода.
+    """
+    if not control.skipped_excluded:
+        return ''
+    return f"пропущено исключенных каталогов: {control.skipped_excluded:,}"
+
+
+def print_excluded(control: ScanControl, stream: Optional[TextIO] = None) -> None:
+    """Вывод describe_excluded, если каталоги исключались"""
+    note = describe_excluded(control)
+    if note:
+        print(note[0].upper() + note[1:], file=stream if stream is not None else sys.stdout)
+
+
+def format_partial_count(count: int, control: ScanControl) -> str:
+    """Число с пометкой '≥' для частичного результата"""
+    if control.partial:
+        return f"≥ {format_count(count)}"
+    return f"{count:,}"
+
+
+def print_progress(dirs_done: int, files_done: int, current_path: str) -> None:
+    """Вывод прогресса обхода в одну строку консоли"""
+    line = f"Каталогов: {dirs_done:,}  файлов: {files_done:,}  {current_path}"
+    if len(line) > 79:
+        line = line[:38] + '...' + line[-38:]
+    sys.stdout.write('\r' + line.ljust(79))
+    sys.stdout.flush()
+
+
+def clear_progress() -> None:
+    """Очистка строки прогресса"""
+    sys.stdout.write('\r' + ' ' * 79 + '\r')
+    sys.stdout.flush()
+
+
+@contextmanager
+def cancel_on_interrupt(token: CancelToken) -> Iterator[CancelToken]:
+    """Ctrl+C внутри блока отменяет обход вместо завершения программы"""
+    if threading.current_thread() is not threading.main_thread():
+        yield token
+        return
+
+    def handler(signum, frame):
+        token.cancel()
+
+    previous = signal.getsignal(signal.SIGINT)
+    signal.signal(signal.SIGINT, handler)
+    try:
+        yield token
+    finally:
+        signal.signal(signal.SIGINT, previous)
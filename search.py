@@ -1,44 +1,52 @@
+import math
 import os
 import re
-from typing import List, Dict, Any, Tuple
+import shlex
+import struct
+import sys
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import List, Dict, Any, Tuple, Optional, Iterator, Iterable
 import utils
 import navigation
 import analysis
+import scanning
+import output
+import resultset
 import fnmatch
 import ctypes
 from pathlib import Path
 
-def find_files_windows(pattern: str, path: str, case_sensitive: bool = False,
-                       current_path: str = None, matched_files: List[str] = None) -> List[str]:
-
-    if matched_files is None:
-        matched_files = []
-
-    if current_path is None:
-        current_path = path
-
+def iter_pattern_matches(pattern: str, path: str, case_sensitive: bool = False,
+                         control: Optional[scanning.ScanControl] = None
+                         ) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """Поток совпадений по шаблону: пары (каталог, элемент)"""
     if case_sensitive:
         match_func = lambda name, patrn: fnmatch.fnmatchcase(name, patrn)
     else:
-        match_func = lambda name, patrn: fnmatch.fnmatchcase(name.lower(), patrn.lower())
+        pattern = pattern.lower()
+        match_func = lambda name, patrn: fnmatch.fnmatchcase(name.lower(), patrn)
 
     try:
-        validity, items = navigation.list_directory(current_path)
-        if not validity:
-            return matched_files
+        for dir_path, items in scanning.walk(path, control):
+            for item in items:
+                if item["type"] == "file" and match_func(item["name"], pattern):
+                    yield dir_path, item
 
-        for item in items:
-            item_path = os.path.join(current_path, item["name"])
+    except OSError:
+        pass
 
-            if os.path.islink(item_path) or is_junction_points(item_path):
-                continue
 
-            if item["type"] == "folder":
-                # рекурсивный вызов той же функции, передаем current_path
-                find_files_windows(pattern, path, case_sensitive, item_path, matched_files)
-            elif item["type"] == "file":
-                if match_func(item["name"], pattern):
-                    matched_files.append(item_path)
+def find_files_windows(pattern: str, path: str, case_sensitive: bool = False,
+                       control: Optional[scanning.ScanControl] = None) -> resultset.ResultSet:
+
+    matched_files = resultset.ResultSet()
+
+    try:
+        for dir_path, item in iter_pattern_matches(pattern, path, case_sensitive, control):
+            matched_files.append(os.path.join(dir_path, item["name"]))
 
     except Exception:
         pass
@@ -46,166 +54,754 @@ def find_files_windows(pattern: str, path: str, case_sensitive: bool = False,
     return matched_files
 
 
-def find_by_windows_extension(extensions: List[str], path: str) -> List[str]:
+def normalize_extensions(extensions: List[str]) -> List[str]:
+    """Приведение расширений к виду '.ext' в нижнем регистре"""
+    normalized_exts = []
+    for ext in extensions:
+        cleaned_ext = ext.strip().lower()
+        if not cleaned_ext.startswith('.'):
+            cleaned_ext = f".{cleaned_ext}"
+        normalized_exts.append(cleaned_ext)
+    return normalized_exts
+
+
+def iter_extension_matches(extensions: List[str], path: str,
+                           control: Optional[scanning.ScanControl] = None
+                           ) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """Поток файлов с заданными расширениями: пары (каталог, элемент)"""
+    relevant_exts = set(normalize_extensions(extensions))
+    if not relevant_exts:
+        return
+
+    try:
+        for dir_path, items in scanning.walk(path, control):
+            for item in items:
+                if item["type"] != "file":
+                    continue
+                # Проверяем расширение файла
+                _, file_ext = os.path.splitext(item["name"])
+                if file_ext.lower() in relevant_exts:
+                    yield dir_path, item
+
+    except OSError:
+        # Корень недоступен
+        pass
+
+
+def find_by_windows_extension(extensions: List[str], path: str,
+                              control: Optional[scanning.ScanControl] = None) -> resultset.ResultSet:
     """
-    Поиск файлов по списку расширений Windows с предварительной оптимизацией.
+    Поиск файлов по списку расширений Windows за один обход.
 
     Args:
         extensions: Список расширений для поиска (с поддержкой формата с точкой и без)
         path: Корневая директория для поиска
+        control: Состояние обхода (отмена, прогресс)
 
     Returns:
-        Список полных путей к найденным файлам
+        Набор полных путей к найденным файлам (при большом числе
+        совпадений хранится на диске, см. resultset.ResultSet)
     """
     # Проверка базовых условий
     if not os.path.exists(path):
-        return []
+        return resultset.ResultSet()
 
     if not os.path.isdir(path):
-        return []
+        return resultset.ResultSet()
 
     if not extensions:
-        return []
+        return resultset.ResultSet()
 
-    # 1. Нормализация входных расширений
-    # Добавляем точку при необходимости и приводим к нижнему регистру
-    normalized_exts = []
-    for ext in extensions:
-        cleaned_ext = ext.strip().lower()
-        if not cleaned_ext.startswith('.'):
-            cleaned_ext = f".{cleaned_ext}"
-        normalized_exts.append(cleaned_ext)
+    # Предварительный проход analyze_windows_file_types убран: он удваивал
+    # обход, а после отмены его неполная статистика отбрасывала бы
+    # существующие расширения.
+    matched_files = resultset.ResultSet()
 
-    # 2. Предварительный анализ каталога через analyze_windows_file_types
-    # Оптимизация: если нужных расширений нет в статистике — сразу возвращаем пустой список
-    success, file_type_stats = analysis.analyze_windows_file_types(path)
-    if not success:
-        return []
+    try:
+        for dir_path, item in iter_extension_matches(extensions, path, control):
+            matched_files.append(os.path.join(dir_path, item["name"]))
 
-    # Фильтруем только те расширения, которые присутствуют в каталоге
-    relevant_exts = [
-        ext for ext in normalized_exts
-        if ext in file_type_stats and file_type_stats[ext]["count"] > 0
-    ]
+    except (PermissionError, OSError, Exception):
+        # Игнорируем недоступные каталоги и ошибки доступа
+        pass
 
-    if not relevant_exts:
-        return []
+    return matched_files
 
-    # 3. Рекурсивный поиск файлов с нужными расширениями
-    matched_files: List[str] = []
 
-    def recursive_scan(current_dir: str) -> None:
-        """Внутренняя функция для рекурсивного обхода каталогов"""
-        try:
-            validity, items = navigation.list_directory(current_dir)
-            if not validity:
-                return
+def iter_large_files(min_size_mb: float, path: str,
+                     control: Optional[scanning.ScanControl] = None
+                     ) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """Поток файлов не меньше min_size_mb: пары (каталог, элемент)"""
+    min_size_bytes = min_size_mb * 1024 * 1024
 
+    try:
+        for dir_path, items in scanning.walk(path, control):
             for item in items:
-                full_path = os.path.join(current_dir, item["name"])
+                # Размер уже получен при чтении каталога
+                if item["type"] == "file" and item.get("size", 0) >= min_size_bytes:
+                    yield dir_path, item
 
-                # Пропускаем символические ссылки и точки подключения (junction points)
-                if os.path.islink(full_path) or is_junction_points(full_path):
-                    continue
+    except OSError:
+        pass
 
-                if item["type"] == "folder":
-                    # Рекурсивно сканируем подкаталог
-                    recursive_scan(full_path)
-                elif item["type"] == "file":
-                    # Проверяем расширение файла
-                    _, file_ext = os.path.splitext(item["name"])
-                    if file_ext.lower() in relevant_exts:
-                        matched_files.append(full_path)
 
-        except (PermissionError, OSError, Exception):
-            # Игнорируем недоступные каталоги и ошибки доступа
-            pass
+def find_large_files_windows(min_size_mb: float, path: str,
+                             control: Optional[scanning.ScanControl] = None) -> resultset.ResultSet:
+    """Поиск крупных файлов в Windows"""
+    large_files = resultset.ResultSet()
 
-    # Запускаем сканирование
-    recursive_scan(path)
+    try:
+        for dir_path, item in iter_large_files(min_size_mb, path, control):
+            full_path = os.path.join(dir_path, item["name"])
+            large_files.append({
+                'path': full_path,
+                'size_mb': item["size"] / (1024 * 1024),
+                'type': os.path.splitext(full_path)[1]  # расширение файла
+            })
 
-    return matched_files
+    except Exception:
+        pass
 
+    return large_files
+
+
+def make_result_record(dir_path: str, item: Dict[str, Any]) -> Dict[str, Any]:
+    """Запись результата поиска для потокового вывода"""
+    full_path = os.path.join(dir_path, item["name"])
+    return {
+        'path': full_path,
+        'size': item.get("size", 0),
+        'mtime': item.get("mtime"),
+        'attributes': {
+            'hidden': bool(item.get("hidden")),
+            # Снимок и поиск по запросу передают атрибуты сами, остальные источники — только hidden
+            'system': item["system"] if "system" in item else analysis.is_system_file(full_path),
+            'readonly': item["readonly"] if "readonly" in item else not os.access(full_path, os.W_OK),
+        },
+    }
+
+
+def stream_results(matches: Iterable[Tuple[str, Dict[str, Any]]], writer: output.NDJSONWriter,
+                   control: Optional[scanning.ScanControl] = None) -> int:
+    """Запись совпадений в поток по мере их нахождения.
+
+    Если читатель закрыл поток, обход отменяется. Возвращает число записей.
+    """
+    for dir_path, item in matches:
+        if not writer.write(make_result_record(dir_path, item)):
+            if control is not None:
+                control.token.cancel()
+            break
+    writer.flush()
+    return writer.written
+
+
+# Относительная стоимость проверок условий запроса: сначала строковые
+# проверки имени, затем требующие stat, затем требующие атрибутов
+COST_PATH = 1
+COST_EXTENSION = 1
+COST_NAME = 2
+COST_STAT = 10
+COST_ATTRIBUTES = 20
+
+SIZE_UNITS = {'': 1, 'B': 1, 'K': 1024, 'KB': 1024, 'M': 1024 ** 2, 'MB': 1024 ** 2,
+              'G': 1024 ** 3, 'GB': 1024 ** 3, 'T': 1024 ** 4, 'TB': 1024 ** 4}
+AGE_UNITS = {'m': 60, 'h': 3600, 'd': 86400, 'w': 7 * 86400}
+QUERY_ATTRIBUTES = ('hidden', 'system', 'readonly')
+
+
+class SearchQuery:
+    """Составной поисковый запрос; файл подходит, если выполнены все заданные условия.
+
+    name — шаблон имени (fnmatch), extensions — набор расширений,
+    min_size/max_size — границы размера в байтах, modified_after/
+    modified_before — границы времени изменения (epoch), attributes —
+    требуемые значения атрибутов {'hidden': True, 'readonly': False},
+    path_prefix — начало пути файла (относительно корня поиска или
+    абсолютное). None означает, что условие не задано.
+    """
+
+    def __init__(self, name: Optional[str] = None, extensions: Optional[Iterable[str]] = None,
+                 min_size: Optional[int] = None, max_size: Optional[int] = None,
+                 modified_after: Optional[float] = None, modified_before: Optional[float] = None,
+                 attributes: Optional[Dict[str, bool]] = None, path_prefix: Optional[str] = None,
+                 case_sensitive: bool = False) -> None:
+        self.name = name
+        self.extensions = set(normalize_extensions(list(extensions))) if extensions else None
+        self.min_size = min_size
+        self.max_size = max_size
+        self.modified_after = modified_after
+        self.modified_before = modified_before
+        self.attributes = dict(attributes) if attributes else None
+        self.path_prefix = path_prefix
+        self.case_sensitive = case_sensitive
+
+    @property
+    def needs_stat(self) -> bool:
+        """Нужен ли stat для проверки условий"""
+        return (self.min_size is not None or self.max_size is not None
+                or self.modified_after is not None or self.modified_before is not None
+                or bool(self.attributes))
+
+    def predicates(self, root: str) -> List[Tuple[int, Any]]:
+        """Проверки условий в порядке возрастания стоимости: [(стоимость, функция)]"""
+        checks = []
+        if self.path_prefix:
+            prefix = os.path.normcase(os.path.abspath(os.path.join(root, self.path_prefix)))
+            checks.append((COST_PATH, lambda file: os.path.normcase(file.path).startswith(prefix)))
+        if self.extensions:
+            extensions = self.extensions
+            checks.append((COST_EXTENSION,
+                           lambda file: os.path.splitext(file.name)[1].lower() in extensions))
+        if self.name:
+            flags = 0 if self.case_sensitive else re.IGNORECASE
+            match = re.compile(fnmatch.translate(self.name), flags).match
+            checks.append((COST_NAME, lambda file: match(file.name) is not None))
+        if self.min_size is not None:
+            min_size = self.min_size
+            checks.append((COST_STAT, lambda file: file.stat().st_size >= min_size))
+        if self.max_size is not None:
+            max_size = self.max_size
+            checks.append((COST_STAT, lambda file: file.stat().st_size <= max_size))
+        if self.modified_after is not None:
+            after = self.modified_after
+            checks.append((COST_STAT, lambda file: file.stat().st_mtime >= after))
+        if self.modified_before is not None:
+            before = self.modified_before
+            checks.append((COST_STAT, lambda file: file.stat().st_mtime <= before))
+        for attribute, wanted in (self.attributes or {}).items():
+            checks.append((COST_ATTRIBUTES,
+                           lambda file, attribute=attribute, wanted=wanted: file.attributes()[attribute] == wanted))
+        checks.sort(key=lambda check: check[0])
+        return checks
+
+    def narrows(self, other: 'SearchQuery', root: str) -> bool:
+        """Входит ли любой результат этого запроса в результат other.
+
+        Каждое условие other должно быть задано и здесь, не слабее: тот же
+        шаблон имени, подмножество расширений, более узкие границы размера
+        и времени, те же атрибуты, более длинный префикс пути.
+        """
+        if other.name is not None and (self.name != other.name or self.case_sensitive != other.case_sensitive):
+            return False
+        if other.extensions is not None and (self.extensions is None or not self.extensions <= other.extensions):
+            return False
+        for mine, theirs, narrower in ((self.min_size, other.min_size, lambda a, b: a >= b),
+                                       (self.max_size, other.max_size, lambda a, b: a <= b),
+                                       (self.modified_after, other.modified_after, lambda a, b: a >= b),
+                                       (self.modified_before, other.modified_before, lambda a, b: a <= b)):
+            if theirs is not None and (mine is None or not narrower(mine, theirs)):
+                return False
+        for attribute, wanted in (other.attributes or {}).items():
+            if (self.attributes or {}).get(attribute) != wanted:
+                return False
+        if other.path_prefix:
+            if not self.path_prefix:
+                return False
+            mine = os.path.normcase(os.path.abspath(os.path.join(root, self.path_prefix)))
+            theirs = os.path.normcase(os.path.abspath(os.path.join(root, other.path_prefix)))
+            if not mine.startswith(theirs):
+                return False
+        return True
+
+    def start_directory(self, root: str) -> str:
+        """Каталог, с которого достаточно начать обход.
+
+        Если префикс пути указывает на каталог внутри root, обход
+        начинается прямо с него, и остальное дерево не читается.
+        """
+        if not self.path_prefix:
+            return root
+        prefix = os.path.abspath(os.path.join(root, self.path_prefix))
+        start = prefix if os.path.isdir(prefix) else os.path.dirname(prefix)
+        root_key = os.path.normcase(os.path.abspath(root))
+        start_key = os.path.normcase(start)
+        if start_key == root_key or start_key.startswith(root_key.rstrip(os.sep) + os.sep):
+            return start if os.path.isdir(start) else root
+        return root
+
+
+class QueryCandidate:
+    """Файл, проверяемый запросом; stat и атрибуты запрашиваются не больше одного раза"""
+
+    __slots__ = ('path', 'name', 'entry', 'control', '_stat', '_attributes')
+
+    def __init__(self, dir_path: str, item: Dict[str, Any], control: scanning.ScanControl) -> None:
+        self.name = item["name"]
+        self.path = os.path.join(dir_path, self.name)
+        self.entry = item["entry"]
+        self.control = control
+        self._stat = None
+        self._attributes = None
+
+    def stat(self) -> os.stat_result:
+        if self._stat is None:
+            self.control.throttle(scanning.THROTTLE_STATS)
+            self.control.stat_calls += 1
+            with utils.count_phase('stat'):
+                self._stat = self.entry.stat(follow_symlinks=False)
+        return self._stat
+
+    def attributes(self) -> Dict[str, bool]:
+        if self._attributes is None:
+            stat_result = self.stat()
+            with utils.count_phase('attributes'):
+                self._attributes = utils.file_attributes_from_stat(self.path, stat_result)
+        return self._attributes
+
+    def item(self) -> Dict[str, Any]:
+        """Элемент в формате list_directory для выдачи результата"""
+        stat_result = self.stat()
+        utils.count_bytes_seen(stat_result.st_size)
+        # Атрибуты уже получены из stat: make_result_record не запрашивает их заново
+        attributes = self.attributes()
+        return {
+            'name': self.name,
+            'type': 'file',
+            'size': stat_result.st_size,
+            'mtime': stat_result.st_mtime,
+            'hidden': attributes['hidden'],
+            'system': attributes['system'],
+            'readonly': attributes['readonly'],
+        }
+
+
+def iter_query_matches(query: SearchQuery, path: str,
+                       control: Optional[scanning.ScanControl] = None
+                       ) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """Поток файлов, подходящих под запрос: пары (каталог, элемент).
+
+    Один обход scanning.walk_entries с теми же отсечениями, что у остальных
+    поисков. Условия проверяются от дешевых к дорогим, и stat выполняется
+    только для файлов, прошедших проверки имени.
+    """
+    if control is None:
+        control = scanning.ScanControl()
+    checks = [check for _, check in query.predicates(path)]
+
+    try:
+        for dir_path, items in scanning.walk_entries(query.start_directory(path), control):
+            yield from query_matches_in(dir_path, items, checks, control)
+
+    except OSError:
+        pass
 
-def find_large_files_windows(min_size_mb: float, path: str) -> List[Dict[str, Any]]:
-    """Поиск крупных файлов в Windows"""
-    large_files = []
-    min_size_bytes = min_size_mb * 1024 * 1024
 
-    def scan_directory(dir_path: str):
+def query_matches_in(dir_path: str, items: List[Dict[str, Any]], checks: List[Any],
+                     control: scanning.ScanControl) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """Файлы одного каталога (элементы walk_entries), прошедшие все проверки"""
+    for item in items:
+        if item["type"] != "file":
+            continue
+        candidate = QueryCandidate(dir_path, item, control)
         try:
-            validity, items = navigation.list_directory(dir_path)
-            if not validity:
-                return
+            if all(check(candidate) for check in checks):
+                yield dir_path, candidate.item()
+        except OSError:
+            # Файл исчез или недоступен между чтением каталога и stat
+            continue
 
-            for item in items:
-                full_path = os.path.join(dir_path, item["name"])
 
-                # Пропускаем символические ссылки и junction points
-                if os.path.islink(full_path) or is_junction_points(full_path):
-                    continue
+def find_by_query(query: SearchQuery, path: str,
+                  control: Optional[scanning.ScanControl] = None) -> resultset.ResultSet:
+    """Поиск по составному запросу; записи результата как в make_result_record"""
+    return resultset.ResultSet(make_result_record(dir_path, item)
+                               for dir_path, item in iter_query_matches(query, path, control))
 
-                if item["type"] == "file":
-                    try:
-                     size_success, size_bytes = count_bytes(full_path)
-                     if size_success and size_bytes >= min_size_bytes:
-                       large_files.append({
-                       'path': full_path,
-                       'size_mb': size_bytes / (1024 * 1024),
-                       'type': os.path.splitext(full_path)[1]  # расширение файла
-                       })
 
-                    except Exception:
-                        pass
+RecordStat = namedtuple('RecordStat', 'st_size st_mtime')
 
-                elif item["type"] == "folder":
-                    scan_directory(full_path)
 
-        except Exception:
-            pass
+class ResultRecordFile:
+    """Запись результата (make_result_record) для повторной проверки условий"""
+
+    __slots__ = ('path', 'name', '_record')
+
+    def __init__(self, record: Dict[str, Any]) -> None:
+        self.path = record['path']
+        self.name = os.path.basename(self.path)
+        self._record = record
+
+    def stat(self) -> RecordStat:
+        return RecordStat(self._record['size'], self._record['mtime'])
+
+    def attributes(self) -> Dict[str, bool]:
+        return self._record['attributes']
 
-    scan_directory(path)
-    return large_files
 
+# Кэш результатов поиска: запись действительна SEARCH_CACHE_MAX_AGE секунд,
+# пока не изменилось время ни одного из пройденных каталогов
+SEARCH_CACHE_MAX_AGE = 300
+SEARCH_CACHE_SIZE = 8
 
-def find_windows_system_files(path: str) -> List[str]:
+
+class CachedSearch:
+    """Полный результат одного запроса и время изменения пройденных каталогов"""
+
+    def __init__(self, root: str, query: SearchQuery, records: resultset.ResultSet,
+                 directory_mtimes: Dict[str, Optional[float]],
+                 options: Tuple[Any, ...] = ()) -> None:
+        self.root = root
+        self.key = os.path.normcase(os.path.abspath(root))
+        # ScanOptions.fingerprint(): другие исключения дают другой результат
+        self.options = options
+        self.query = query
+        self.records = records
+        self.directory_mtimes = directory_mtimes
+        self.created = time.monotonic()
+
+    def is_valid(self, max_age: float) -> bool:
+        """Запись не устарела: не истек срок и каталоги не менялись.
+
+        Время каталога меняется при добавлении, удалении и переименовании
+        файлов, но не при перезаписи, поэтому срок жизни ограничен.
+        """
+        if time.monotonic() - self.created >= max_age:
+            return False
+        return all(scanning.directory_mtime(path) == mtime for path, mtime in self.directory_mtimes.items())
+
+
+class SearchCache:
+    """Кэш результатов поиска по (корень, запрос).
+
+    Запрос, который сужает сохраненный (см. SearchQuery.narrows), получает
+    ответ фильтрацией сохраненных записей без обхода.
     """
-    Ищет системные файлы Windows (.exe, .dll, .sys) в специальных папках,
-    а также в указанном пути.
+
+    def __init__(self, max_entries: int = SEARCH_CACHE_SIZE, max_age: float = SEARCH_CACHE_MAX_AGE) -> None:
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self._entries: List[CachedSearch] = []
+
+    def lookup(self, query: SearchQuery, root: str,
+               options: Tuple[Any, ...] = ()) -> Optional[resultset.ResultSet]:
+        """Результат из кэша для тех же параметров обхода или None"""
+        key = os.path.normcase(os.path.abspath(root))
+        for entry in list(self._entries):
+            if entry.key != key or entry.options != options or not query.narrows(entry.query, root):
+                continue
+            if not entry.is_valid(self.max_age):
+                self._entries.remove(entry)
+                continue
+            # Последняя использованная запись вытесняется последней
+            self._entries.remove(entry)
+            self._entries.append(entry)
+            checks = [check for _, check in query.predicates(root)]
+            return resultset.ResultSet(record for record in entry.records
+                                       if all(check(ResultRecordFile(record)) for check in checks))
+        return None
+
+    def store(self, query: SearchQuery, root: str, records: resultset.ResultSet,
+              directory_mtimes: Dict[str, Optional[float]], options: Tuple[Any, ...] = ()) -> None:
+        """Сохранение полного результата запроса"""
+        self._entries.append(CachedSearch(root, query, records, directory_mtimes, options))
+        if len(self._entries) > self.max_entries:
+            del self._entries[0]
+
+    def find(self, query: SearchQuery, root: str, control: scanning.ScanControl,
+             run) -> Tuple[resultset.ResultSet, bool]:
+        """Результат из кэша или от run(control); второй элемент — был ли он в кэше.
+
+        Запись подходит только при тех же параметрах обхода (исключения,
+        один том, точки монтирования), что и у control.options.
+        Частичный результат (отмена, лимиты) не сохраняется, как и результат,
+        не поместившийся в память: кэш не должен держать файлы такого объема.
+        """
+        options = control.options.fingerprint()
+        cached = self.lookup(query, root, options)
+        if cached is not None:
+            return cached, True
+        control.directory_mtimes = {}
+        records = run(control)
+        if not control.partial and not records.spilled:
+            self.store(query, root, records, control.directory_mtimes, options)
+        return records, False
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+_search_cache = SearchCache()
+
+
+def clear_search_cache() -> None:
+    """Сброс кэша результатов поиска"""
+    _search_cache.clear()
+
+
+def parse_size(text: str) -> int:
+    """Размер с необязательной единицей: '10M', '1.5GB', '512' -> байты"""
+    match = re.fullmatch(r'\s*([0-9]+(?:\.[0-9]+)?)\s*([A-Za-z]*)\s*', text)
+    if not match or match.group(2).upper() not in SIZE_UNITS:
+        raise ValueError(f"некорректный размер: {text}")
+    return int(float(match.group(1)) * SIZE_UNITS[match.group(2).upper()])
+
+
+def parse_age(text: str, now: float) -> float:
+    """Момент времени по возрасту: '30m', '12h', '7d', '2w' назад от now"""
+    match = re.fullmatch(r'\s*([0-9]+(?:\.[0-9]+)?)\s*([mhdw])\s*', text)
+    if not match:
+        raise ValueError(f"некорректный возраст: {text}")
+    return now - float(match.group(1)) * AGE_UNITS[match.group(2)]
+
+
+def parse_date(text: str) -> float:
+    """Начало дня 'ГГГГ-ММ-ДД' по местному времени"""
+    try:
+        return datetime.strptime(text.strip(), '%Y-%m-%d').timestamp()
+    except ValueError:
+        raise ValueError(f"некорректная дата: {text}") from None
+
+
+def _parse_range(value: str, parse, step: float) -> Tuple[Optional[float], Optional[float]]:
+    """Диапазон 'a..b', '>=a', '<=b', '>a', '<b' или точное значение -> (нижняя, верхняя).
+
+    Границы включительные; строгая граница сдвигается на наименьший
+    различимый шаг step ('>a' -> a + step, '<b' -> b - step). Для
+    убывающего parse (возраст -> время) step отрицательный.
     """
-    system_files = []  # сюда будем складывать найденные файлы
+    if '..' in value:
+        low, high = value.split('..', 1)
+        return (parse(low) if low else None), (parse(high) if high else None)
+    if value.startswith('>='):
+        return parse(value[2:]), None
+    if value.startswith('<='):
+        return None, parse(value[2:])
+    if value.startswith('>'):
+        return parse(value[1:]) + step, None
+    if value.startswith('<'):
+        return None, parse(value[1:]) - step
+    exact = parse(value)
+    return exact, exact
+
+
+def parse_query(text: str, case_sensitive: bool = False, now: Optional[float] = None) -> SearchQuery:
+    """Разбор строки запроса.
+
+    Условия через пробел: name:*.log (или просто *.log), ext:log,txt,
+    size:>10M, size:<=1G, size:1M..1G (границы включительные, '>' и '<' —
+    строгие), age:<7d (изменен за последние 7 дней),
+    age:>365d, date:2024-01-01..2024-06-30 (конечная дата включительно),
+    attr:hidden,!readonly, path:src/lib. Поднимает ValueError при ошибке.
+    """
+    if now is None:
+        now = time.time()
+    query = SearchQuery(case_sensitive=case_sensitive)
+    for token in shlex.split(text):
+        key, separator, value = token.partition(':')
+        if not separator or len(key) < 2:
+            # Без ключа (или буква диска 'C:...') — шаблон имени
+            key, value = 'name', token
+        key = key.lower()
+        if not value:
+            raise ValueError(f"пустое условие: {token}")
+
+        if key == 'name':
+            query.name = value
+        elif key == 'ext':
+            query.extensions = set(normalize_extensions([ext for ext in value.split(',') if ext.strip()]))
+        elif key == 'size':
+            query.min_size, query.max_size = _parse_range(value, parse_size, 1)
+        elif key == 'age':
+            # Больший возраст — более раннее время, поэтому границы меняются местами
+            older, newer = _parse_range(value, lambda part: parse_age(part, now), -1)
+            query.modified_after, query.modified_before = newer, older
+        elif key == 'date':
+            # Строгая граница даты отсекает весь день
+            query.modified_after, query.modified_before = _parse_range(value, parse_date, 86400)
+            if query.modified_before is not None:
+                # Конечная дата включает весь день
+                query.modified_before += 86400 - 1
+        elif key == 'attr':
+            attributes = {}
+            for name in value.split(','):
+                name = name.strip().lower()
+                wanted = not name.startswith('!')
+                name = name.lstrip('!')
+                if name not in QUERY_ATTRIBUTES:
+                    raise ValueError(f"неизвестный атрибут: {name}")
+                attributes[name] = wanted
+            query.attributes = attributes
+        elif key == 'path':
+            query.path_prefix = value
+        else:
+            raise ValueError(f"неизвестное условие: {key}")
+    return query
+
+
+# Расширения, под которыми исполняемые файлы Windows лежат штатно
+EXECUTABLE_EXTENSIONS = ('.exe', '.dll', '.sys')
+
+# Первое чтение захватывает DOS-заголовок и обычно весь заголовок PE
+PE_HEADER_READ = 512
+# Заголовок PE от сигнатуры до поля Subsystem включительно
+PE_SIGNATURE_READ = 94
+# Файлы меньше DOS-заголовка с сигнатурой PE не проверяются
+PE_MIN_SIZE = 0x40 + 4
+# Смещение заголовка PE больше этого считается мусором
+PE_MAX_OFFSET = 0x10000
+IMAGE_FILE_DLL = 0x2000
+IMAGE_SUBSYSTEM_NATIVE = 1
+
+# Потоки чтения заголовков и число файлов в одном задании
+HEADER_WORKERS = 8
+HEADER_BATCH = 64
+
+
+def executable_kind(path: str, control: Optional[scanning.ScanControl] = None) -> Optional[str]:
+    """Тип исполняемого файла по заголовку MZ/PE: 'exe', 'dll', 'sys' или None.
+
+    Читается не больше PE_HEADER_READ байт; второе чтение нужно, только
+    если заголовок PE лежит дальше. Поднимает OSError при ошибке чтения.
+    """
+    if control is not None:
+        control.throttle(scanning.THROTTLE_BYTES, PE_HEADER_READ)
+    header = utils.read_file_header(path, PE_HEADER_READ)
+    return executable_kind_from_header(path, header, control)
+
+
+def executable_kind_from_header(path: str, header: bytes,
+                                control: Optional[scanning.ScanControl] = None) -> Optional[str]:
+    """executable_kind по уже прочитанным первым PE_HEADER_READ байтам файла path.
 
-    # Получаем пути к папкам Desktop, Documents, Downloads
-    special_dirs = get_windows_special_folders()
+    Файл читается снова, только если заголовок PE лежит за header.
+    """
+    if len(header) < 0x40 or header[:2] != b'MZ':
+        return None
+
+    # e_lfanew — смещение заголовка PE
+    offset = struct.unpack_from('<I', header, 0x3C)[0]
+    if offset + PE_SIGNATURE_READ <= len(header):
+        pe_header = header[offset:offset + PE_SIGNATURE_READ]
+    elif offset < PE_MAX_OFFSET:
+        if control is not None:
+            control.throttle(scanning.THROTTLE_BYTES, PE_SIGNATURE_READ)
+        pe_header = utils.read_file_header(path, PE_SIGNATURE_READ, offset)
+    else:
+        return None
+    if pe_header[:4] != b'PE\0\0':
+        return None
 
-    # Пути, в которых будем искать системные файлы
-    search_dirs = [
-        special_dirs.get('Desktop', ''),
-        special_dirs.get('Documents', ''),
-        special_dirs.get('Downloads', ''),
-        path  # добавляем основной путь, чтобы расширить поиск
-    ]
+    # Characteristics заголовка COFF и Subsystem необязательного заголовка
+    if len(pe_header) >= PE_SIGNATURE_READ:
+        if struct.unpack_from('<H', pe_header, 92)[0] == IMAGE_SUBSYSTEM_NATIVE:
+            return 'sys'
+    if len(pe_header) >= 24 and struct.unpack_from('<H', pe_header, 22)[0] & IMAGE_FILE_DLL:
+        return 'dll'
+    return 'exe'
 
-    # Расширения файлов, которые считаем системными
-    sys_extensions = ['.exe', '.dll', '.sys']
 
-    for dir_path in search_dirs:
-        if not dir_path or not os.path.exists(dir_path):
-            continue  # пропускаем, если папки нет
+def check_executables(batch: List[Tuple[str, Dict[str, Any]]],
+                      control: Optional[scanning.ScanControl] = None) -> List[Dict[str, Any]]:
+    """Проверка заголовков пачки файлов; записи результата только для исполняемых.
+
+    В запись добавляются kind (тип по заголовку) и mislabelled — расширение
+    не из EXECUTABLE_EXTENSIONS, то есть файл переименован.
+    """
+    found = []
+    for dir_path, item in batch:
+        if control is not None and control.cancelled:
+            break
+        full_path = os.path.join(dir_path, item["name"])
         try:
-            # Обходим содержимое папки
-            with os.scandir(dir_path) as entries:
-                for entry in entries:
-                    if entry.is_file():
-                        ext = os.path.splitext(entry.name)[1].lower()
-                        if ext in sys_extensions:
-                            full_path = os.path.join(dir_path, entry.name)
-                            system_files.append(full_path)
-        except Exception:
-            # В случае ошибок (например, доступа) просто пропускаем
-            pass
-
-    return system_files
+            kind = executable_kind(full_path, control)
+        except OSError:
+            continue
+        if kind is None:
+            continue
+        record = make_result_record(dir_path, item)
+        record['kind'] = kind
+        record['mislabelled'] = os.path.splitext(item["name"])[1].lower() not in EXECUTABLE_EXTENSIONS
+        found.append(record)
+    return found
+
+
+def system_search_roots(path: str) -> List[str]:
+    """Desktop, Documents, Downloads и path без несуществующих и вложенных друг в друга"""
+    special_dirs = navigation.get_windows_special_folders()
+    candidates = [special_dirs.get('Desktop', ''), special_dirs.get('Documents', ''),
+                  special_dirs.get('Downloads', ''), path]
+
+    roots = []
+    keys = []
+    for candidate in candidates:
+        if not candidate or not os.path.isdir(candidate):
+            continue
+        key = scanning.normalize_mount(candidate)
+        roots.append(candidate)
+        keys.append(key)
+
+    result = []
+    for root, key in zip(roots, keys):
+        nested = any(key != other and key.startswith(other.rstrip(os.sep) + os.sep) for other in keys)
+        if not nested and key not in {scanning.normalize_mount(kept) for kept in result}:
+            result.append(root)
+    return result
+
+
+def find_windows_system_files(path: str, control: Optional[scanning.ScanControl] = None
+                              ) -> resultset.ResultSet:
+    """
+    Рекурсивно ищет исполняемые файлы Windows в Desktop, Documents,
+    Downloads и в указанном пути.
+
+    Каждый корень обходится в своем потоке, а заголовки файлов читаются
+    пачками в общем пуле HEADER_WORKERS потоков, поэтому переименованные
+    программы находятся, а файлы с чужим расширением .exe отбрасываются.
+    Счетчики и причина остановки обходов собираются в control.
+    """
+    if control is None:
+        control = scanning.ScanControl()
+    roots = system_search_roots(path)
+    if not roots:
+        return resultset.ResultSet()
+
+    controls = [control.child() for _ in roots]
+    found = resultset.ResultSet()
+
+    try:
+        with scanning.BatchPool(check_executables, HEADER_WORKERS, found.extend, control) as readers:
+            def walk_root(root: str, root_control: scanning.ScanControl) -> None:
+                batch = []
+                try:
+                    for dir_path, items in scanning.walk(root, root_control):
+                        for item in items:
+                            if item["type"] == "file" and item.get("size", 0) >= PE_MIN_SIZE:
+                                batch.append((dir_path, item))
+                                if len(batch) >= HEADER_BATCH:
+                                    readers.submit(batch)
+                                    batch = []
+                except OSError:
+                    # Корень недоступен — как и раньше, просто пропускаем
+                    pass
+                if batch:
+                    readers.submit(batch)
+
+            with ThreadPoolExecutor(max_workers=len(roots)) as walkers:
+                for future in [walkers.submit(walk_root, root, root_control)
+                               for root, root_control in zip(roots, controls)]:
+                    future.result()
+    except BaseException:
+        found.close()
+        raise
+
+    for root_control in controls:
+        control.dirs_done += root_control.dirs_done
+        control.files_done += root_control.files_done
+        control.entries_seen += root_control.entries_seen
+        control.skipped_mounts += root_control.skipped_mounts
+        control.skipped_excluded += root_control.skipped_excluded
+        control.top_total += root_control.top_total
+        # Номера top_limited у каждого корня свои, поэтому суммируются
+        # только полностью пройденные каталоги
+        control.top_done += root_control.top_complete
+        control.depth_limited = control.depth_limited or root_control.depth_limited
+        if root_control.stop_reason and not control.stop_reason:
+            control.stop_reason = root_control.stop_reason
+
+    # Сортировка внешним слиянием, если результат не поместился в память
+    with found:
+        return found.sorted(key=lambda record: record['path'])
 
 def search_menu_handler(current_path: str) -> bool:
     """
@@ -213,6 +809,8 @@ def search_menu_handler(current_path: str) -> bool:
     Включает интерактивное меню с выбором действий.
     Возвращает True, если пользователь хочет продолжить, иначе False.
     """
+    # Снимок, которым поиск по запросу пользуется как индексом
+    index_path = None
     while True:
         print("\n" + "=" * 70)
         print(f"{' ' * 20}Меню поиска в Windows")
@@ -221,7 +819,8 @@ def search_menu_handler(current_path: str) -> bool:
         print("  1. Найти крупные файлы")
         print("  2. Найти системные файлы Windows")
         print("  3. Показать статистику текущей директории")
-        print("  4. Выйти из меню")
+        print("  4. Поиск по запросу (имя, расширения, размер, время, атрибуты, путь)")
+        print("  5. Выйти из меню")
         print("-" * 70)
 
         choice = input("Введите номер пункта: ").strip()
@@ -233,19 +832,80 @@ def search_menu_handler(current_path: str) -> bool:
                 except ValueError:
                     print("Пожалуйста, введите корректное число.")
                     continue
-                files = find_large_files_windows(size_mb, current_path)
-                print(f"\nНайдено {len(files)} файлов(а) больше {size_mb} МБ:")
-                for f in files:
-                    print(f"  {f}")
+                control = scanning.ScanControl()
+                print(f"\nФайлы больше {size_mb} МБ:")
+
+                def run_large_files(control: scanning.ScanControl) -> resultset.ResultSet:
+                    records = resultset.ResultSet()
+                    # Совпадения выводятся сразу по мере нахождения
+                    for dir_path, item in iter_large_files(size_mb, current_path, control):
+                        record = make_result_record(dir_path, item)
+                        records.append(record)
+                        print(f"  {record['path']}")
+                    return records
+
+                query = SearchQuery(min_size=math.ceil(size_mb * 1024 * 1024))
+                with scanning.cancel_on_interrupt(control.token):
+                    records, cached = _search_cache.find(query, current_path, control, run_large_files)
+                if cached:
+                    for record in records:
+                        print(f"  {record['path']}")
+                    print("\n(ответ из кэша результатов, без обхода)")
+                if control.partial:
+                    print(f"\nРезультат частичный: {scanning.describe_partial(control)}")
+                scanning.print_excluded(control)
+                print(f"\nНайдено {scanning.format_partial_count(len(records), control)} "
+                      f"файлов(а) больше {size_mb} МБ")
             case '2':
-                sys_files = find_windows_system_files(current_path)
-                print(f"\nОбнаружено системных файлов: {len(sys_files)}")
-                for f in sys_files:
-                    print(f"  {f}")
+                control = scanning.ScanControl()
+                with scanning.cancel_on_interrupt(control.token):
+                    sys_files = find_windows_system_files(current_path, control)
+                if control.partial:
+                    print(f"\nРезультат частичный: {scanning.describe_partial(control)}")
+                scanning.print_excluded(control)
+                print(f"\nОбнаружено исполняемых файлов: {scanning.format_partial_count(len(sys_files), control)}")
+                format_windows_search_results(sys_files, "системные файлы")
+                renamed = [record for record in sys_files if record['mislabelled']]
+                if renamed:
+                    print(f"\nИсполняемые файлы с чужим расширением ({len(renamed)}):")
+                    for record in renamed:
+                        print(f"  [{record['kind']}] {record['path']}")
             case '3':
                 print("\nПоказ статистики текущей папки:")
-                show_windows_directory_stats(current_path)
+                analysis.show_windows_directory_stats(current_path)
             case '4':
+                print("Условия через пробел: *.log ext:log,txt size:>10M size:1M..1G age:<7d")
+                print("  date:2024-01-01..2024-06-30 attr:hidden,!readonly path:подкаталог")
+                try:
+                    query = parse_query(input("Запрос: "))
+                except ValueError as e:
+                    print(f"Ошибка в запросе: {e}")
+                    continue
+                if index_path:
+                    answer = input(f"Снимок-индекс (Enter — {index_path}, '-' — без индекса): ").strip()
+                else:
+                    answer = input("Снимок-индекс (Enter — без индекса): ").strip()
+                if answer:
+                    index_path = None if answer == '-' else answer
+                # planner импортирует этот модуль, поэтому импорт здесь
+                import planner
+                control = scanning.ScanControl()
+                plans = []
+
+                def run_query(control: scanning.ScanControl) -> resultset.ResultSet:
+                    records, plan = planner.find_planned(query, current_path, index_path, control)
+                    plans.append(plan)
+                    return records
+
+                with scanning.cancel_on_interrupt(control.token):
+                    results, cached = _search_cache.find(query, current_path, control, run_query)
+                print("Ответ из кэша результатов, без обхода" if cached else plans[0].describe())
+                if control.partial:
+                    print(f"\nРезультат частичный: {scanning.describe_partial(control)}")
+                scanning.print_excluded(control)
+                print(f"\nНайдено файлов: {scanning.format_partial_count(len(results), control)}")
+                format_windows_search_results(results, "запрос")
+            case '5':
                 print("\nВыход из меню. Возвращаюсь в основное меню.")
                 return False  # завершение меню
             case _:
@@ -258,38 +918,58 @@ def search_menu_handler(current_path: str) -> bool:
             return False
         # иначе цикл повторяется, меню выводится снова
 
-def format_windows_search_results(results: List, search_type: str) -> None:
-    """Форматированный вывод результатов поиска для Windows."""
+# Сколько результатов выводится за одну пакетную проверку атрибутов
+FORMAT_BATCH = 1000
+
+
+def format_windows_search_results(results: Iterable, search_type: str) -> None:
+    """Форматированный вывод результатов поиска для Windows.
+
+    Элементы — пути или словари (path, name, size/size_mb, attributes).
+    Атрибуты, полученные при поиске, используются как есть, недостающие
+    запрашиваются пакетным проходом. Результаты читаются порциями по
+    FORMAT_BATCH, поэтому набор на диске (resultset.ResultSet) не
+    загружается в память целиком.
+    """
     print("\n" + "=" * 80)
     print(f"Результаты для поиска по типу: {search_type}")
     print("=" * 80)
 
-    if not results:
+    shown = 0
+    with output.BufferedTableWriter(sys.stdout, (40, 15)) as table:
+        for batch in resultset.chunks(results, FORMAT_BATCH):
+            batch = [{'path': item} if isinstance(item, str) else item for item in batch]
+            if not shown:
+                # Заголовки таблицы
+                table.row('Имя файла', 'Размер', 'Путь до файла')
+                table.line("-" * 80)
+            shown += len(batch)
+
+            missing = [item.get('path', '') for item in batch
+                       if 'attributes' not in item or ('size' not in item and 'size_mb' not in item)]
+            fetched = analysis.stat_files_batch(missing) if missing else {}
+
+            for item in batch:
+                path = item.get('path', '')
+                name = item.get('name') or os.path.basename(path) or 'Нет имени'
+                stat_result = fetched.get(path)
+                if 'size' in item or 'size_mb' in item:
+                    size_bytes = item.get('size', int(item.get('size_mb', 0) * 1024 * 1024))
+                else:
+                    size_bytes = stat_result.st_size if stat_result is not None else 0
+                attrs = item.get('attributes')
+                if attrs is None:
+                    attrs = utils.file_attributes_from_stat(path, stat_result) if stat_result is not None else {}
+
+                flags = [label for key, label in (('hidden', 'скрытый'), ('system', 'системный'),
+                                                  ('readonly', 'только для чтения')) if attrs.get(key)]
+
+                table.row(name, utils.format_size(size_bytes), path)
+                table.line(f"  Атрибуты: {', '.join(flags) if flags else 'нет'}")
+
+        if shown:
+            table.line("=" * 80)
+            table.line("Конец результатов.\n")
+
+    if not shown:
         print("Нет результатов для отображения.")
-        return
-
-    # Заголовки таблицы
-    print(f"{'Имя файла':40} {'Размер':15} {'Путь до файла'}")
-    print("-" * 80)
-
-    for item in results:
-        name = item.get('name', 'Нет имени')
-        size_bytes = item.get('size', 0)
-        path = item.get('path', '')
-
-        size_str = format_size(size_bytes)  # форматируем размер
-
-        # Получаем атрибуты файла
-        attrs = get_windows_file_attributes_stats(path)
-        attrs_str = (
-            f"Скрыт: {attrs['hidden']} | "
-            f"Системный: {attrs['system']} | "
-            f"Только для чтения: {attrs['readonly']}"
-        )
-
-        # Выводим строку
-        print(f"{name:40} {size_str:15} {path}")
-        print(f"  Атрибуты: {attrs_str}")
-
-    print("=" * 80)
-    print("Конец результатов.\n")
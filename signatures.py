@@ -0,0 +1,213 @@
+import os
+import struct
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+import analysis
+import scanning
+import search
+import utils
+
+CONTENT_PE = 'PE (exe/dll)'
+CONTENT_BMP = 'BMP'
+CONTENT_WEBP = 'WebP'
+CONTENT_WAV = 'WAV'
+CONTENT_AVI = 'AVI'
+
+# Сигнатуры форматов: (смещение, байты, тип). Проверяются по порядку,
+# поэтому более длинные и точные сигнатуры стоят раньше общих
+SIGNATURES: List[Tuple[int, bytes, str]] = [
+    (0, b'SQLite format 3\x00', 'SQLite'),
+    (0, b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1', 'OLE (doc/xls/msi)'),
+    (0, b'\x89PNG\r\n\x1a\n', 'PNG'),
+    (0, b'7z\xbc\xaf\x27\x1c', '7-Zip'),
+    (0, b'Rar!\x1a\x07', 'RAR'),
+    (0, b'\xfd7zXZ\x00', 'XZ'),
+    (0, b'\x1a\x45\xdf\xa3', 'Matroska/WebM'),
+    (8, b'WEBP', CONTENT_WEBP),
+    (8, b'WAVE', CONTENT_WAV),
+    (8, b'AVI ', CONTENT_AVI),
+    (4, b'ftyp', 'MP4/MOV'),
+    (0, b'%PDF', 'PDF'),
+    (0, b'PK\x03\x04', 'ZIP (docx/xlsx/jar)'),
+    (0, b'PK\x05\x06', 'ZIP (docx/xlsx/jar)'),
+    (0, b'\x7fELF', 'ELF'),
+    (0, b'\xca\xfe\xba\xbe', 'Java class'),
+    (0, b'MSCF', 'CAB'),
+    (0, b'GIF87a', 'GIF'),
+    (0, b'GIF89a', 'GIF'),
+    (0, b'II*\x00', 'TIFF'),
+    (0, b'MM\x00*', 'TIFF'),
+    (0, b'\xff\xd8\xff', 'JPEG'),
+    (0, b'ID3', 'MP3'),
+    (0, b'fLaC', 'FLAC'),
+    (0, b'OggS', 'Ogg'),
+    (0, b'\x1f\x8b', 'GZIP'),
+    (0, b'BZh', 'BZIP2'),
+    (0, b'MZ', CONTENT_PE),
+    (0, b'BM', CONTENT_BMP),
+]
+
+# Размеры заголовка DIB, которые бывают в BMP (BITMAPCOREHEADER ... BITMAPV5HEADER)
+BMP_INFO_SIZES = frozenset((12, 40, 52, 56, 64, 108, 124))
+
+# Заголовок, которого хватает для всех сигнатур, проверки на текст и
+# проверки исполняемого файла: MZ не приходится читать второй раз
+HEADER_SIZE = search.PE_HEADER_READ
+CONTENT_EMPTY = 'пустой'
+CONTENT_TEXT = 'текст'
+CONTENT_UNKNOWN = 'неизвестный'
+CONTENT_UNREADABLE = 'нет доступа'
+TEXT_BYTES = bytes([7, 8, 9, 10, 12, 13, 27]) + bytes(range(0x20, 0x100))
+
+# Потоки чтения заголовков и число файлов в одном задании
+CONTENT_WORKERS = 8
+CONTENT_BATCH = 64
+
+# Кэш типов по (путь, размер, время изменения): измененный файл
+# получает новый ключ, поэтому кэш не устаревает
+CONTENT_CACHE_LIMIT = 200000
+_content_cache: Dict[Tuple[str, int, float], str] = {}
+_content_cache_lock = threading.Lock()
+
+
+def _plausible_pe(header: bytes) -> bool:
+    # Смещение заголовка PE (e_lfanew) за DOS-заголовком и в разумных пределах;
+    # сама сигнатура PE\0\0 проверяется в detect_content_type
+    if len(header) < 0x40:
+        return False
+    offset = struct.unpack_from('<I', header, 0x3C)[0]
+    return 0x40 <= offset < search.PE_MAX_OFFSET
+
+
+def _plausible_bmp(header: bytes) -> bool:
+    # За 14 байтами BITMAPFILEHEADER идет размер заголовка DIB
+    return len(header) >= 18 and struct.unpack_from('<I', header, 14)[0] in BMP_INFO_SIZES
+
+
+def _riff_container(header: bytes) -> bool:
+    # WebP, WAV и AVI — контейнеры RIFF: тип по смещению 8 без RIFF в начале ничего не значит
+    return header.startswith(b'RIFF')
+
+
+# Короткие сигнатуры встречаются и в начале текста ("MZ...", "BM..."), а
+# сигнатуры RIFF стоят не в начале файла, поэтому для них проверяются
+# поля заголовка
+HEADER_CHECKS = {
+    CONTENT_PE: _plausible_pe,
+    CONTENT_BMP: _plausible_bmp,
+    CONTENT_WEBP: _riff_container,
+    CONTENT_WAV: _riff_container,
+    CONTENT_AVI: _riff_container,
+}
+
+
+def classify_header(header: bytes, exclude: Tuple[str, ...] = ()) -> str:
+    """Тип содержимого по первым байтам файла; типы из exclude не рассматриваются"""
+    if not header:
+        return CONTENT_EMPTY
+    for offset, magic, name in SIGNATURES:
+        if name in exclude or not header.startswith(magic, offset):
+            continue
+        check = HEADER_CHECKS.get(name)
+        if check is None or check(header):
+            return name
+    # Текст в любой однобайтовой кодировке или UTF-8: нет управляющих
+    # символов, кроме табуляции, переводов строк и подобных
+    if not header.translate(None, TEXT_BYTES):
+        return CONTENT_TEXT
+    return CONTENT_UNKNOWN
+
+
+def detect_content_type(path: str, size: int, mtime: float,
+                        control: Optional[scanning.ScanControl] = None) -> str:
+    """Тип содержимого файла с кэшем по (путь, размер, время изменения)"""
+    key = (path, size, mtime)
+    with _content_cache_lock:
+        cached = _content_cache.get(key)
+    if cached is not None:
+        return cached
+
+    if size == 0:
+        content_type = CONTENT_EMPTY
+    else:
+        if control is not None:
+            control.throttle(scanning.THROTTLE_BYTES, min(size, HEADER_SIZE))
+        try:
+            header = utils.read_file_header(path, HEADER_SIZE)
+            content_type = classify_header(header)
+            if content_type == CONTENT_PE and search.executable_kind_from_header(path, header, control) is None:
+                # Нет сигнатуры PE по смещению e_lfanew: не исполняемый файл
+                content_type = classify_header(header, exclude=(CONTENT_PE,))
+        except OSError:
+            # Ошибку доступа не кэшируем: права могут поменяться
+            return CONTENT_UNREADABLE
+
+    with _content_cache_lock:
+        if len(_content_cache) >= CONTENT_CACHE_LIMIT:
+            _content_cache.clear()
+        _content_cache[key] = content_type
+    return content_type
+
+
+def clear_content_cache() -> None:
+    """Сброс кэша типов содержимого"""
+    with _content_cache_lock:
+        _content_cache.clear()
+
+
+def _classify_batch(batch: List[Tuple[str, Dict[str, Any]]],
+                    control: Optional[scanning.ScanControl]) -> List[Tuple[str, int]]:
+    result = []
+    for dir_path, item in batch:
+        if control is not None and control.cancelled:
+            break
+        size = item.get("size", 0)
+        path = os.path.join(dir_path, item["name"])
+        result.append((detect_content_type(path, size, item.get("mtime", 0.0), control), size))
+    return result
+
+
+def analyze_content_types(path: str, control: Optional[scanning.ScanControl] = None,
+                          type_statistic: Optional[Dict[str, Dict[str, Any]]] = None
+                          ) -> Tuple[bool, Dict[str, Dict[str, int]]]:
+    """Статистика по типу содержимого: {тип: {"count", "size"}}.
+
+    Заголовки читаются пачками в CONTENT_WORKERS потоках, число пачек
+    в очереди ограничено. Если передан type_statistic, в том же обходе
+    заполняется и статистика по расширениям (см. analysis.add_file_type).
+    """
+    statistic: Dict[str, Dict[str, int]] = {}
+
+    def collect(records: List[Tuple[str, int]]) -> None:
+        for content_type, size in records:
+            data = statistic.setdefault(content_type, {"count": 0, "size": 0})
+            data["count"] += 1
+            data["size"] += size
+
+    try:
+        with scanning.BatchPool(_classify_batch, CONTENT_WORKERS, collect, control) as readers:
+            batch = []
+            for dir_path, items in scanning.walk(path, control):
+                for item in items:
+                    if item["type"] != "file":
+                        continue
+                    if type_statistic is not None:
+                        analysis.add_file_type(type_statistic, item)
+                    batch.append((dir_path, item))
+                    if len(batch) >= CONTENT_BATCH:
+                        readers.submit(batch)
+                        batch = []
+            if batch:
+                readers.submit(batch)
+    except OSError:
+        return False, statistic
+
+    return True, statistic
+
+
+def format_content_table(statistic: Dict[str, Dict[str, int]]) -> List[str]:
+    """Строки таблицы типов содержимого по убыванию объема"""
+    lines = []
+    for content_type, data in sorted(statistic.items(), key=lambda x: -x[1]["size"]):
+        lines.append(f"{content_type:22} : {data['count']:6} файлов, {utils.format_size(data['size']):>10}")
+    return lines
@@ -0,0 +1,421 @@
+import hashlib
+import mmap
+import os
+import struct
+import sys
+import time
+from array import array
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import analysis
+import scanning
+
+# Формат снимка:
+#   заголовок HEADER (с признаками неполного обхода, см. FLAG_*, и
+#   отпечатком параметров обхода, см. options_digest),
+#   затем путь корня в UTF-8,
+#   таблица строк: смещения u64[strings + 1] и общий UTF-8 блок,
+#   каталоги — столбцы фиксированной ширины:
+#     parent u32, name u32, mtime f64, first_file u64, file_count u32,
+#     total_size u64, total_files u64 (суммарно по поддереву),
+#   файлы — столбцы: dir u32, name u32, size u64, mtime f64, attrs u8.
+# Время изменения — секунды эпохи (версия 1 хранила дату без времени).
+# Каталоги упорядочены по кортежу компонентов пути (родитель раньше детей),
+# файлы сгруппированы по каталогам и отсортированы по имени.
+# Каждая секция выровнена на 8 байт; столбцы читаются через memoryview
+# поверх mmap без разбора содержимого.
+
+MAGIC = b'WFMSNAP1'
+VERSION = 3
+# magic, версия, порядок байт, число строк, каталогов, файлов, размер блока
+# строк, время создания, длина пути корня, флаги, доля пройденных каталогов
+# верхнего уровня, число исключенных каталогов, причина остановки обхода,
+# отпечаток параметров обхода
+HEADER = struct.Struct('<8sIIQQQQdIIdQ16s16s')
+NO_PARENT = 0xFFFFFFFF
+
+# Флаги заголовка: обход был остановлен или ограничен глубиной
+FLAG_PARTIAL = 0x1
+FLAG_DEPTH_LIMITED = 0x2
+
+# Биты столбца attrs
+ATTR_HIDDEN = 0x1
+ATTR_SYSTEM = 0x2
+ATTR_READONLY = 0x4
+
+# Столбцы в порядке записи: (имя, код типа array)
+DIRECTORY_COLUMNS = (
+    ('dir_parent', 'I'), ('dir_name', 'I'), ('dir_mtime', 'd'), ('dir_first_file', 'Q'),
+    ('dir_file_count', 'I'), ('dir_total_size', 'Q'), ('dir_total_files', 'Q'),
+)
+FILE_COLUMNS = (
+    ('file_dir', 'I'), ('file_name', 'I'), ('file_size', 'Q'), ('file_mtime', 'd'), ('file_attrs', 'B'),
+)
+
+
+class SnapshotError(Exception):
+    """Файл не является снимком или поврежден"""
+
+
+def _padding(size: int) -> int:
+    return -size % 8
+
+
+def _file_attrs(full_path: str, item: Dict[str, Any]) -> int:
+    attrs = 0
+    if item.get("hidden"):
+        attrs |= ATTR_HIDDEN
+    if analysis.is_system_file(full_path):
+        attrs |= ATTR_SYSTEM
+    if not os.access(full_path, os.W_OK):
+        attrs |= ATTR_READONLY
+    return attrs
+
+
+def options_digest(options: scanning.ScanOptions) -> bytes:
+    """Отпечаток ScanOptions.fingerprint() фиксированной длины для заголовка"""
+    return hashlib.blake2b(repr(options.fingerprint()).encode('utf-8'), digest_size=16).digest()
+
+
+def write_snapshot(root: str, target: str,
+                   control: Optional[scanning.ScanControl] = None) -> Tuple[int, int]:
+    """Обход root и запись снимка в файл target.
+
+    Возвращает число каталогов и файлов в снимке. Ошибка чтения корня
+    поднимает OSError. Если обход был остановлен или ограничен (см.
+    ScanControl.partial), снимок помечается частичным: в нем нет части
+    каталогов, и сравнивать или отвечать по нему как по полному нельзя.
+    """
+    if control is None:
+        control = scanning.ScanControl()
+
+    strings: Dict[str, int] = {}
+
+    def intern(name: str) -> int:
+        index = strings.get(name)
+        if index is None:
+            index = strings[name] = len(strings)
+        return index
+
+    # Компоненты пути каталога -> (mtime, файлы каталога)
+    directories: Dict[Tuple[str, ...], Tuple[float, List[Tuple[str, int, float, int]]]] = {}
+    for dir_path, items in scanning.walk(root, control):
+        relative = os.path.relpath(dir_path, root)
+        components = () if relative == os.curdir else tuple(relative.split(os.sep))
+        files = [
+            (item["name"], item.get("size", 0), item.get("mtime", 0.0),
+             _file_attrs(os.path.join(dir_path, item["name"]), item))
+            for item in items if item["type"] == "file"
+        ]
+        files.sort()
+        mtime = scanning.directory_mtime(dir_path)
+        directories[components] = (mtime if mtime is not None else 0.0, files)
+
+    order = sorted(directories)
+    index_of = {components: index for index, components in enumerate(order)}
+    columns = {name: array(code) for name, code in DIRECTORY_COLUMNS + FILE_COLUMNS}
+
+    for index, components in enumerate(order):
+        mtime, files = directories[components]
+        parent = index_of.get(components[:-1], NO_PARENT) if components else NO_PARENT
+        columns['dir_parent'].append(parent)
+        columns['dir_name'].append(intern(components[-1] if components else ''))
+        columns['dir_mtime'].append(mtime)
+        columns['dir_first_file'].append(len(columns['file_dir']))
+        columns['dir_file_count'].append(len(files))
+        columns['dir_total_size'].append(sum(file[1] for file in files))
+        columns['dir_total_files'].append(len(files))
+        for name, size, file_mtime, attrs in files:
+            columns['file_dir'].append(index)
+            columns['file_name'].append(intern(name))
+            columns['file_size'].append(size)
+            columns['file_mtime'].append(file_mtime)
+            columns['file_attrs'].append(attrs)
+
+    # Суммы по поддеревьям одним проходом от детей к родителям
+    for index in range(len(order) - 1, 0, -1):
+        parent = columns['dir_parent'][index]
+        if parent != NO_PARENT:
+            columns['dir_total_size'][parent] += columns['dir_total_size'][index]
+            columns['dir_total_files'][parent] += columns['dir_total_files'][index]
+
+    blob = bytearray()
+    offsets = array('Q', [0])
+    for name in strings:
+        blob += name.encode('utf-8', 'surrogatepass')
+        offsets.append(len(blob))
+
+    root_bytes = os.path.abspath(root).encode('utf-8', 'surrogatepass')
+    flags = (FLAG_PARTIAL if control.partial else 0) | (FLAG_DEPTH_LIMITED if control.depth_limited else 0)
+    header = HEADER.pack(MAGIC, VERSION, 1 if sys.byteorder == 'little' else 0,
+                         len(strings), len(order), len(columns['file_dir']), len(blob),
+                         time.time(), len(root_bytes), flags, control.coverage,
+                         control.skipped_excluded, control.stop_reason.encode('ascii'),
+                         options_digest(control.options))
+
+    temporary = target + '.tmp'
+    with open(temporary, 'wb') as stream:
+        for chunk in (header, root_bytes, offsets.tobytes(), bytes(blob)):
+            stream.write(chunk)
+            stream.write(b'\0' * _padding(len(chunk)))
+        for name, _ in DIRECTORY_COLUMNS + FILE_COLUMNS:
+            data = columns[name].tobytes()
+            stream.write(data)
+            stream.write(b'\0' * _padding(len(data)))
+    os.replace(temporary, target)
+
+    return len(order), len(columns['file_dir'])
+
+
+class Snapshot:
+    """Снимок, открытый через mmap; столбцы читаются по требованию"""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._file = open(path, 'rb')
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise SnapshotError(f"Пустой файл снимка: {path}")
+        self._views: List[memoryview] = []
+        self._paths: Dict[int, str] = {}
+        try:
+            self._load()
+        except Exception:
+            self.close()
+            raise
+
+    def _load(self) -> None:
+        if len(self._map) < HEADER.size:
+            raise SnapshotError(f"Файл не является снимком: {self.path}")
+        magic, version = struct.unpack_from('<8sI', self._map, 0)
+        if magic != MAGIC:
+            raise SnapshotError(f"Файл не является снимком: {self.path}")
+        if version != VERSION:
+            raise SnapshotError(f"Версия снимка {version} не поддерживается, пересоздайте снимок: {self.path}")
+        (_, _, little, string_count, dir_count, file_count, blob_size, created, root_size,
+         flags, coverage, skipped_excluded, stop_reason, digest) = HEADER.unpack_from(self._map, 0)
+        if bool(little) != (sys.byteorder == 'little'):
+            raise SnapshotError("Снимок записан на платформе с другим порядком байт")
+
+        self.created = created
+        self.partial = bool(flags & FLAG_PARTIAL)
+        self.depth_limited = bool(flags & FLAG_DEPTH_LIMITED)
+        self.coverage = coverage
+        self.skipped_excluded = skipped_excluded
+        self.stop_reason = stop_reason.rstrip(b'\0').decode('ascii', 'replace')
+        self.options_digest = digest
+        self.string_count = string_count
+        self.dir_count = dir_count
+        self.file_count = file_count
+
+        offset = HEADER.size
+        self.root = bytes(self._map[offset:offset + root_size]).decode('utf-8', 'surrogatepass')
+        offset += root_size + _padding(root_size)
+
+        lengths = {'string_offsets': string_count + 1}
+        lengths.update((name, dir_count) for name, _ in DIRECTORY_COLUMNS)
+        lengths.update((name, file_count) for name, _ in FILE_COLUMNS)
+
+        self.string_offsets, offset = self._column(offset, 'Q', lengths['string_offsets'])
+        self._blob = self._view(offset, blob_size)
+        offset += blob_size + _padding(blob_size)
+        for name, code in DIRECTORY_COLUMNS + FILE_COLUMNS:
+            column, offset = self._column(offset, code, lengths[name])
+            setattr(self, name, column)
+
+        if offset > len(self._map):
+            raise SnapshotError(f"Снимок поврежден: {self.path}")
+
+    def _view(self, offset: int, size: int) -> memoryview:
+        view = memoryview(self._map)[offset:offset + size]
+        self._views.append(view)
+        return view
+
+    def _column(self, offset: int, code: str, count: int) -> Tuple[memoryview, int]:
+        size = count * array(code).itemsize
+        if offset + size > len(self._map):
+            raise SnapshotError(f"Снимок поврежден: {self.path}")
+        view = self._view(offset, size).cast(code)
+        self._views.append(view)
+        return view, offset + size + _padding(size)
+
+    def describe_partial(self) -> str:
+        """Пояснение к частичному снимку"""
+        return scanning.format_partial(self.stop_reason, self.depth_limited, self.coverage)
+
+    def built_with(self, options: scanning.ScanOptions) -> bool:
+        """Снимок записан обходом с теми же параметрами, что и options"""
+        return self.options_digest == options_digest(options)
+
+    def string(self, index: int) -> str:
+        """Строка из таблицы строк"""
+        start = self.string_offsets[index]
+        end = self.string_offsets[index + 1]
+        return bytes(self._blob[start:end]).decode('utf-8', 'surrogatepass')
+
+    def dir_path(self, index: int) -> str:
+        """Полный путь каталога"""
+        path = self._paths.get(index)
+        if path is None:
+            parent = self.dir_parent[index]
+            if parent == NO_PARENT:
+                path = self.root
+            else:
+                path = os.path.join(self.dir_path(parent), self.string(self.dir_name[index]))
+            self._paths[index] = path
+        return path
+
+    def file_item(self, index: int) -> Dict[str, Any]:
+        """Запись файла в виде элемента каталога"""
+        attrs = self.file_attrs[index]
+        mtime = self.file_mtime[index]
+        return {
+            'name': self.string(self.file_name[index]),
+            'type': 'file',
+            'size': self.file_size[index],
+            'mtime': mtime,
+            'hidden': bool(attrs & ATTR_HIDDEN),
+            'system': bool(attrs & ATTR_SYSTEM),
+            'readonly': bool(attrs & ATTR_READONLY),
+        }
+
+    def children(self) -> List[List[int]]:
+        """Списки дочерних каталогов для каждого каталога"""
+        result: List[List[int]] = [[] for _ in range(self.dir_count)]
+        for index in range(self.dir_count):
+            parent = self.dir_parent[index]
+            if parent != NO_PARENT:
+                result[parent].append(index)
+        return result
+
+    def walk(self) -> Iterator[Tuple[str, List[Dict[str, Any]]]]:
+        """Обход снимка в том же виде, что и scanning.walk"""
+        children = self.children()
+        for index in range(self.dir_count):
+            items = [
+                {'name': self.string(self.dir_name[child]), 'type': 'folder', 'size': 0,
+                 'mtime': self.dir_mtime[child], 'hidden': False}
+                for child in children[index]
+            ]
+            first = self.dir_first_file[index]
+            items.extend(self.file_item(i) for i in range(first, first + self.dir_file_count[index]))
+            yield self.dir_path(index), items
+
+    def close(self) -> None:
+        """Освобождение столбцов и отображения файла"""
+        for view in reversed(self._views):
+            view.release()
+        self._views.clear()
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self) -> 'Snapshot':
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+
+def _name_bytes(snap: Snapshot, index: int) -> bytes:
+    # Порядок байт UTF-8 совпадает с порядком строк, поэтому ключи
+    # сравниваются без декодирования
+    return bytes(snap._blob[snap.string_offsets[index]:snap.string_offsets[index + 1]])
+
+
+def _directory_keys(snap: Snapshot) -> List[Tuple[bytes, ...]]:
+    keys: List[Tuple[bytes, ...]] = []
+    for index in range(snap.dir_count):
+        parent = snap.dir_parent[index]
+        if parent == NO_PARENT:
+            keys.append(())
+        else:
+            keys.append(keys[parent] + (_name_bytes(snap, snap.dir_name[index]),))
+    return keys
+
+
+def _file_range(snap: Snapshot, index: int) -> range:
+    first = snap.dir_first_file[index]
+    return range(first, first + snap.dir_file_count[index])
+
+
+def diff_snapshots(old: Snapshot, new: Snapshot, allow_partial: bool = False) -> Dict[str, Any]:
+    """Сравнение двух снимков слиянием отсортированных ключей.
+
+    В частичном снимке нет части каталогов, и их файлы попали бы в
+    добавленные или удаленные, поэтому такие снимки сравниваются только
+    с allow_partial, иначе поднимается SnapshotError.
+
+    Каталоги обоих снимков упорядочены по компонентам пути, а файлы внутри
+    каталога — по имени, поэтому оба снимка проходятся один раз параллельно.
+    Файл считается измененным при другом размере или времени изменения.
+    Изменения размеров каталогов берутся из сохраненных сумм по поддеревьям
+    и сортируются по убыванию прироста.
+    """
+    for snap in (old, new):
+        if snap.partial and not allow_partial:
+            raise SnapshotError(f"Снимок частичный ({snap.describe_partial()}), "
+                                f"сравнение покажет лишние изменения: {snap.path}")
+
+    added: List[Tuple[str, int]] = []
+    removed: List[Tuple[str, int]] = []
+    modified: List[Tuple[str, int, int]] = []
+    directories: List[Tuple[str, int, int]] = []
+
+    def files_of(snap: Snapshot, index: int, target: List[Tuple[str, int]]) -> None:
+        dir_path = snap.dir_path(index)
+        for i in _file_range(snap, index):
+            target.append((os.path.join(dir_path, snap.string(snap.file_name[i])), snap.file_size[i]))
+
+    old_keys = _directory_keys(old)
+    new_keys = _directory_keys(new)
+    i = j = 0
+    while i < len(old_keys) or j < len(new_keys):
+        if j >= len(new_keys) or (i < len(old_keys) and old_keys[i] < new_keys[j]):
+            files_of(old, i, removed)
+            directories.append((old.dir_path(i), old.dir_total_size[i], 0))
+            i += 1
+            continue
+        if i >= len(old_keys) or new_keys[j] < old_keys[i]:
+            files_of(new, j, added)
+            directories.append((new.dir_path(j), 0, new.dir_total_size[j]))
+            j += 1
+            continue
+
+        # Каталог есть в обоих снимках: слияние списков файлов
+        dir_path = new.dir_path(j)
+        old_files = _file_range(old, i)
+        new_files = _file_range(new, j)
+        a = b = 0
+        while a < len(old_files) or b < len(new_files):
+            old_name = _name_bytes(old, old.file_name[old_files[a]]) if a < len(old_files) else None
+            new_name = _name_bytes(new, new.file_name[new_files[b]]) if b < len(new_files) else None
+            if new_name is None or (old_name is not None and old_name < new_name):
+                index = old_files[a]
+                removed.append((os.path.join(dir_path, old.string(old.file_name[index])), old.file_size[index]))
+                a += 1
+            elif old_name is None or new_name < old_name:
+                index = new_files[b]
+                added.append((os.path.join(dir_path, new.string(new.file_name[index])), new.file_size[index]))
+                b += 1
+            else:
+                old_index, new_index = old_files[a], new_files[b]
+                if (old.file_size[old_index] != new.file_size[new_index]
+                        or old.file_mtime[old_index] != new.file_mtime[new_index]):
+                    modified.append((os.path.join(dir_path, new.string(new.file_name[new_index])),
+                                     old.file_size[old_index], new.file_size[new_index]))
+                a += 1
+                b += 1
+
+        if old.dir_total_size[i] != new.dir_total_size[j]:
+            directories.append((dir_path, old.dir_total_size[i], new.dir_total_size[j]))
+        i += 1
+        j += 1
+
+    directories.sort(key=lambda entry: entry[1] - entry[2])
+    return {
+        'added': added,
+        'removed': removed,
+        'modified': modified,
+        'directories': directories,
+    }
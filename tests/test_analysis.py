@@ -0,0 +1,65 @@
+import os
+
+import analysis
+import scanning
+
+
+def test_usage_tree_sums_subdirectories(tmp_path):
+    (tmp_path / "a").mkdir()
+    (tmp_path / "a" / "one.bin").write_bytes(b"x" * 10)
+    (tmp_path / "two.bin").write_bytes(b"x" * 5)
+
+    success, tree = analysis.build_usage_tree(str(tmp_path), scanning.ScanControl(scanning.ScanOptions()))
+
+    assert success
+    assert tree["size"] == 15
+    assert tree["files"] == 2
+    assert [child["name"] for child in tree["children"]] == ["a"]
+    assert not tree["partial"]
+
+
+def test_usage_tree_stopped_before_root_is_a_failure(tmp_path):
+    (tmp_path / "file.txt").write_text("data")
+    control = scanning.ScanControl(scanning.ScanOptions(max_entries=0))
+
+    success, tree = analysis.build_usage_tree(str(tmp_path), control)
+
+    assert not success
+    assert tree == {}
+    assert control.partial
+
+
+def test_show_largest_children_reports_stopped_walk(tmp_path, capsys, monkeypatch):
+    (tmp_path / "file.txt").write_text("data")
+    analysis.clear_usage_tree_cache()
+    monkeypatch.setattr(scanning, "get_default_options", lambda: scanning.ScanOptions(max_entries=0))
+
+    assert not analysis.show_largest_children(str(tmp_path))
+    assert "Обход остановлен" in capsys.readouterr().out
+
+
+def test_usage_tree_root_with_trailing_separator(tmp_path):
+    (tmp_path / "a").mkdir()
+    (tmp_path / "a" / "one.bin").write_bytes(b"x" * 10)
+    (tmp_path / "two.bin").write_bytes(b"x" * 5)
+
+    success, tree = analysis.build_usage_tree(str(tmp_path) + os.sep, scanning.ScanControl(scanning.ScanOptions()))
+
+    assert success
+    assert tree["size"] == 15
+    assert [child["name"] for child in tree["children"]] == ["a"]
+    assert analysis.find_usage_node(tree, str(tmp_path / "a"))["size"] == 10
+
+
+def test_file_age_reports_topmost_stale_directory(tmp_path):
+    (tmp_path / "a").mkdir()
+    (tmp_path / "a" / "old.txt").write_text("old")
+    (tmp_path / "old.txt").write_text("old")
+    for file in (tmp_path / "a" / "old.txt", tmp_path / "old.txt"):
+        os.utime(file, (1000, 1000))
+
+    success, report = analysis.analyze_file_age(str(tmp_path) + os.sep, stale_days=1,
+                                                control=scanning.ScanControl(scanning.ScanOptions()))
+
+    assert success
+    assert [entry["path"] for entry in report["stale"]] == [str(tmp_path)]
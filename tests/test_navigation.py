@@ -0,0 +1,32 @@
+import os
+import time
+
+import navigation
+import utils
+
+
+def test_move_down_does_not_depend_on_listing(tmp_path):
+    (tmp_path / "a" / "b").mkdir(parents=True)
+    _, listing = navigation.list_directory(str(tmp_path))
+
+    for current in (listing, None):
+        assert navigation.move_down(str(tmp_path), "a", current) == (True, os.path.join(str(tmp_path), "a"))
+        assert navigation.move_down(str(tmp_path), "nope", current) == (False, str(tmp_path))
+        assert navigation.move_down(str(tmp_path), os.path.join("a", "b"), current)[0]
+        assert not navigation.move_down(str(tmp_path), os.path.join("a", "nope"), current)[0]
+
+
+def test_prefetch_is_not_counted_by_instrumentation(tmp_path):
+    (tmp_path / "a").mkdir()
+    (tmp_path / "file.txt").write_text("data")
+    prefetcher = navigation.DirectoryPrefetcher()
+
+    with utils.instrumented() as counters:
+        prefetcher.focus(str(tmp_path))
+        deadline = time.monotonic() + 5
+        while prefetcher.listing(str(tmp_path)) is None and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    assert prefetcher.listing(str(tmp_path)) is not None
+    assert not counters.calls
+    assert counters.bytes_seen == 0
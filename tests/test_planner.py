@@ -0,0 +1,67 @@
+import os
+
+import planner
+import scanning
+import search
+import snapshot
+
+
+def _tree(root):
+    (root / "a").mkdir()
+    (root / "a" / "f.log").write_text("log")
+    (root / "node_modules" / "m").mkdir(parents=True)
+    (root / "node_modules" / "m" / "g.log").write_text("log")
+
+
+def _index(root, target, options):
+    snapshot.write_snapshot(str(root), str(target), scanning.ScanControl(options))
+    return str(target)
+
+
+def _found(query, root, index_path, options):
+    records, plan = planner.find_planned(query, str(root), index_path, scanning.ScanControl(options))
+    return sorted(os.path.relpath(record["path"], str(root)) for record in records), plan
+
+
+def test_index_with_other_excludes_is_not_used(tmp_path):
+    root = tmp_path / "root"
+    root.mkdir()
+    _tree(root)
+    index_path = _index(root, tmp_path / "index.snap", scanning.ScanOptions())
+
+    found, plan = _found(search.parse_query("ext:log"), root, index_path, scanning.ScanOptions(exclude=()))
+
+    assert plan.strategy == planner.STRATEGY_LIVE
+    assert found == [os.path.join("a", "f.log"), os.path.join("node_modules", "m", "g.log")]
+
+
+def test_fresh_index_answers_cheaper_query(tmp_path):
+    root = tmp_path / "root"
+    root.mkdir()
+    _tree(root)
+    options = scanning.ScanOptions()
+    index_path = _index(root, tmp_path / "index.snap", options)
+
+    # Запрос по размеру требует stat каждого файла при полном обходе
+    found, plan = _found(search.parse_query("ext:log size:>=1"), root, index_path, options)
+
+    assert plan.strategy == planner.STRATEGY_INDEX
+    assert found == [os.path.join("a", "f.log")]
+
+
+def test_stale_index_more_expensive_than_walk_is_not_used(tmp_path):
+    root = tmp_path / "root"
+    root.mkdir()
+    _tree(root)
+    options = scanning.ScanOptions()
+    index_path = _index(root, tmp_path / "index.snap", options)
+    (root / "new.log").write_text("log")
+    (root / "a" / "h.log").write_text("log")
+    os.utime(root, (0, 0))
+    os.utime(root / "a", (0, 0))
+
+    found, plan = _found(search.parse_query("ext:log"), root, index_path, options)
+
+    assert plan.strategy == planner.STRATEGY_LIVE
+    assert plan.estimated_cost == plan.live_cost
+    assert found == [os.path.join("a", "f.log"), os.path.join("a", "h.log"), "new.log"]
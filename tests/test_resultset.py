@@ -0,0 +1,66 @@
+import random
+
+import resultset
+
+
+def test_small_set_stays_in_memory():
+    results = resultset.ResultSet(['b', 'a'], memory_limit=10)
+
+    assert not results.spilled
+    assert len(results) == 2
+    assert list(results) == ['b', 'a']
+    assert list(results.sorted()) == ['a', 'b']
+
+
+def test_spilled_set_keeps_order_and_repeats():
+    records = [{'path': f'file{i}', 'size': i} for i in range(25)]
+    results = resultset.ResultSet(records, memory_limit=4)
+
+    assert results.spilled
+    assert len(results) == 25
+    assert list(results) == records
+    # Обходы независимы: второй начинается с начала, пока первый не закончен
+    first = iter(results)
+    assert next(first) == records[0]
+    assert list(results) == records
+    assert next(first) == records[1]
+
+
+def test_external_sort_matches_sorted():
+    values = list(range(100)) * 2
+    random.Random(3).shuffle(values)
+    results = resultset.ResultSet(values, memory_limit=7)
+
+    ascending = results.sorted()
+    descending = results.sorted(key=lambda value: -value)
+
+    assert ascending.spilled
+    assert list(ascending) == sorted(values)
+    assert list(descending) == sorted(values, reverse=True)
+    assert list(results.sorted(reverse=True)) == sorted(values, reverse=True)
+
+
+def test_items_added_during_iteration_are_not_read():
+    results = resultset.ResultSet(range(5), memory_limit=2)
+
+    seen = []
+    for value in results:
+        seen.append(value)
+        if value == 0:
+            results.append(99)
+
+    assert seen == [0, 1, 2, 3, 4]
+    assert len(results) == 6
+
+
+def test_close_removes_records():
+    results = resultset.ResultSet(range(10), memory_limit=3)
+    results.close()
+
+    assert len(results) == 0
+    assert list(results) == []
+
+
+def test_chunks():
+    assert list(resultset.chunks(range(7), 3)) == [[0, 1, 2], [3, 4, 5], [6]]
+    assert list(resultset.chunks([], 3)) == []
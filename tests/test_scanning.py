@@ -0,0 +1,102 @@
+import os
+
+import pytest
+
+import scanning
+import utils
+
+
+def _walk(root, **options):
+    control = scanning.ScanControl(scanning.ScanOptions(**options))
+    walked = [path for path, _ in scanning.walk_entries(str(root), control)]
+    return walked, control
+
+
+def test_depth_limit_at_root_covers_nothing(tmp_path):
+    for name in ("a", "b"):
+        (tmp_path / name / "inner").mkdir(parents=True)
+
+    walked, control = _walk(tmp_path, max_depth=0)
+
+    assert walked == [str(tmp_path)]
+    assert control.depth_limited
+    assert control.top_total == 2
+    assert control.coverage == 0.0
+
+
+def test_depth_limited_top_directories_are_not_done(tmp_path):
+    (tmp_path / "a" / "x" / "y").mkdir(parents=True)
+    (tmp_path / "b").mkdir()
+
+    _, control = _walk(tmp_path, max_depth=1)
+
+    assert control.depth_limited
+    assert control.coverage == 0.5
+
+
+def test_batch_pool_collects_results_and_raises_first_error():
+    collected = []
+    with scanning.BatchPool(lambda batch, control: [item * 2 for item in batch], 2, collected.extend) as pool:
+        for start in range(0, 10, 3):
+            pool.submit(list(range(start, min(start + 3, 10))))
+    assert sorted(collected) == [item * 2 for item in range(10)]
+
+    def fail(batch, control):
+        raise ValueError("broken batch")
+
+    control = scanning.ScanControl()
+    with pytest.raises(ValueError, match="broken batch"):
+        with scanning.BatchPool(fail, 2, collected.extend, control) as pool:
+            pool.submit([1])
+    assert control.cancelled
+
+
+def test_exclude_rules():
+    rules = scanning.ExcludeRules(['node_modules', '/build/', 'docs/*/tmp', '*.cache', '!keep.cache'])
+
+    assert rules.excluded('node_modules', 'src/node_modules')
+    assert rules.excluded('NODE_MODULES', 'NODE_MODULES')
+    assert rules.excluded('build', 'build')
+    assert not rules.excluded('build', 'src/build')
+    assert rules.excluded('tmp', 'docs/api/tmp')
+    assert not rules.excluded('tmp', 'src/tmp')
+    assert rules.excluded('pip.cache', 'pip.cache')
+    assert not rules.excluded('keep.cache', 'a/keep.cache')
+    assert not scanning.ExcludeRules([])
+    assert not scanning.ExcludeRules(['', '/'])
+
+
+def test_simple_exclude_rules_match_names_only():
+    rules = scanning.ExcludeRules(scanning.DEFAULT_EXCLUDES)
+
+    assert rules.excluded('.git', 'project/.git')
+    assert not rules.excluded('git', 'git')
+
+
+def test_walk_skips_excluded_directories(tmp_path):
+    (tmp_path / "src" / "node_modules" / "pkg").mkdir(parents=True)
+    (tmp_path / "src" / "lib").mkdir()
+
+    walked, control = _walk(tmp_path)
+
+    assert sorted(os.path.relpath(path, str(tmp_path)) for path in walked) == \
+        [os.curdir, "src", os.path.join("src", "lib")]
+    assert control.skipped_excluded == 1
+
+
+class _FakeEntry:
+    def __init__(self, attributes):
+        self._attributes = attributes
+
+    def is_dir(self, follow_symlinks=True):
+        return True
+
+    def stat(self, follow_symlinks=True):
+        return type('Stat', (), {'st_file_attributes': self._attributes})()
+
+
+def test_junction_fallback_without_is_junction(monkeypatch):
+    monkeypatch.setattr(utils, 'is_windows_os', lambda: True)
+
+    assert utils.is_junction_entry(_FakeEntry(utils.FILE_ATTRIBUTE_REPARSE_POINT))
+    assert not utils.is_junction_entry(_FakeEntry(0x10))
@@ -0,0 +1,58 @@
+import os
+
+import pytest
+
+import search
+
+
+def test_strict_size_bounds(tmp_path):
+    (tmp_path / "small.bin").write_bytes(b"x" * 2999)
+    (tmp_path / "exact.bin").write_bytes(b"x" * 3000)
+    (tmp_path / "large.bin").write_bytes(b"x" * 3001)
+
+    def names(text):
+        query = search.parse_query(text)
+        return sorted(item["name"] for _, item in search.iter_query_matches(query, str(tmp_path)))
+
+    assert names("size:>3000") == ["large.bin"]
+    assert names("size:<3000") == ["small.bin"]
+    assert names("size:>=3000") == ["exact.bin", "large.bin"]
+    assert names("size:<=3000") == ["exact.bin", "small.bin"]
+
+
+def test_parse_query_conditions():
+    now = 1_000_000.0
+    query = search.parse_query('*.log ext:LOG,txt size:1K..2M age:<7d attr:hidden,!readonly path:src/lib', now=now)
+
+    assert query.name == '*.log'
+    assert query.extensions == {'.log', '.txt'}
+    assert (query.min_size, query.max_size) == (1024, 2 * 1024 * 1024)
+    assert query.modified_after == now - 7 * 86400 + 1
+    assert query.modified_before is None
+    assert query.attributes == {'hidden': True, 'readonly': False}
+    assert query.path_prefix == 'src/lib'
+    assert query.needs_stat
+
+
+def test_parse_query_date_range_includes_last_day():
+    query = search.parse_query('date:2024-01-01..2024-01-31')
+
+    assert query.modified_before - query.modified_after == 31 * 86400 - 1
+
+
+@pytest.mark.parametrize('text', ['size:abc', 'age:7y', 'date:2024-13-01', 'attr:archive', 'color:red', 'ext:'])
+def test_parse_query_rejects_bad_conditions(text):
+    with pytest.raises(ValueError):
+        search.parse_query(text)
+
+
+def test_narrows():
+    root = os.path.abspath('root')
+    wide = search.parse_query('ext:log,txt size:>=1K path:src')
+
+    assert search.parse_query('ext:log size:>=2K path:src/lib').narrows(wide, root)
+    assert wide.narrows(wide, root)
+    assert not search.parse_query('ext:log,md size:>=2K path:src').narrows(wide, root)
+    assert not search.parse_query('ext:log size:>=512 path:src').narrows(wide, root)
+    assert not search.parse_query('ext:log size:>=2K').narrows(wide, root)
+    assert not wide.narrows(search.parse_query('ext:log size:>=1K path:src attr:hidden'), root)
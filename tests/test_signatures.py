@@ -0,0 +1,30 @@
+import struct
+
+import signatures
+import utils
+
+
+def test_riff_types_need_riff_header():
+    assert signatures.classify_header(b'RIFF\x24\x00\x00\x00WAVEfmt ') == signatures.CONTENT_WAV
+    assert signatures.classify_header(b'RIFF\x24\x00\x00\x00WEBPVP8 ') == signatures.CONTENT_WEBP
+    assert signatures.classify_header(b'abcdefghWAVE and some text') == signatures.CONTENT_TEXT
+
+
+def test_short_magics_in_text_are_text():
+    assert signatures.classify_header(b'MZ is not an executable\n') == signatures.CONTENT_TEXT
+    assert signatures.classify_header(b'BM is not a bitmap\n') == signatures.CONTENT_TEXT
+
+
+def test_executable_header_is_read_once(tmp_path):
+    header = bytearray(1024)
+    header[:2] = b'MZ'
+    struct.pack_into('<I', header, 0x3C, 0x80)
+    header[0x80:0x84] = b'PE\0\0'
+    path = tmp_path / "renamed.txt"
+    path.write_bytes(bytes(header))
+
+    with utils.instrumented() as counters:
+        content_type = signatures.detect_content_type(str(path), len(header), 1.0)
+
+    assert content_type == signatures.CONTENT_PE
+    assert counters.calls['read'] == 1
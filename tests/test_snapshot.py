@@ -0,0 +1,122 @@
+import os
+
+import pytest
+
+import scanning
+import snapshot
+
+
+def _write(root, target, **options):
+    control = scanning.ScanControl(scanning.ScanOptions(**options))
+    counts = snapshot.write_snapshot(str(root), str(target), control)
+    return counts, control
+
+
+def _tree(root):
+    (root / "a" / "b").mkdir(parents=True)
+    (root / "a" / "one.txt").write_bytes(b"x" * 10)
+    (root / "a" / "b" / "two.txt").write_bytes(b"x" * 20)
+    (root / "три.txt").write_bytes(b"x" * 5)
+    os.utime(root / "a" / "one.txt", (1000, 1000.5))
+
+
+def test_snapshot_round_trip(tmp_path):
+    root = tmp_path / "root"
+    root.mkdir()
+    _tree(root)
+
+    (dir_count, file_count), control = _write(root, tmp_path / "s.snap")
+
+    assert (dir_count, file_count) == (3, 3)
+    with snapshot.Snapshot(str(tmp_path / "s.snap")) as snap:
+        assert snap.root == str(root)
+        assert not snap.partial
+        assert snap.coverage == 1.0
+        assert snap.built_with(control.options)
+        assert not snap.built_with(scanning.ScanOptions(exclude=()))
+        walked = {os.path.relpath(path, str(root)): items for path, items in snap.walk()}
+        assert sorted(walked) == [os.curdir, "a", os.path.join("a", "b")]
+        assert [(item["name"], item["type"]) for item in walked[os.curdir]] == [("a", "folder"), ("три.txt", "file")]
+        one = next(item for item in walked["a"] if item["name"] == "one.txt")
+        assert (one["size"], one["mtime"]) == (10, 1000.5)
+        assert snap.dir_total_size[0] == 35
+        assert snap.dir_total_files[0] == 3
+
+
+def test_partial_snapshot_is_marked(tmp_path):
+    root = tmp_path / "root"
+    root.mkdir()
+    _tree(root)
+
+    _write(root, tmp_path / "s.snap", max_depth=0)
+
+    with snapshot.Snapshot(str(tmp_path / "s.snap")) as snap:
+        assert snap.partial
+        assert snap.depth_limited
+        assert snap.coverage == 0.0
+        assert snap.describe_partial() == scanning.format_partial('', True, 0.0)
+
+
+def test_other_files_are_rejected(tmp_path):
+    (tmp_path / "empty.snap").write_bytes(b"")
+    (tmp_path / "text.snap").write_bytes(b"not a snapshot" * 10)
+
+    for name in ("empty.snap", "text.snap"):
+        with pytest.raises(snapshot.SnapshotError):
+            snapshot.Snapshot(str(tmp_path / name))
+
+
+def test_older_format_version_is_rejected(tmp_path):
+    root = tmp_path / "root"
+    root.mkdir()
+    _write(root, tmp_path / "s.snap")
+    data = bytearray((tmp_path / "s.snap").read_bytes())
+    data[8:12] = (snapshot.VERSION - 1).to_bytes(4, 'little')
+    (tmp_path / "s.snap").write_bytes(bytes(data))
+
+    with pytest.raises(snapshot.SnapshotError, match="Версия снимка"):
+        snapshot.Snapshot(str(tmp_path / "s.snap"))
+
+
+def test_diff_merges_directories_and_files(tmp_path):
+    root = tmp_path / "root"
+    root.mkdir()
+    _tree(root)
+    _write(root, tmp_path / "old.snap")
+
+    (root / "a" / "b" / "two.txt").unlink()
+    (root / "a" / "one.txt").write_bytes(b"x" * 15)
+    (root / "c").mkdir()
+    (root / "c" / "new.txt").write_bytes(b"x" * 7)
+    (root / "a" / "b" / "added.txt").write_bytes(b"x" * 3)
+    _write(root, tmp_path / "new.snap")
+
+    with snapshot.Snapshot(str(tmp_path / "old.snap")) as old, snapshot.Snapshot(str(tmp_path / "new.snap")) as new:
+        changes = snapshot.diff_snapshots(old, new)
+
+    def relative(entries):
+        return sorted((os.path.relpath(entry[0], str(root)),) + tuple(entry[1:]) for entry in entries)
+
+    assert relative(changes["added"]) == [(os.path.join("a", "b", "added.txt"), 3), (os.path.join("c", "new.txt"), 7)]
+    assert relative(changes["removed"]) == [(os.path.join("a", "b", "two.txt"), 20)]
+    assert relative(changes["modified"]) == [(os.path.join("a", "one.txt"), 10, 15)]
+    # Наибольший прирост — первым
+    directories = [(os.path.relpath(path, str(root)), old_size, new_size)
+                   for path, old_size, new_size in changes["directories"]]
+    assert directories == [("c", 0, 7), (os.curdir, 35, 30), ("a", 30, 18), (os.path.join("a", "b"), 20, 3)]
+
+
+def test_diff_refuses_partial_snapshot(tmp_path):
+    root = tmp_path / "root"
+    root.mkdir()
+    _tree(root)
+    _write(root, tmp_path / "full.snap")
+    _write(root, tmp_path / "partial.snap", max_depth=0)
+
+    with snapshot.Snapshot(str(tmp_path / "full.snap")) as full, \
+            snapshot.Snapshot(str(tmp_path / "partial.snap")) as partial:
+        with pytest.raises(snapshot.SnapshotError, match="частичный"):
+            snapshot.diff_snapshots(full, partial)
+        changes = snapshot.diff_snapshots(full, partial, allow_partial=True)
+
+    assert len(changes["removed"]) == 2
@@ -1,12 +1,195 @@
 import os
 import platform
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
 from pathlib import Path
-from typing import Union, List, Tuple
+from typing import Union, List, Tuple, Dict, Iterator, Optional
 import re
 import local as lcl
 
 PathString = Union[str, Path]
 
+# Фазы, по которым раскладывается время инструментированной команды
+INSTRUMENTED_PHASES = ('listdir', 'stat', 'attributes', 'read')
+
+
+class ScanCounters:
+    """Call counters and per-phase timings collected during one command.
+
+    Attributes:
+        calls (dict): Number of calls per phase.
+        seconds (dict): Time spent per phase, in seconds.
+        bytes_seen (int): Total size of files seen by stat calls.
+        started (float): perf_counter() value at creation.
+        elapsed (float): Total command time, set by finish().
+    """
+
+    def __init__(self) -> None:
+        self.calls: Dict[str, int] = defaultdict(int)
+        self.seconds: Dict[str, float] = defaultdict(float)
+        self.bytes_seen = 0
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+
+    def finish(self) -> None:
+        """Fixes the total elapsed time of the command."""
+        self.elapsed = time.perf_counter() - self.started
+
+
+_instrumentation_enabled = False
+_active_counters: Optional[ScanCounters] = None
+_NULL_PHASE = nullcontext()
+# Per-thread flag set by uncounted()
+_thread_state = threading.local()
+
+
+def set_instrumentation(enabled: bool) -> None:
+    """Turns scan instrumentation on or off for subsequent commands.
+
+    Args:
+        enabled (bool): New state.
+
+    Returns:
+        None
+    """
+
+    global _instrumentation_enabled
+    _instrumentation_enabled = enabled
+
+
+def instrumentation_enabled() -> bool:
+    """Checks whether scan instrumentation is turned on.
+
+    Args:
+        None
+
+    Returns:
+        bool: True if commands should be instrumented.
+    """
+
+    return _instrumentation_enabled
+
+
+@contextmanager
+def instrumented() -> Iterator[ScanCounters]:
+    """Collects counters for everything executed inside the block.
+
+    Args:
+        None
+
+    Returns:
+        Iterator[ScanCounters]: Counters of the block, finished on exit.
+    """
+
+    global _active_counters
+    counters = ScanCounters()
+    previous = _active_counters
+    _active_counters = counters
+    try:
+        yield counters
+    finally:
+        counters.finish()
+        _active_counters = previous
+
+
+@contextmanager
+def uncounted() -> Iterator[None]:
+    """Excludes calls made by the current thread from instrumented() counters.
+
+    Meant for background threads whose work does not belong to the
+    command being measured, such as directory prefetch.
+
+    Args:
+        None
+
+    Returns:
+        Iterator[None]: Context in which the thread is not counted.
+    """
+
+    previous = getattr(_thread_state, "uncounted", False)
+    _thread_state.uncounted = True
+    try:
+        yield
+    finally:
+        _thread_state.uncounted = previous
+
+
+@contextmanager
+def _timed_phase(counters: ScanCounters, phase: str) -> Iterator[None]:
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        counters.calls[phase] += 1
+        counters.seconds[phase] += time.perf_counter() - start
+
+
+def count_phase(phase: str):
+    """Returns a context manager that times one call of a scan phase.
+
+    Without an active instrumented() block, or in a thread inside
+    uncounted(), a shared no-op context is returned, so uninstrumented
+    scans pay almost nothing.
+
+    Args:
+        phase (str): Phase name (listdir, stat, attributes).
+
+    Returns:
+        context manager: Timing context for the call.
+    """
+
+    if _active_counters is None or getattr(_thread_state, "uncounted", False):
+        return _NULL_PHASE
+    return _timed_phase(_active_counters, phase)
+
+
+def count_bytes_seen(size: int) -> None:
+    """Adds a file size to the bytes seen by the active instrumented block.
+
+    Args:
+        size (int): File size in bytes.
+
+    Returns:
+        None
+    """
+
+    if _active_counters is not None and not getattr(_thread_state, "uncounted", False):
+        _active_counters.bytes_seen += size
+
+
+def format_instrumentation_report(counters: ScanCounters) -> str:
+    """Builds a text report of an instrumented command.
+
+    Time not spent in listdir, stat, attribute or read calls is reported as
+    Python-level aggregation.
+
+    Args:
+        counters (ScanCounters): Finished counters.
+
+    Returns:
+        str: Multi-line report.
+    """
+
+    elapsed = counters.elapsed or (time.perf_counter() - counters.started)
+    directories = counters.calls.get('listdir', 0)
+    rate = directories / elapsed if elapsed > 0 else 0.0
+
+    lines = [f'{lcl.INSTRUMENT_TITLE}']
+    for phase in INSTRUMENTED_PHASES:
+        lines.append(
+            f"  {phase:12} {counters.calls.get(phase, 0):10,} {lcl.INSTRUMENT_CALLS}"
+            f"  {counters.seconds.get(phase, 0.0):8.3f} s"
+        )
+    python_time = max(elapsed - sum(counters.seconds.values()), 0.0)
+    padding = ' ' * (11 + len(lcl.INSTRUMENT_CALLS))
+    lines.append(f"  {'python':12} {padding}  {python_time:8.3f} s")
+    lines.append(f'  {lcl.INSTRUMENT_BYTES}' f"{format_size(counters.bytes_seen)}")
+    lines.append(f'  {lcl.INSTRUMENT_RATE}' f"{rate:.1f}")
+    lines.append(f'  {lcl.INSTRUMENT_TOTAL}' f"{elapsed:.3f} s")
+    return "\n".join(lines)
+
 
 def is_windows_os() -> bool:
     """Checks whether current OS is Windows.
@@ -201,7 +384,8 @@ def safe_windows_listdir(path: PathString) -> List[str]:
 
     try:
         p_str = str(path)
-        return os.listdir(p_str)
+        with count_phase('listdir'):
+            return os.listdir(p_str)
     except (PermissionError, FileNotFoundError, OSError):
         return []
 
@@ -219,8 +403,11 @@ def is_hidden_windows_file(path: PathString) -> bool:
         bool: True if file is hidden, otherwise False.
     """
 
-    p_str = str(path)
+    with count_phase('attributes'):
+        return _is_hidden_windows_file(str(path))
 
+
+def _is_hidden_windows_file(p_str: str) -> bool:
     if not Path(p_str).exists():
         return False
 
@@ -253,6 +440,117 @@ def is_hidden_windows_file(path: PathString) -> bool:
     return os.path.basename(p_str).startswith('.')
 
 
+def is_junction_point(path: PathString) -> bool:
+    """Determines whether a path is a junction point (reparse point).
+
+    Uses WinAPI FILE_ATTRIBUTE_REPARSE_POINT; always False elsewhere.
+
+    Args:
+        path (str | Path): File or directory path.
+
+    Returns:
+        bool: True if path is a junction point, otherwise False.
+    """
+
+    try:
+        import ctypes
+
+        with count_phase('attributes'):
+            attrs = ctypes.windll.kernel32.GetFileAttributesW(str(path))
+        if attrs == -1:
+            return False
+        return bool(attrs & FILE_ATTRIBUTE_REPARSE_POINT)
+    except Exception:
+        return False
+
+
+def read_file_header(path: PathString, size: int, offset: int = 0) -> bytes:
+    """Reads up to size bytes of a file starting at offset.
+
+    Used for signature checks, so the read is a single unbuffered call
+    and never touches more of the file than asked.
+
+    Args:
+        path (str | Path): File path.
+        size (int): Maximum number of bytes to read.
+        offset (int): Position of the first byte.
+
+    Returns:
+        bytes: Data read; shorter than size near the end of the file.
+
+    Raises:
+        OSError: If the file cannot be opened or read.
+    """
+
+    with count_phase('read'):
+        with open(path, 'rb', buffering=0) as stream:
+            if offset:
+                stream.seek(offset)
+            return stream.read(size)
+
+
+FILE_ATTRIBUTE_READONLY = 0x1
+FILE_ATTRIBUTE_HIDDEN = 0x2
+FILE_ATTRIBUTE_SYSTEM = 0x4
+FILE_ATTRIBUTE_REPARSE_POINT = 0x400
+
+
+def is_junction_entry(entry: os.DirEntry) -> bool:
+    """Determines whether an os.scandir entry is a junction point.
+
+    Uses DirEntry.is_junction where available (Python 3.12+). Otherwise
+    checks FILE_ATTRIBUTE_REPARSE_POINT in the entry's own stat result,
+    which on Windows comes with the directory listing; elsewhere there
+    are no junctions and no system calls are made.
+
+    Args:
+        entry (os.DirEntry): Entry from os.scandir.
+
+    Returns:
+        bool: True if entry is a junction point, otherwise False.
+
+    Raises:
+        OSError: If the entry's metadata cannot be read.
+    """
+
+    is_junction = getattr(entry, "is_junction", None)
+    if is_junction is not None:
+        return is_junction()
+    if not is_windows_os() or not entry.is_dir(follow_symlinks=False):
+        return False
+    attrs = getattr(entry.stat(follow_symlinks=False), "st_file_attributes", 0)
+    return bool(attrs & FILE_ATTRIBUTE_REPARSE_POINT)
+
+
+def file_attributes_from_stat(path: PathString, stat_result: os.stat_result) -> Dict[str, bool]:
+    """Extracts hidden/system/readonly flags from a stat result.
+
+    On Windows uses st_file_attributes, which os.scandir entries carry
+    without extra system calls. Elsewhere falls back to a leading dot and
+    write access.
+
+    Args:
+        path (str | Path): File path.
+        stat_result (os.stat_result): Result of os.stat or DirEntry.stat.
+
+    Returns:
+        dict: Flags hidden, system and readonly.
+    """
+
+    attrs = getattr(stat_result, "st_file_attributes", None)
+    if attrs is None:
+        return {
+            "hidden": os.path.basename(str(path)).startswith('.'),
+            "system": False,
+            "readonly": not os.access(path, os.W_OK),
+        }
+    return {
+        "hidden": bool(attrs & FILE_ATTRIBUTE_HIDDEN),
+        "system": bool(attrs & FILE_ATTRIBUTE_SYSTEM),
+        "readonly": bool(attrs & FILE_ATTRIBUTE_READONLY),
+    }
+
+
 def get_windows_reserved_names() -> List[str]:
     """Returns the list of Windows reserved device names.
 